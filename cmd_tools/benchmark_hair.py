@@ -0,0 +1,178 @@
+#**********************************************************************
+# Copyright 2020 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#********************************************************************
+
+# script to compare hair export with previous per point implementation on mocked particle system
+# usage: blender --background --python cmd_tools/benchmark_hair.py -- [parents] [children] [render_step]
+
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import mathutils
+
+src_path = str((Path(__file__).parent.parent/'src').resolve())
+if src_path not in sys.path:
+    sys.path.append(src_path)
+
+import pyrpr
+from rprblender.export import hair
+
+
+class MockParticleSystem:
+    """ Particle system with procedurally generated hair strands """
+
+    def __init__(self, parents, children, render_step):
+        self.name = 'ParticleSystem'
+        self.settings = SimpleNamespace(
+            render_step=render_step, display_step=render_step,
+            child_type='NONE' if children == 0 else 'SIMPLE',
+            radius_scale=0.01, root_radius=1.0, tip_radius=0.0, shape=0.0, use_close_tip=True,
+        )
+        self.particles = tuple(range(parents))
+        self.child_particles = tuple(range(parents * children))
+
+        length = 2 ** render_step + 1
+        rng = np.random.default_rng(0)
+        self._points = rng.random((parents * (children + 1), length, 3), dtype=np.float32)
+        # some points are not available, they have to be welded
+        self._points[rng.random(self._points.shape[:2]) < 0.05] = 0.0
+        self._uvs = rng.random((parents, 2), dtype=np.float32)
+
+    def co_hair(self, obj, particle_no=0, step=0):
+        return mathutils.Vector(self._points[particle_no, step])
+
+    def uv_on_emitter(self, modifier, particle=None):
+        return mathutils.Vector(self._uvs[particle])
+
+
+class MockObject:
+    type = 'MESH'
+    matrix_world = mathutils.Matrix.Identity(4)
+
+    def __init__(self, p_sys):
+        self.data = SimpleNamespace(uv_layers=('UVMap',))
+        self.modifiers = (SimpleNamespace(type='PARTICLE_SYSTEM', show_render=True,
+                                          particle_system=p_sys),)
+
+
+def init_curve_data_per_point(p_sys, obj, use_final_settings):
+    """ Previous implementation of CurveData.init, kept as the reference """
+    def shape_f(x, shape):
+        return x ** (10.0 ** -shape)
+
+    settings = p_sys.settings
+    render_step = settings.render_step if use_final_settings else settings.display_step
+    length = 2 ** render_step + 1
+
+    num_parents = len(p_sys.particles)
+    start_index, curves_count = \
+        (0, num_parents) if settings.child_type == 'NONE' else \
+            (num_parents, len(p_sys.child_particles))
+
+    all_points = np.fromiter(
+        (elem for i in range(start_index, start_index + curves_count)
+         for step in range(length)
+         for elem in p_sys.co_hair(obj, particle_no=i, step=step)),
+        dtype=np.float32
+    ).reshape(-1, length, 3)
+
+    for curve in all_points:
+        for i in range(1, length):
+            if np.count_nonzero(curve[i]) == 0:
+                curve[i] = curve[i - 1]
+
+    radius_scale = settings.radius_scale * sum(abs(x) for x in obj.matrix_world.to_scale()) / 3
+    root = settings.root_radius * radius_scale / 2.
+    tip = settings.tip_radius * radius_scale / 2.
+    points_radii = np.fromiter(
+        (root + (tip - root) * shape_f(i / (length - 1), settings.shape) for i in range(length)),
+        dtype=np.float32)
+    if settings.use_close_tip:
+        points_radii[length - 1] = 0.0
+
+    all_uvs = np.fromiter(
+        (elem for i in range(start_index, start_index + curves_count)
+         for elem in p_sys.uv_on_emitter(obj.modifiers[0],
+                                         particle=p_sys.particles[(i - start_index) % num_parents])),
+        dtype=np.float32
+    ).reshape(-1, 2)
+
+    return all_points, points_radii, all_uvs
+
+
+def split_segments_per_point(control_points, points_radii):
+    """ Previous implementation of segments splitting in pyrpr.Curve, kept as the reference """
+    def to_segments(n):
+        m = n - 1
+        for s in range(0, m, 3):
+            yield s
+            yield s + 1
+            yield min(s + 2, m)
+            yield min(s + 3, m)
+
+    num_curves = control_points.shape[0]
+    segment_steps = np.fromiter(to_segments(control_points.shape[1]), dtype=np.int32)
+    points = np.fromiter(
+        (elem for i in range(num_curves) for step in segment_steps for elem in control_points[i, step]),
+        dtype=np.float32
+    ).reshape(-1, 3)
+    curve_radii = np.fromiter(
+        (points_radii[segment_steps[e + k]] for e in range(0, len(segment_steps), 4) for k in (0, 3)),
+        dtype=np.float32)
+    radii = np.full((num_curves, len(curve_radii)), curve_radii, dtype=np.float32)
+
+    return points, radii
+
+
+def split_segments(control_points, points_radii):
+    """ Segments splitting of pyrpr.Curve with radii of all curves """
+    points, curve_radii = pyrpr.Curve.split_segments(control_points, points_radii)
+    return points, np.tile(curve_radii, control_points.shape[0])
+
+
+def measure(func, *args):
+    time_start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - time_start, result
+
+
+def main():
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+    parents, children, render_step = (int(v) for v in (argv + ['2000', '10', '3'][len(argv):]))
+
+    p_sys = MockParticleSystem(parents, children, render_step)
+    obj = MockObject(p_sys)
+
+    old_time, (old_points, old_radii, old_uvs) = measure(init_curve_data_per_point, p_sys, obj, True)
+    new_time, data = measure(hair.CurveData.init, p_sys, obj, True)
+    assert np.array_equal(old_points, data.points)
+    assert np.allclose(old_radii, data.points_radii)
+    assert np.array_equal(old_uvs, data.uvs)
+
+    old_split_time, (old_seg_points, old_seg_radii) = \
+        measure(split_segments_per_point, data.points, data.points_radii)
+    new_split_time, (new_seg_points, new_seg_radii) = \
+        measure(split_segments, data.points, data.points_radii)
+    assert np.array_equal(old_seg_points, new_seg_points)
+    assert np.array_equal(old_seg_radii.ravel(), new_seg_radii)
+
+    print(f"Hair strands: {len(data.points)}, points per strand: {data.points.shape[1]}")
+    print(f"CurveData.init:   per point {old_time:.3f}s, vectorized {new_time:.3f}s")
+    print(f"Curve segments:   per point {old_split_time:.3f}s, vectorized {new_split_time:.3f}s")
+
+
+main()
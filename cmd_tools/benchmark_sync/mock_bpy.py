@@ -0,0 +1,729 @@
+#**********************************************************************
+# Copyright 2020 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#********************************************************************
+"""
+Minimal headless replacement of Blender python modules.
+
+It is enough to import rprblender, to register its properties and to run export code
+on synthetic data: bpy.types classes are created on demand, registered properties return
+their default values, UI and GPU modules are MagicMocks. mathutils is replaced by small
+numpy implementation if real module isn't available.
+"""
+
+import math
+import sys
+import types
+import tempfile
+from unittest import mock
+
+import numpy as np
+
+
+BLENDER_VERSION = (2, 83, 0)
+
+# bpy.types classes which are ID data-blocks
+ID_TYPES = {
+    'ID', 'Object', 'Mesh', 'Material', 'Scene', 'World', 'Camera', 'Light', 'Image',
+    'NodeTree', 'ShaderNodeTree', 'Collection', 'ParticleSettings', 'Curve', 'Volume', 'Text',
+}
+
+# modules which are only used by UI and viewport drawing
+MOCKED_MODULES = ('bgl', 'blf', 'gpu', 'gpu_extras', 'gpu_extras.batch', 'gpu_extras.presets',
+                  'bpy_extras', 'bpy_extras.io_utils', 'bpy_extras.node_utils',
+                  'bpy_extras.image_utils', 'bl_ui', 'bl_operators',
+                  'bpy.ops')
+
+
+#
+# Properties
+#
+class Property:
+    """ Result of bpy.props.*Property(), registered class gets it as descriptor """
+
+    def __init__(self, kind, kwargs):
+        self.kind = kind
+        self.kwargs = kwargs
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+
+        getter = self.kwargs.get('get')
+        if getter:
+            return getter(instance)
+
+        # property assigned to already created class (bpy.types.Object.rpr = ...) has no name,
+        # its value is stored by descriptor id, named value overrides descriptor in instance dict
+        key = self.name or f'_property_{id(self)}'
+        value = instance.__dict__.get(key, None)
+        if value is None:
+            value = self.default_value(instance)
+            instance.__dict__[key] = value
+        return value
+
+    def default_value(self, instance):
+        kwargs = self.kwargs
+        if self.kind == 'PointerProperty':
+            cls = kwargs['type']
+            if not issubclass(cls, PropertyGroup):
+                return None
+
+            group = cls()
+            group.__dict__['id_data'] = instance.id_data
+            return group
+
+        if self.kind == 'CollectionProperty':
+            return Collection(kwargs['type'], instance.id_data)
+
+        if 'default' in kwargs:
+            default = kwargs['default']
+            return list(default) if isinstance(default, (tuple, list)) else default
+
+        if self.kind == 'EnumProperty':
+            if 'ENUM_FLAG' in kwargs.get('options', ()):
+                return set()
+
+            items = kwargs.get('items')
+            return items[0][0] if isinstance(items, (tuple, list)) and items else ''
+
+        if self.kind.endswith('VectorProperty'):
+            scalar = {'Bool': False, 'Int': 0, 'Float': 0.0}[self.kind[:-len('VectorProperty')]]
+            return [scalar] * kwargs.get('size', 3)
+
+        return {
+            'BoolProperty': False,
+            'IntProperty': 0,
+            'FloatProperty': 0.0,
+            'StringProperty': '',
+        }[self.kind]
+
+
+def _create_property_function(kind):
+    def property_function(**kwargs):
+        return Property(kind, kwargs)
+
+    property_function.__name__ = kind
+    return property_function
+
+
+props = types.ModuleType('bpy.props')
+for _kind in ('BoolProperty', 'BoolVectorProperty', 'IntProperty', 'IntVectorProperty',
+              'FloatProperty', 'FloatVectorProperty', 'StringProperty', 'EnumProperty',
+              'PointerProperty', 'CollectionProperty'):
+    setattr(props, _kind, _create_property_function(_kind))
+
+
+#
+# Types
+#
+class bpy_struct:
+    """ Base of all bpy.types classes, attributes could be set by constructor keyword arguments """
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+    def __getattr__(self, name):
+        if name == 'id_data':
+            return self
+
+        if name == 'bl_rna':
+            return StructRNA.get(self.__dict__)
+
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    def __repr__(self):
+        name = self.__dict__.get('name')
+        return f"<{type(self).__name__} '{name}'>" if name is not None else \
+            f"<{type(self).__name__}>"
+
+
+class PropertyRNA(bpy_struct):
+    pass
+
+
+class StructRNA:
+    """ bl_rna of struct: attributes of struct are its properties """
+
+    # ((property name, type), ...) -> StructRNA, structs of the same type share it like in Blender
+    _cache = {}
+
+    def __init__(self, properties):
+        self.properties = Collection(items=(
+            PropertyRNA(name=name, identifier=name, type=prop_type) for name, prop_type in properties
+        ))
+
+    @classmethod
+    def get(cls, attributes):
+        properties = tuple((name, cls.property_type(value))
+                           for name, value in attributes.items() if not name.startswith('_'))
+        rna = cls._cache.get(properties)
+        if rna is None:
+            rna = cls(properties)
+            cls._cache[properties] = rna
+
+        return rna
+
+    @staticmethod
+    def property_type(value):
+        if isinstance(value, bool):
+            return 'BOOLEAN'
+        if isinstance(value, int):
+            return 'INT'
+        if isinstance(value, str):
+            return 'STRING'
+        if value is None or isinstance(value, bpy_struct):
+            return 'POINTER'
+        if isinstance(value, list):
+            return 'COLLECTION'
+        return 'FLOAT'
+
+
+class PropertyGroup(bpy_struct):
+    pass
+
+
+class NodeRNA:
+    """ bl_rna descriptor of nodes, class bl_rna contains properties of base node """
+
+    BASE_PROPERTIES = ('rna_type', 'name', 'label', 'bl_idname', 'mute', 'location', 'width',
+                       'inputs', 'outputs', 'parent', 'select')
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return StructRNA.get(dict.fromkeys(self.BASE_PROPERTIES))
+
+        return StructRNA.get(instance.__dict__)
+
+
+class ShaderNode(bpy_struct):
+    bl_rna = NodeRNA()
+
+
+class ID(bpy_struct):
+    """ Data-block, its evaluated and original versions are the same object """
+
+    is_evaluated = True
+    animation_data = None
+    library = None
+    users = 1
+
+    @property
+    def name_full(self):
+        return self.name
+
+    @property
+    def original(self):
+        return self
+
+    def evaluated_get(self, depsgraph):
+        return self
+
+
+def _get_library_path(item):
+    library = getattr(item, 'library', None)
+    return library.filepath if library else None
+
+
+class Collection(list):
+    """ bpy_prop_collection of PropertyGroup items """
+
+    def __init__(self, item_type=None, id_data=None, items=()):
+        super().__init__(items)
+        self.item_type = item_type
+        self.id_data = id_data
+
+    def add(self):
+        item = self.item_type()
+        item.__dict__['id_data'] = self.id_data
+        self.append(item)
+        return item
+
+    def remove(self, item):
+        del self[item if isinstance(item, int) else self.index(item)]
+
+    def get(self, key, default=None):
+        # linked data-block is found by (name, library filepath) key like in Blender
+        name, library_path = key if isinstance(key, tuple) else (key, None)
+        return next((item for item in self if getattr(item, 'name', None) == name and
+                     _get_library_path(item) == library_path), default)
+
+    def __getitem__(self, key):
+        if isinstance(key, (str, tuple)):
+            item = self.get(key)
+            if item is None:
+                raise KeyError(key)
+            return item
+
+        return super().__getitem__(key)
+
+    def __contains__(self, key):
+        if isinstance(key, (str, tuple)):
+            return self.get(key) is not None
+
+        return super().__contains__(key)
+
+    def keys(self):
+        return [item.name for item in self]
+
+    def values(self):
+        return list(self)
+
+    def items(self):
+        return [(item.name, item) for item in self]
+
+
+# DNA values of ParticleData.alive, they are values of Particle.alive_state enum items
+PARTICLE_ALIVE_STATES = {'DEAD': 1, 'UNBORN': 2, 'ALIVE': 3, 'DYING': 4}
+
+
+class Particle(bpy_struct):
+    bl_rna = types.SimpleNamespace(properties=Collection(items=(
+        PropertyRNA(name='alive_state', identifier='alive_state', type='ENUM',
+                    enum_items=Collection(items=(
+                        PropertyRNA(name=identifier, identifier=identifier, value=value)
+                        for identifier, value in PARTICLE_ALIVE_STATES.items()))),
+    )))
+
+
+class _TypesModule(types.ModuleType):
+    """ bpy.types module which creates requested classes on demand """
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+
+        base = ID if name in ID_TYPES else bpy_struct
+        cls = type(name, (base,), {'__module__': 'bpy.types'})
+        setattr(self, name, cls)
+        return cls
+
+
+bpy_types = _TypesModule('bpy.types')
+bpy_types.bpy_struct = bpy_struct
+bpy_types.PropertyGroup = PropertyGroup
+bpy_types.ShaderNode = ShaderNode
+bpy_types.ID = ID
+bpy_types.Particle = Particle
+
+
+#
+# Utils
+#
+def register_class(cls):
+    """ Turns properties annotations into descriptors and calls register() as Blender does """
+    for name, value in cls.__dict__.get('__annotations__', {}).items():
+        if isinstance(value, Property):
+            value.name = name
+            setattr(cls, name, value)
+
+    register = cls.__dict__.get('register')
+    if register:
+        register.__get__(None, cls)()
+
+
+def unregister_class(cls):
+    unregister = cls.__dict__.get('unregister')
+    if unregister:
+        unregister.__get__(None, cls)()
+
+
+def register_classes_factory(classes):
+    def register():
+        for cls in classes:
+            register_class(cls)
+
+    def unregister():
+        for cls in reversed(classes):
+            unregister_class(cls)
+
+    return register, unregister
+
+
+utils = types.ModuleType('bpy.utils')
+utils.register_class = register_class
+utils.unregister_class = unregister_class
+utils.register_classes_factory = register_classes_factory
+utils.previews = mock.MagicMock()
+utils.resource_path = lambda *args, **kwargs: tempfile.gettempdir()
+utils.user_resource = lambda *args, **kwargs: tempfile.gettempdir()
+
+
+def persistent(func):
+    return func
+
+
+app = types.ModuleType('bpy.app')
+app.version = BLENDER_VERSION
+app.version_string = '.'.join(str(v) for v in BLENDER_VERSION)
+app.background = True
+app.binary_path = sys.executable
+app.binary_path_python = sys.executable
+app.handlers = types.SimpleNamespace(
+    persistent=persistent, save_pre=[], load_pre=[], load_post=[], version_update=[],
+    depsgraph_update_post=[], frame_change_post=[],
+)
+
+path = types.ModuleType('bpy.path')
+path.abspath = lambda p, **kwargs: p
+path.native_pathsep = lambda p: p
+path.basename = lambda p: p.replace('\\', '/').rsplit('/', 1)[-1]
+path.display_name = lambda name: name
+
+data = types.SimpleNamespace(
+    objects=Collection(), meshes=Collection(), materials=Collection(), images=Collection(),
+    node_groups=Collection(), scenes=Collection(), worlds=Collection(), cameras=Collection(),
+    lights=Collection(), collections=Collection(), particles=Collection(), texts=Collection(),
+    filepath='',
+)
+
+context = types.SimpleNamespace(
+    scene=None,
+    preferences=types.SimpleNamespace(addons={}),
+)
+
+
+class NodeCategory:
+    """ nodeitems_utils.NodeCategory, it is subclassed by addon so it can't be a MagicMock """
+
+    def __init__(self, identifier, name, description="", items=None):
+        self.identifier = identifier
+        self.name = name
+        self.description = description
+        self.items = items
+
+
+def _create_nodeitems_modules():
+    nodeitems_utils = types.ModuleType('nodeitems_utils')
+    nodeitems_utils.NodeCategory = NodeCategory
+    nodeitems_utils.NodeItem = lambda *args, **kwargs: types.SimpleNamespace(args=args, kwargs=kwargs)
+    nodeitems_utils.register_node_categories = lambda identifier, categories: None
+    nodeitems_utils.unregister_node_categories = lambda identifier=None: None
+
+    nodeitems_builtins = types.ModuleType('nodeitems_builtins')
+    nodeitems_builtins.ShaderNodeCategory = type('ShaderNodeCategory', (NodeCategory,), {})
+
+    return nodeitems_utils, nodeitems_builtins
+
+
+class BMElemSeq(list):
+    def ensure_lookup_table(self):
+        pass
+
+
+class BMesh:
+    """ bmesh with only uv sphere creation, transform ops don't change it """
+
+    def __init__(self):
+        self.verts = BMElemSeq()
+        self.faces = BMElemSeq()
+        self._triangles = []
+
+    def create_uvsphere(self, u_segments, v_segments, diameter):
+        u = np.linspace(0.0, 2.0 * math.pi, u_segments, endpoint=False)
+        v = np.linspace(0.0, math.pi, v_segments + 1)[1:-1]
+        u, v = np.meshgrid(u, v)
+        points = np.stack((np.cos(u) * np.sin(v), np.sin(u) * np.sin(v), np.cos(v)), axis=-1)
+        points = np.concatenate((((0.0, 0.0, 1.0),), points.reshape(-1, 3), ((0.0, 0.0, -1.0),)))
+        self.verts = BMElemSeq(types.SimpleNamespace(index=i, co=tuple(p * diameter), normal=tuple(p))
+                               for i, p in enumerate(points))
+
+        # triangle fans of poles and quads between rings split to triangles
+        last = len(points) - 1
+        rings = np.arange(1, last).reshape(len(v), u_segments)
+        nxt = np.roll(rings, -1, axis=1)
+        tris = [(0, a, b) for a, b in zip(rings[0], nxt[0])]
+        tris += [(last, b, a) for a, b in zip(rings[-1], nxt[-1])]
+        for r0, r1, n0, n1 in zip(rings[:-1], rings[1:], nxt[:-1], nxt[1:]):
+            for a, b, c, d in zip(r0, n0, n1, r1):
+                tris += [(a, c, b), (a, d, c)]
+
+        self._triangles = [tuple(types.SimpleNamespace(vert=self.verts[i]) for i in tri) for tri in tris]
+
+    def calc_loop_triangles(self):
+        return self._triangles
+
+    def free(self):
+        pass
+
+
+def _create_bmesh_module():
+    bmesh = types.ModuleType('bmesh')
+    bmesh.new = BMesh
+    bmesh.ops = types.SimpleNamespace(
+        create_uvsphere=lambda bm, **kwargs: bm.create_uvsphere(**kwargs),
+        scale=lambda bm, **kwargs: None,
+        rotate=lambda bm, **kwargs: None,
+    )
+    return bmesh
+
+
+#
+# mathutils
+#
+class Vector:
+    def __init__(self, seq=(0.0, 0.0, 0.0)):
+        self._v = np.array(seq, dtype=np.float64)
+
+    def __array__(self, dtype=None, copy=None):
+        return self._v if dtype is None else self._v.astype(dtype)
+
+    def __len__(self):
+        return len(self._v)
+
+    def __iter__(self):
+        return iter(self._v.tolist())
+
+    def __getitem__(self, index):
+        return self._v[index]
+
+    def __setitem__(self, index, value):
+        self._v[index] = value
+
+    def __add__(self, other):
+        return Vector(self._v + np.asarray(other))
+
+    def __sub__(self, other):
+        return Vector(self._v - np.asarray(other))
+
+    def __mul__(self, other):
+        return Vector(self._v * other)
+
+    def __neg__(self):
+        return Vector(-self._v)
+
+    def __eq__(self, other):
+        return np.array_equal(self._v, np.asarray(other))
+
+    def __repr__(self):
+        return f"Vector({tuple(self)})"
+
+    x = property(lambda self: self._v[0])
+    y = property(lambda self: self._v[1])
+    z = property(lambda self: self._v[2])
+    w = property(lambda self: self._v[3])
+
+    @property
+    def length(self):
+        return float(np.linalg.norm(self._v))
+
+    def normalized(self):
+        length = self.length
+        return Vector(self._v / length if length else self._v)
+
+    def to_tuple(self):
+        return tuple(self)
+
+
+class Matrix:
+    def __init__(self, rows=None):
+        self._m = np.identity(4) if rows is None else \
+            np.array([np.asarray(row, dtype=np.float64) for row in rows])
+
+    @staticmethod
+    def Identity(size):
+        return Matrix(np.identity(size))
+
+    @staticmethod
+    def Translation(vector):
+        m = np.identity(4)
+        m[:3, 3] = tuple(vector)[:3]
+        return Matrix(m)
+
+    @staticmethod
+    def Scale(factor, size, axis=None):
+        m = np.identity(size)
+        if axis is None:
+            m[:3, :3] *= factor
+        else:
+            axis = np.asarray(axis, dtype=np.float64)
+            m[:3, :3] += (factor - 1.0) * np.outer(axis, axis)
+        return Matrix(m)
+
+    @staticmethod
+    def Rotation(angle, size, axis):
+        if isinstance(axis, str):
+            axis = {'X': (1, 0, 0), 'Y': (0, 1, 0), 'Z': (0, 0, 1)}[axis]
+        x, y, z = np.asarray(axis, dtype=np.float64) / np.linalg.norm(axis)
+        c, s = math.cos(angle), math.sin(angle)
+        rot = np.array([
+            [c + x * x * (1 - c), x * y * (1 - c) - z * s, x * z * (1 - c) + y * s],
+            [y * x * (1 - c) + z * s, c + y * y * (1 - c), y * z * (1 - c) - x * s],
+            [z * x * (1 - c) - y * s, z * y * (1 - c) + x * s, c + z * z * (1 - c)],
+        ])
+        m = np.identity(size)
+        m[:3, :3] = rot
+        return Matrix(m)
+
+    def __array__(self, dtype=None, copy=None):
+        return self._m if dtype is None else self._m.astype(dtype)
+
+    def __len__(self):
+        return len(self._m)
+
+    def __iter__(self):
+        return (Vector(row) for row in self._m)
+
+    def __getitem__(self, index):
+        return Vector(self._m[index])
+
+    def __matmul__(self, other):
+        if isinstance(other, Matrix):
+            return Matrix(self._m @ other._m)
+
+        v = np.asarray(other, dtype=np.float64)
+        if len(v) == 3 and len(self._m) == 4:
+            return Vector((self._m @ np.append(v, 1.0))[:3])
+        return Vector(self._m @ v)
+
+    def __eq__(self, other):
+        return isinstance(other, Matrix) and np.array_equal(self._m, other._m)
+
+    def __repr__(self):
+        return f"Matrix({self._m.tolist()})"
+
+    @property
+    def col(self):
+        return [Vector(col) for col in self._m.T]
+
+    @property
+    def row(self):
+        return [Vector(row) for row in self._m]
+
+    @property
+    def translation(self):
+        return Vector(self._m[:3, 3])
+
+    def copy(self):
+        return Matrix(self._m.copy())
+
+    def inverted(self):
+        return Matrix(np.linalg.inv(self._m))
+
+    def transposed(self):
+        return Matrix(self._m.T)
+
+    def to_3x3(self):
+        return Matrix(self._m[:3, :3])
+
+    def to_4x4(self):
+        m = np.identity(4)
+        m[:3, :3] = self._m[:3, :3]
+        if len(self._m) == 4:
+            m[:3, 3] = self._m[:3, 3]
+        return Matrix(m)
+
+    def to_translation(self):
+        return self.translation
+
+    def to_scale(self):
+        return Vector(np.linalg.norm(self._m[:3, :3], axis=0))
+
+    def to_quaternion(self):
+        m = self._m[:3, :3] / np.linalg.norm(self._m[:3, :3], axis=0)
+        w = math.sqrt(max(0.0, 1.0 + m[0, 0] + m[1, 1] + m[2, 2])) / 2
+        x = math.copysign(math.sqrt(max(0.0, 1.0 + m[0, 0] - m[1, 1] - m[2, 2])) / 2, m[2, 1] - m[1, 2])
+        y = math.copysign(math.sqrt(max(0.0, 1.0 - m[0, 0] + m[1, 1] - m[2, 2])) / 2, m[0, 2] - m[2, 0])
+        z = math.copysign(math.sqrt(max(0.0, 1.0 - m[0, 0] - m[1, 1] + m[2, 2])) / 2, m[1, 0] - m[0, 1])
+        return Quaternion((w, x, y, z))
+
+
+class Quaternion:
+    def __init__(self, seq=(1.0, 0.0, 0.0, 0.0)):
+        self.w, self.x, self.y, self.z = (float(v) for v in seq)
+
+    def __iter__(self):
+        return iter((self.w, self.x, self.y, self.z))
+
+    def to_matrix(self):
+        w, x, y, z = self
+        return Matrix([
+            [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+            [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+            [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+        ])
+
+    @property
+    def angle(self):
+        return 2.0 * math.acos(max(-1.0, min(1.0, self.w)))
+
+    @property
+    def axis(self):
+        s = math.sqrt(max(0.0, 1.0 - self.w * self.w))
+        return Vector((self.x / s, self.y / s, self.z / s) if s > 1e-8 else (1.0, 0.0, 0.0))
+
+
+class Euler:
+    def __init__(self, angles=(0.0, 0.0, 0.0), order='XYZ'):
+        self.x, self.y, self.z = (float(a) for a in angles)
+        self.order = order
+
+    def __iter__(self):
+        return iter((self.x, self.y, self.z))
+
+    def to_matrix(self):
+        matrix = Matrix.Identity(3)
+        for axis in self.order:
+            angle = getattr(self, axis.lower())
+            matrix = Matrix.Rotation(angle, 3, axis) @ matrix
+        return matrix
+
+
+def _create_mathutils():
+    module = types.ModuleType('mathutils')
+    module.Vector = Vector
+    module.Matrix = Matrix
+    module.Quaternion = Quaternion
+    module.Euler = Euler
+    module.Color = Vector
+    return module
+
+
+def install():
+    """ Registers fake bpy and other Blender modules in sys.modules """
+    if 'bpy' in sys.modules:
+        return
+
+    bpy = types.ModuleType('bpy')
+    bpy.types = bpy_types
+    bpy.props = props
+    bpy.utils = utils
+    bpy.app = app
+    bpy.path = path
+    bpy.data = data
+    bpy.context = context
+
+    sys.modules['bpy'] = bpy
+    for name in ('types', 'props', 'utils', 'app', 'path'):
+        sys.modules['bpy.' + name] = getattr(bpy, name)
+
+    for name in MOCKED_MODULES:
+        sys.modules[name] = mock.MagicMock(name=name)
+    bpy.ops = sys.modules['bpy.ops']
+
+    sys.modules['nodeitems_utils'], sys.modules['nodeitems_builtins'] = _create_nodeitems_modules()
+    sys.modules['bmesh'] = _create_bmesh_module()
+
+    # operators mixins are subclassed by addon
+    io_utils = sys.modules['bpy_extras.io_utils']
+    io_utils.ExportHelper = type('ExportHelper', (), {})
+    io_utils.ImportHelper = type('ImportHelper', (), {})
+
+    try:
+        import mathutils
+    except ImportError:
+        sys.modules['mathutils'] = _create_mathutils()
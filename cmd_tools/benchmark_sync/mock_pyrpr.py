@@ -0,0 +1,306 @@
+#**********************************************************************
+# Copyright 2020 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#********************************************************************
+"""
+Call recording replacement of RPR core libraries.
+
+Real pyrpr, pyrpr2, pyhybrid and pyrprimagefilters modules are imported on top of fake
+pyrprwrap, pyrprimagefilterswrap and _pyrpr_load_store modules. Therefore python side of bindings
+is measured too, and every core call is only counted by recorder instead of being executed.
+Names of core functions and constants are collected from sources of bindings and addon.
+Native helper library of addon is replaced by MagicMock.
+"""
+
+import ast
+import builtins
+import itertools
+import symtable
+import sys
+import types
+from collections import Counter
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+
+SRC_DIR = Path(__file__).resolve().parent.parent.parent / 'src'
+BINDINGS_DIR = SRC_DIR / 'bindings/pyrpr/src'
+ADDON_DIR = SRC_DIR / 'rprblender'
+
+SUCCESS = 0
+
+# names of devices returned by ContextGetInfo, GPUs are not available
+DEVICE_NAMES = {'CONTEXT_CPU_NAME': "Mock CPU"}
+
+
+class CallRecorder:
+    """
+    Counts core calls and bytes of data buffers passed to them.
+    Buffers passed as raw pointers (ffi.cast of ndarray.ctypes.data) have no size and aren't counted.
+    """
+
+    def __init__(self):
+        self.calls = Counter()
+        self.bytes = Counter()
+
+    def reset(self):
+        self.calls.clear()
+        self.bytes.clear()
+
+    def record(self, name, argv):
+        self.calls[name] += 1
+
+        size = 0
+        for arg in argv:
+            if isinstance(arg, (bytes, np.ndarray, CData)):
+                size += arg.nbytes if not isinstance(arg, bytes) else len(arg)
+        if size:
+            self.bytes[name] += size
+
+    def get_report(self):
+        return {name: {'count': count, 'bytes': self.bytes.get(name, 0)}
+                for name, count in self.calls.most_common()}
+
+
+recorder = CallRecorder()
+
+
+class CData:
+    """ Memory allocated by ffi.new(), core functions write results to it """
+
+    def __init__(self, ctype, init=None):
+        self.ctype = ctype
+        if ctype.endswith('[]'):
+            self.items = list(init) if isinstance(init, (list, tuple)) else [0] * (init or 0)
+        else:
+            self.items = [0 if init is None and not ctype.endswith('**') else init]
+
+    @property
+    def nbytes(self):
+        return len(self.items) * 8
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+    def __setitem__(self, index, value):
+        self.items[index] = value
+
+    def __len__(self):
+        return len(self.items)
+
+
+class FFI:
+    """ Replacement of cffi.FFI: pointers are python objects, nothing is allocated in C memory """
+
+    NULL = None
+    CData = CData
+
+    def new(self, ctype, init=None):
+        return CData(ctype.replace(' ', ''), init)
+
+    def cast(self, ctype, value):
+        return value
+
+    def string(self, cdata):
+        items = itertools.takewhile(lambda c: c != 0, cdata.items)
+        return bytes(items)
+
+    def buffer(self, cdata, size):
+        return bytearray(size)
+
+    def sizeof(self, value):
+        return value.nbytes if isinstance(value, CData) else 4
+
+    def typeof(self, value):
+        return types.SimpleNamespace(kind='array' if value.ctype.endswith('[]') else 'pointer')
+
+    def callback(self, signature):
+        return lambda f: f
+
+    def dlopen(self, path):
+        return types.SimpleNamespace(path=path)
+
+
+ffi = FFI()
+
+
+def _get_global_names(file_path):
+    """ Returns (referenced, defined) global names of python module """
+    table = symtable.symtable(file_path.read_text(), str(file_path), 'exec')
+
+    defined = {s.get_name() for s in table.get_symbols() if s.is_assigned() or s.is_imported()}
+    referenced = set()
+
+    tables = [table]
+    while tables:
+        t = tables.pop()
+        tables.extend(t.get_children())
+        referenced.update(s.get_name() for s in t.get_symbols()
+                          if s.is_referenced() and (t is table or s.is_global()))
+
+    return referenced, defined
+
+
+def _get_attribute_names(file_paths, module_aliases):
+    """ Returns names of attributes of modules module_aliases used or imported in files """
+    names = set()
+    for file_path in file_paths:
+        tree = ast.parse(file_path.read_text(), str(file_path))
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and \
+                    node.value.id in module_aliases:
+                names.add(node.attr)
+
+            elif isinstance(node, ast.ImportFrom) and node.module in module_aliases:
+                names.update(alias.name for alias in node.names)
+
+    return names
+
+
+def _is_constant_name(name):
+    return name.isupper()
+
+
+def _is_function_name(name):
+    return name[0].isupper() and not name.isupper()
+
+
+def _create_wrap_module(module_name, lib_name, bindings_files, module_aliases):
+    """
+    Creates fake generated wrapper of core library which exports constants and functions
+    used by bindings_files and by addon through module_aliases
+    """
+    module = types.ModuleType(module_name)
+    module.ffi = ffi
+    module.lib = types.SimpleNamespace()
+
+    defined = set()
+    names = set()
+    for file_name in bindings_files:
+        file_referenced, file_defined = _get_global_names(BINDINGS_DIR / file_name)
+        defined |= file_defined
+        names |= file_referenced
+
+    names |= _get_attribute_names(
+        itertools.chain(ADDON_DIR.rglob('*.py'), BINDINGS_DIR.glob('*.py')), module_aliases)
+    names -= defined | set(dir(builtins))
+
+    handles = itertools.count(1)
+    values = {}
+
+    def get_constant(name):
+        if name not in values:
+            if 'VERSION' in name or 'COMMIT' in name:
+                value = 1
+            elif name == 'SUCCESS':
+                value = SUCCESS
+            elif 'FLAGS' in name:
+                # creation flags are combined by bitwise or
+                value = 1 << sum('FLAGS' in n for n in values)
+            else:
+                value = 1000 + len(values)
+            values[name] = value
+
+        return values[name]
+
+    def create_function(name):
+        record_name = f"{lib_name}::{name}"
+
+        def function(*argv):
+            recorder.record(record_name, argv)
+
+            # created object is the last argument, it gets unique handle
+            if 'Create' in name and argv:
+                handle_ptr = getattr(argv[-1], '_handle_ptr', None)
+                if handle_ptr is not None and not handle_ptr[0]:
+                    handle_ptr[0] = next(handles)
+
+            elif name == 'ContextGetInfo':
+                _context_get_info(*argv)
+
+            return SUCCESS
+
+        function.__name__ = name
+        return function
+
+    def _context_get_info(context, info, size, ptr, size_ptr):
+        name = next((n for n, v in values.items() if v == info), None)
+        value = DEVICE_NAMES.get(name)
+        if value is None:
+            return
+
+        data = value.encode() + b'\0'
+        if size_ptr is not None:
+            size_ptr[0] = len(data)
+        if ptr is not None and size >= len(data):
+            ptr.items[:len(data)] = data
+
+    def module_getattr(name):
+        if _is_constant_name(name):
+            return get_constant(name)
+
+        if _is_function_name(name):
+            return create_function(name)
+
+        raise AttributeError(f"module '{module_name}' has no attribute '{name}'")
+
+    module.__getattr__ = module_getattr
+
+    constants = sorted(n for n in names if _is_constant_name(n))
+    functions = sorted(n for n in names if _is_function_name(n))
+    for name in constants:
+        setattr(module, name, get_constant(name))
+    for name in functions:
+        setattr(module, name, create_function(name))
+
+    module._constants_names = constants
+    module._functions_names = functions
+    module._types_names = []
+    module.__all__ = ['ffi', 'lib'] + constants + functions
+
+    return module
+
+
+def install():
+    """ Registers fake core libraries and imports real pyrpr bindings on top of them """
+    if 'pyrprwrap' in sys.modules:
+        return
+
+    sys.modules['pyrprwrap'] = _create_wrap_module(
+        'pyrprwrap', 'RPR', ('pyrpr.py', 'pyrpr2.py', 'pyhybrid.py'), ('pyrpr',))
+    sys.modules['pyrprimagefilterswrap'] = _create_wrap_module(
+        'pyrprimagefilterswrap', 'RIF', ('pyrprimagefilters.py',), ('rif', 'pyrprimagefilters'))
+    sys.modules['_pyrpr_load_store'] = types.SimpleNamespace(ffi=ffi)
+
+    # native helper library of addon: Sun & Sky and OpenVDB functions
+    sys.modules['rprblender.utils.helper_lib'] = mock.MagicMock(name='helper_lib')
+
+    if str(BINDINGS_DIR) not in sys.path:
+        sys.path.append(str(BINDINGS_DIR))
+
+    import pyrpr
+    import pyrprimagefilters
+    import pyrpr_load_store
+
+    def log_fun(*args):
+        pass
+
+    # constants names composed at runtime, like ENVIRONMENT_LIGHT_OVERRIDE_{type}
+    pyrpr.__getattr__ = sys.modules['pyrprwrap'].__getattr__
+    pyrprimagefilters.__getattr__ = sys.modules['pyrprimagefilterswrap'].__getattr__
+
+    pyrpr._init_data._log_fun = log_fun
+    pyrprimagefilters._init_data._log_fun = log_fun
+    pyrpr_load_store.lib = types.SimpleNamespace(rprsExport=lambda *argv: SUCCESS)
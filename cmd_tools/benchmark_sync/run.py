@@ -0,0 +1,507 @@
+#**********************************************************************
+# Copyright 2020 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#********************************************************************
+
+# headless benchmarks of scene sync: RenderEngine.sync and mesh, material, instance, hair exporters,
+# and mesh geometry update
+# run on synthetic scenes with mocked bpy and call recording pyrpr, no Blender and GPU are needed
+# usage: python cmd_tools/benchmark_sync/run.py [--scales small medium large] [--repeat 5]
+#                                               [--update-baseline] [--report report.json]
+#                                               [--sync-workers 2] [--phases]
+#   results are compared with baseline.json, exit code is 1 if any benchmark regressed
+
+import argparse
+import gc
+import itertools
+import json
+import logging
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+benchmark_path = Path(__file__).resolve().parent
+src_path = str((benchmark_path.parent.parent/'src').resolve())
+for path in (str(benchmark_path), src_path):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import mock_bpy
+import mock_pyrpr
+
+mock_bpy.install()
+mock_pyrpr.install()
+
+import bpy
+import pyrpr
+from pyrpr_profiler import profiler
+
+import rprblender
+from rprblender import config
+from rprblender.engine.context import RPRContext
+from rprblender.engine.render_engine import RenderEngine
+from rprblender.engine.viewport_engine import ViewportEngine
+from rprblender.export import mesh, material, instance, hair, particle
+
+import scenes
+
+
+BASELINE_PATH = benchmark_path/'baseline.json'
+
+# relative increase of time, memory peak or core calls count which is reported as regression,
+# best of several runs is compared but short benchmarks are still noisy
+DEFAULT_TOLERANCE = 0.5
+
+
+class MockRenderEngine:
+    """ bpy.types.RenderEngine instance which is passed to RenderEngine """
+
+    def test_break(self):
+        return False
+
+    def update_stats(self, stats, info):
+        pass
+
+    def update_progress(self, progress):
+        pass
+
+    def add_pass(self, name, channels, chan_id, layer=None):
+        pass
+
+
+# faces of mesh chunk of 'mesh_chunked' benchmark
+MESH_CHUNK_SIZE = 500000
+
+# persistent mesh cache of 'mesh_cached' benchmark
+MESH_CACHE_DIR = None
+
+# persistent cache of compiled materials
+MATERIAL_CACHE_DIR = None
+
+
+def setup():
+    global MESH_CACHE_DIR, MATERIAL_CACHE_DIR
+
+    rprblender.properties.register()
+
+    # core cache of created contexts shouldn't be written to addon folder
+    cache_path = Path(tempfile.mkdtemp(prefix='rpr_benchmark_'))
+    MESH_CACHE_DIR = cache_path / 'meshes'
+    MATERIAL_CACHE_DIR = cache_path / 'materials'
+    config.material_cache_dir = MATERIAL_CACHE_DIR
+    for module_name in ('pyrpr', 'pyrpr2', 'pyhybrid'):
+        module = sys.modules.get(module_name)
+        if module:
+            module.Context.cache_path = cache_path
+
+    # debug logging of every exported object would dominate measured time
+    logging.getLogger('rpr').setLevel(logging.WARNING)
+
+
+def create_context(depsgraph):
+    scene = depsgraph.scene
+    rpr_context = RPRContext()
+    scene.rpr.init_rpr_context(rpr_context)
+    rpr_context.scene.set_name(scene.name)
+    rpr_context.blender_data['depsgraph'] = depsgraph
+    return rpr_context
+
+
+def mesh_objects(depsgraph):
+    return [obj for obj in depsgraph.objects if obj.type == 'MESH']
+
+
+def hair_objects(depsgraph):
+    return [obj for obj in mesh_objects(depsgraph)
+            if any(p_sys.settings.type == 'HAIR' for p_sys in obj.particle_systems)]
+
+
+def emitter_objects(depsgraph):
+    return [obj for obj in mesh_objects(depsgraph) if any(particle.emitter_p_sys(obj))]
+
+
+def instances(depsgraph):
+    return [inst for inst in depsgraph.object_instances if inst.is_instance]
+
+
+def materials(depsgraph):
+    return list({slot.material.name_full: slot.material
+                 for obj in mesh_objects(depsgraph) for slot in obj.material_slots}.values())
+
+
+# worker threads of mesh data preparation used by 'sync_threaded' benchmark
+SYNC_WORKERS = 2
+
+
+def bench_sync(depsgraph, workers=0):
+    # RenderEngine keeps only weak reference to rpr_engine
+    rpr_engine = MockRenderEngine()
+    engine = RenderEngine(rpr_engine)
+
+    def run():
+        sync_mesh_workers = config.sync_mesh_workers
+        config.sync_mesh_workers = workers
+        try:
+            engine.sync(depsgraph)
+        finally:
+            config.sync_mesh_workers = sync_mesh_workers
+
+        assert engine.is_synced and rpr_engine
+
+    return run
+
+
+def bench_sync_threaded(depsgraph):
+    # mesh data is prepared by worker threads while core calls are made by sync thread
+    return bench_sync(depsgraph, SYNC_WORKERS)
+
+
+def bench_mesh(depsgraph):
+    rpr_context = create_context(depsgraph)
+    objs = mesh_objects(depsgraph)
+
+    def run():
+        for obj in objs:
+            mesh.sync(rpr_context, obj)
+
+    return run
+
+
+def bench_mesh_triangles(depsgraph):
+    # mesh export with all faces triangulated, like for cores without quads support
+    run_mesh = bench_mesh(depsgraph)
+
+    def run():
+        config.mesh_export_polygons = False
+        try:
+            run_mesh()
+        finally:
+            config.mesh_export_polygons = True
+
+    return run
+
+
+def bench_mesh_chunked(depsgraph):
+    # export of big meshes by chunks, small meshes are exported as is
+    run_mesh = bench_mesh(depsgraph)
+
+    def run():
+        config.mesh_export_chunk_size = MESH_CHUNK_SIZE
+        try:
+            run_mesh()
+        finally:
+            config.mesh_export_chunk_size = 0
+
+    return run
+
+
+def bench_mesh_cached(depsgraph):
+    # mesh export with all meshes found in persistent mesh cache, it is filled by warming up run
+    run_mesh = bench_mesh(depsgraph)
+
+    def run():
+        mesh_cache_dir, mesh_cache_min_polygons = config.mesh_cache_dir, config.mesh_cache_min_polygons
+        config.mesh_cache_dir, config.mesh_cache_min_polygons = MESH_CACHE_DIR, 0
+        try:
+            run_mesh()
+        finally:
+            config.mesh_cache_dir, config.mesh_cache_min_polygons = mesh_cache_dir, mesh_cache_min_polygons
+
+    return run
+
+
+def bench_deform(depsgraph):
+    # geometry update of meshes which topology isn't changed, like armature deformation
+    rpr_context = create_context(depsgraph)
+    objs = mesh_objects(depsgraph)
+    for obj in objs:
+        mesh.sync(rpr_context, obj)
+
+    def update():
+        rpr_context.start_update()
+        for obj in objs:
+            mesh.sync_update(rpr_context, obj, True, False)
+
+    # the first geometry update exports meshes fully and starts tracking their deformation
+    update()
+    return update
+
+
+def bench_material(depsgraph):
+    # export with parsing of node trees, material cache is disabled
+    rpr_context = create_context(depsgraph)
+    mats = materials(depsgraph)
+
+    def run():
+        material_cache_max_count = config.material_cache_max_count
+        config.material_cache_max_count = 0
+        try:
+            for mat in mats:
+                material.sync(rpr_context, mat)
+        finally:
+            config.material_cache_max_count = material_cache_max_count
+
+    return run
+
+
+def bench_material_cached(depsgraph):
+    # export with all materials found in material cache, it is filled by warming up run
+    rpr_context = create_context(depsgraph)
+    mats = materials(depsgraph)
+
+    def run():
+        for mat in mats:
+            material.sync(rpr_context, mat)
+
+    return run
+
+
+def bench_material_update(depsgraph):
+    # viewport update of material socket value, material nodes are updated in place
+    rpr_context = create_context(depsgraph)
+    rpr_context.engine_type = ViewportEngine.TYPE
+    mats = materials(depsgraph)
+    for mat in mats:
+        material.sync(rpr_context, mat)
+
+    ior_values = itertools.cycle((1.3, 1.6))
+
+    def run():
+        ior = next(ior_values)
+        for mat in mats:
+            mat.node_tree.nodes['Fresnel'].inputs['IOR'].default_value = ior
+            if not material.update_params(rpr_context, mat):
+                material.sync_update(rpr_context, mat)
+
+    return run
+
+
+def bench_instance(depsgraph):
+    rpr_context = create_context(depsgraph)
+    for obj in mesh_objects(depsgraph):
+        mesh.sync(rpr_context, obj)
+    insts = instances(depsgraph)
+
+    def run():
+        # instances are grouped by instanced object and created at once, like engines do
+        instances_batch = instance.InstancesBatch(rpr_context)
+        for inst in insts:
+            instances_batch.add(inst)
+        instances_batch.export()
+
+    return run
+
+
+def bench_hair(depsgraph):
+    rpr_context = create_context(depsgraph)
+    objs = hair_objects(depsgraph)
+
+    def run():
+        for obj in objs:
+            hair.sync(rpr_context, obj)
+
+    return run
+
+
+def bench_particle(depsgraph):
+    objs = emitter_objects(depsgraph)
+
+    def run():
+        rpr_context = create_context(depsgraph)
+        for obj in objs:
+            particle.sync(rpr_context, obj)
+
+    return run
+
+
+def bench_particle_update(depsgraph):
+    # viewport update of exported particles, existing instances are reused
+    rpr_context = create_context(depsgraph)
+    objs = emitter_objects(depsgraph)
+    for obj in objs:
+        particle.sync(rpr_context, obj)
+
+    def run():
+        for obj in objs:
+            particle.sync_update(rpr_context, obj, True, False)
+
+    return run
+
+
+# benchmark name -> function(depsgraph) which prepares data and returns measured function
+BENCHMARKS = {
+    'sync': bench_sync,
+    'sync_threaded': bench_sync_threaded,
+    'mesh': bench_mesh,
+    'mesh_triangles': bench_mesh_triangles,
+    'mesh_chunked': bench_mesh_chunked,
+    'mesh_cached': bench_mesh_cached,
+    'deform': bench_deform,
+    'material': bench_material,
+    'material_cached': bench_material_cached,
+    'material_update': bench_material_update,
+    'instance': bench_instance,
+    'hair': bench_hair,
+    'particle': bench_particle,
+    'particle_update': bench_particle_update,
+}
+
+
+def measure(prepare, depsgraph, repeat):
+    """ Returns best and median time, memory peak and core calls count of prepared function """
+    # warming up: lazy imports and caches of python code aren't measured
+    prepare(depsgraph)()
+
+    times = []
+    for _ in range(repeat):
+        run = prepare(depsgraph)
+        gc.collect()
+        mock_pyrpr.recorder.reset()
+
+        time_begin = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - time_begin)
+
+    core_calls = mock_pyrpr.recorder.get_report()
+    # wall times of engine phases are collected by profiler in the last timed run
+    phases = {name: phase['wall'] for name, phase in profiler.get_report().items()
+              if 'wall' in phase}
+
+    # tracing slows down python code, so memory is measured by separate run
+    run = prepare(depsgraph)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'time': round(min(times), 6),
+        'median_time': round(statistics.median(times), 6),
+        'peak_memory': peak,
+        'core_calls': sum(c['count'] for c in core_calls.values()),
+        'core_bytes': sum(c['bytes'] for c in core_calls.values()),
+    }, phases
+
+
+def print_phases(phases):
+    """ Prints phases timeline, busy time longer than begin-end interval means threads overlap """
+    for name, wall in phases.items():
+        print(f"    {name:18} {wall['begin']:8.4f}s - {wall['end']:8.4f}s  "
+              f"busy {wall['busy_time']:8.4f}s  count {wall['count']}")
+
+
+def run_benchmarks(scale_names, benchmark_names, repeat, show_phases=False):
+    results = {}
+    for scale_name in scale_names:
+        settings = scenes.SCALES[scale_name]
+        print(f"Scale '{scale_name}': {settings}")
+
+        depsgraph = scenes.create_scene(settings)
+        results[scale_name] = {}
+        for name in benchmark_names:
+            profiler.reset()
+            result, phases = measure(BENCHMARKS[name], depsgraph, repeat)
+            results[scale_name][name] = result
+            print(f"  {name:14} {result['time']:9.4f}s  (median {result['median_time']:.4f}s)  "
+                  f"peak {result['peak_memory'] / 2**20:8.2f} MB  "
+                  f"core calls {result['core_calls']}")
+            if show_phases:
+                print_phases(phases)
+
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """ Prints comparison with baseline, returns list of regressions """
+    regressions = []
+    for scale_name, scale_results in results.items():
+        for name, result in scale_results.items():
+            base = baseline.get(scale_name, {}).get(name)
+            if not base:
+                print(f"{scale_name}/{name}: no baseline")
+                continue
+
+            changes = []
+            for field in ('time', 'peak_memory', 'core_calls'):
+                ratio = result[field] / base[field] if base[field] else 1.0
+                changes.append(f"{field} {ratio:5.2f}x")
+                if ratio > 1.0 + tolerance:
+                    regressions.append((scale_name, name, field, base[field], result[field]))
+
+            print(f"{scale_name}/{name}: {', '.join(changes)}")
+
+    return regressions
+
+
+def main():
+    global SYNC_WORKERS
+
+    parser = argparse.ArgumentParser(description="Benchmarks of scene sync on synthetic scenes")
+    parser.add_argument('--scales', nargs='+', choices=tuple(scenes.SCALES),
+                        default=['small', 'medium'])
+    parser.add_argument('--benchmarks', nargs='+', choices=tuple(BENCHMARKS),
+                        default=list(BENCHMARKS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed relative increase of time, memory peak and core calls")
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="store results as new baseline")
+    parser.add_argument('--report', type=Path, help="save results to JSON file")
+    parser.add_argument('--sync-workers', type=int, default=SYNC_WORKERS,
+                        help="mesh data worker threads of 'sync_threaded' benchmark")
+    parser.add_argument('--phases', action='store_true',
+                        help="print wall time of engine phases of the last run")
+    args = parser.parse_args()
+
+    SYNC_WORKERS = args.sync_workers
+
+    setup()
+    # phases are recorded only by enabled profiler, core calls are recorded by mock pyrpr anyway
+    profiler.enabled = args.phases
+    try:
+        results = run_benchmarks(args.scales, args.benchmarks, args.repeat, args.phases)
+    finally:
+        # cached meshes of big scenes take a lot of disk space
+        shutil.rmtree(MESH_CACHE_DIR, ignore_errors=True)
+        shutil.rmtree(MATERIAL_CACHE_DIR, ignore_errors=True)
+
+    if args.report:
+        args.report.write_text(json.dumps(results, indent=2))
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.is_file() else {}
+
+    if args.update_baseline:
+        for scale_name, scale_results in results.items():
+            baseline.setdefault(scale_name, {}).update(scale_results)
+        args.baseline.write_text(json.dumps(baseline, indent=2) + '\n')
+        print(f"Baseline is saved to {args.baseline}")
+        return 0
+
+    print(f"\nComparison with baseline {args.baseline}:")
+    regressions = compare(results, baseline, args.tolerance)
+    for scale_name, name, field, base, value in regressions:
+        print(f"REGRESSION {scale_name}/{name} {field}: {base} -> {value}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,392 @@
+#**********************************************************************
+# Copyright 2020 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#********************************************************************
+"""
+Synthetic depsgraphs for sync benchmarks.
+
+Scene consists of grid meshes, instances of these meshes, materials with chains of math nodes,
+hair and emitter particle systems. All mesh and hair data is generated by numpy with fixed seed,
+mock_bpy has to be installed before this module is imported.
+"""
+
+import math
+import types
+from dataclasses import dataclass
+
+import numpy as np
+
+import bpy
+import mathutils
+
+from mock_bpy import Collection, PARTICLE_ALIVE_STATES
+
+
+@dataclass
+class SceneSettings:
+    meshes: int = 10
+    triangles: int = 2000            # triangles per mesh
+    instances: int = 100
+    linked_duplicates: int = 100     # objects which share mesh data of the last mesh
+    materials: int = 5
+    mesh_materials: int = 2          # material slots per mesh
+    material_nodes: int = 4          # math nodes per material
+    hair_meshes: int = 1             # first meshes get hair particle system
+    strands: int = 1000              # hair strands per particle system
+    render_step: int = 3             # 2 ** render_step + 1 points per strand
+    emitter_meshes: int = 1          # meshes after hair ones get emitter particle system
+    particles: int = 10000           # particles per emitter particle system
+
+
+SCALES = {
+    'small': SceneSettings(),
+    'medium': SceneSettings(meshes=50, triangles=20000, instances=2000, linked_duplicates=1000,
+                            materials=20, material_nodes=8, hair_meshes=2, strands=10000,
+                            emitter_meshes=2, particles=50000),
+    'large': SceneSettings(meshes=200, triangles=50000, instances=20000, linked_duplicates=3000,
+                           materials=50, material_nodes=16, hair_meshes=4, strands=50000,
+                           emitter_meshes=4, particles=200000),
+    # single heavy mesh with many materials
+    'dense': SceneSettings(meshes=1, triangles=5000000, instances=0, linked_duplicates=0,
+                           materials=40, mesh_materials=40, hair_meshes=0, emitter_meshes=0),
+}
+
+
+class DataCollection:
+    """ Collection of mesh elements (vertices, loop_triangles, uv data) backed by numpy arrays """
+
+    def __init__(self, length, **arrays):
+        self.length = length
+        self.arrays = arrays
+
+    def __len__(self):
+        return self.length
+
+    def foreach_get(self, attribute, data):
+        data[:] = self.arrays[attribute].ravel()
+
+    def __iter__(self):
+        # slow path, it is used only by code which iterates elements in python
+        names = tuple(self.arrays)
+        for values in zip(*(self.arrays[name] for name in names)):
+            yield types.SimpleNamespace(**dict(zip(names, values)))
+
+
+def create_grid_mesh(name, triangles, materials_count, rng, use_auto_smooth=False):
+    """ Creates mesh of n x n smooth quads grid with randomly displaced vertices """
+    n = max(1, int(math.sqrt(triangles / 2)))
+    tris_len = 2 * n * n
+
+    x, y = np.meshgrid(np.linspace(-1.0, 1.0, n + 1, dtype=np.float32),
+                       np.linspace(-1.0, 1.0, n + 1, dtype=np.float32))
+    z = rng.random((n + 1, n + 1), dtype=np.float32) * 0.1
+    vertices = np.stack((x, y, z), axis=-1).reshape(-1, 3)
+
+    # quads with 4 loops each, every quad is split to 2 triangles
+    i, j = np.meshgrid(np.arange(n, dtype=np.int32), np.arange(n, dtype=np.int32))
+    v0 = (j * (n + 1) + i).ravel()
+    v1, v2, v3 = v0 + 1, v0 + n + 2, v0 + n + 1
+    loop_vertices = np.stack((v0, v1, v2, v3), axis=-1).ravel()
+    quad_loops = np.arange(4 * n * n, dtype=np.int32).reshape(-1, 4)
+    tri_loops = quad_loops[:, [[0, 1, 2], [0, 2, 3]]].reshape(-1, 3)
+    tri_vertices = loop_vertices[tri_loops]
+    quad_vertices = loop_vertices.reshape(-1, 4)
+    edges = np.unique(np.sort(np.stack((quad_vertices, np.roll(quad_vertices, -1, axis=1)),
+                                       axis=-1).reshape(-1, 2), axis=1), axis=0)
+
+    # normals of height field z(x, y), split normals of smooth mesh are vertex normals
+    dz_dy, dz_dx = np.gradient(z, 2.0 / n)
+    vertex_normals = np.stack((-dz_dx, -dz_dy, np.ones_like(z)), axis=-1).reshape(-1, 3)
+    vertex_normals /= np.linalg.norm(vertex_normals, axis=1)[:, np.newaxis]
+    loop_normals = vertex_normals[loop_vertices]
+
+    polygon_material_indices = np.arange(n * n, dtype=np.int32) * materials_count // (n * n)
+    areas = np.full(tris_len, 2.0 / tris_len, dtype=np.float32)
+
+    uv_layer = bpy.types.MeshUVLoopLayer(
+        name='UVMap', active_render=True,
+        data=DataCollection(len(loop_vertices), uv=(vertices[loop_vertices, :2] + 1.0) / 2.0))
+
+    vertex_colors = Collection()
+    vertex_colors.active = None
+
+    mesh = bpy.types.Mesh(
+        name=name,
+        vertices=DataCollection(len(vertices), co=vertices, normal=vertex_normals),
+        polygons=DataCollection(n * n, loop_start=quad_loops[:, 0],
+                                loop_total=np.full(n * n, 4, dtype=np.int32),
+                                material_index=polygon_material_indices,
+                                use_smooth=np.ones(n * n, dtype=bool),
+                                normal=vertex_normals[loop_vertices[0::4]],
+                                area=areas[0::2] * 2.0),
+        loops=DataCollection(len(loop_vertices), vertex_index=loop_vertices, normal=loop_normals),
+        edges=DataCollection(len(edges), vertices=edges,
+                             use_edge_sharp=np.zeros(len(edges), dtype=bool)),
+        loop_triangles=DataCollection(tris_len, vertices=tri_vertices, loops=tri_loops,
+                                      material_index=np.repeat(polygon_material_indices, 2),
+                                      polygon_index=np.repeat(np.arange(n * n, dtype=np.int32), 2),
+                                      area=areas),
+        uv_layers=Collection(items=(uv_layer,)),
+        vertex_colors=vertex_colors,
+        use_auto_smooth=use_auto_smooth,
+        auto_smooth_angle=math.radians(30.0),
+        has_custom_normals=False,
+        calc_normals_split=lambda: None,
+        calc_loop_triangles=lambda: None,
+    )
+    return mesh
+
+
+def create_socket(name, default_value=0.0, is_shader=False):
+    socket_type = bpy.types.NodeSocketShader if is_shader else bpy.types.NodeSocketFloat
+    return socket_type(name=name, default_value=default_value, is_linked=False, links=[])
+
+
+def create_node(bl_idname, name, inputs=(), outputs=(), **kwargs):
+    # socket identifiers are unique in node like Blender does: 'Value', 'Value_001', ...
+    for is_output, sockets in ((False, inputs), (True, outputs)):
+        names = {}
+        for socket in sockets:
+            index = names.get(socket.name, 0)
+            names[socket.name] = index + 1
+            socket.identifier = f'{socket.name}_{index:03}' if index else socket.name
+            socket.is_output = is_output
+
+    return bpy.types.ShaderNode(
+        bl_idname=bl_idname, name=name, mute=False,
+        inputs=Collection(items=inputs),
+        outputs=Collection(items=outputs),
+        **kwargs)
+
+
+def link(from_node, from_socket, to_node, to_socket):
+    from_socket = from_node.outputs[from_socket]
+    to_socket = to_node.inputs[to_socket]
+
+    node_link = bpy.types.NodeLink(from_node=from_node, from_socket=from_socket,
+                                   to_node=to_node, to_socket=to_socket, is_valid=True)
+    for socket in (from_socket, to_socket):
+        socket.is_linked = True
+        socket.links.append(node_link)
+
+
+PRINCIPLED_INPUTS = (
+    ('Base Color', (0.8, 0.8, 0.8, 1.0)), ('Subsurface', 0.0),
+    ('Subsurface Radius', (1.0, 0.2, 0.1)), ('Subsurface Color', (0.8, 0.8, 0.8, 1.0)),
+    ('Metallic', 0.0), ('Specular', 0.5), ('Specular Tint', 0.0), ('Roughness', 0.5),
+    ('Anisotropic', 0.0), ('Anisotropic Rotation', 0.0), ('Sheen', 0.0), ('Sheen Tint', 0.5),
+    ('Clearcoat', 0.0), ('Clearcoat Roughness', 0.03), ('IOR', 1.45), ('Transmission', 0.0),
+    ('Transmission Roughness', 0.0), ('Emission', (0.0, 0.0, 0.0, 1.0)), ('Alpha', 1.0),
+    ('Normal', (0.0, 0.0, 0.0)), ('Clearcoat Normal', (0.0, 0.0, 0.0)),
+    ('Tangent', (0.0, 0.0, 0.0)),
+)
+
+MATH_OPERATIONS = ('ADD', 'MULTIPLY', 'SUBTRACT', 'MAXIMUM', 'SINE', 'POWER')
+
+
+def create_material(name, nodes_count, rng):
+    """
+    Creates material: Principled BSDF with chain of nodes_count math nodes starting from Fresnel
+    node linked to Roughness and RGB node multiplied by grayscale of this chain linked to Base Color
+    """
+    output = create_node('ShaderNodeOutputMaterial', 'Material Output', is_active_output=True,
+                         inputs=(create_socket('Surface', None, True),
+                                 create_socket('Volume', None, True),
+                                 create_socket('Displacement', (0.0, 0.0, 0.0))))
+    principled = create_node('ShaderNodeBsdfPrincipled', 'Principled BSDF',
+                             inputs=[create_socket(*i) for i in PRINCIPLED_INPUTS],
+                             outputs=(create_socket('BSDF', None, True),))
+    rgb = create_node('ShaderNodeRGB', 'RGB',
+                      outputs=(create_socket('Color', tuple(rng.random(3)) + (1.0,)),))
+    nodes = [output, principled, rgb]
+
+    link(principled, 'BSDF', output, 'Surface')
+
+    # math nodes aren't constant, so they are exported as core arithmetic nodes
+    prev_node = create_node('ShaderNodeFresnel', 'Fresnel',
+                            inputs=(create_socket('IOR', 1.45),
+                                    create_socket('Normal', (0.0, 0.0, 0.0))),
+                            outputs=(create_socket('Fac'),))
+    nodes.append(prev_node)
+
+    for i in range(nodes_count):
+        node = create_node('ShaderNodeMath', f'Math.{i:03}', use_clamp=i == nodes_count - 1,
+                           operation=MATH_OPERATIONS[i % len(MATH_OPERATIONS)],
+                           inputs=[create_socket('Value', float(rng.random())) for _ in range(3)],
+                           outputs=(create_socket('Value'),))
+        link(prev_node, prev_node.outputs[0].name, node, 0)
+        nodes.append(node)
+        prev_node = node
+
+    link(prev_node, prev_node.outputs[0].name, principled, 'Roughness')
+
+    # color helpers produce identity and duplicated arithmetic operations
+    bw = create_node('ShaderNodeRGBToBW', 'RGB to BW',
+                     inputs=(create_socket('Color', (0.5, 0.5, 0.5, 1.0)),),
+                     outputs=(create_socket('Val'),))
+    mix = create_node('ShaderNodeMixRGB', 'Mix', blend_type='MULTIPLY', use_clamp=False,
+                      inputs=(create_socket('Fac', 1.0),
+                              create_socket('Color1', (0.5, 0.5, 0.5, 1.0)),
+                              create_socket('Color2', (0.5, 0.5, 0.5, 1.0))),
+                      outputs=(create_socket('Color', (0.0, 0.0, 0.0, 1.0)),))
+    nodes.extend((bw, mix))
+
+    link(prev_node, prev_node.outputs[0].name, bw, 'Color')
+    link(rgb, 'Color', mix, 'Color1')
+    link(bw, 'Val', mix, 'Color2')
+    link(mix, 'Color', principled, 'Base Color')
+
+    node_tree = bpy.types.ShaderNodeTree(name=name, nodes=Collection(items=nodes))
+    return bpy.types.Material(name=name, node_tree=node_tree, pass_index=0,
+                              cycles=types.SimpleNamespace(displacement_method='BUMP'))
+
+
+class HairParticleSystem(bpy.types.ParticleSystem):
+    """ Hair particle system with procedurally generated strands """
+
+    def __init__(self, name, strands, render_step, rng):
+        super().__init__(name=name)
+        self.settings = bpy.types.ParticleSettings(
+            name=name, type='HAIR', render_type='PATH', material=1,
+            render_step=render_step, display_step=render_step, child_type='NONE',
+            radius_scale=0.01, root_radius=1.0, tip_radius=0.0, shape=0.0, use_close_tip=True)
+        self.particles = tuple(range(strands))
+        self.child_particles = ()
+
+        length = 2 ** render_step + 1
+        self._points = rng.random((strands, length, 3), dtype=np.float32)
+        self._uvs = rng.random((strands, 2), dtype=np.float32)
+
+    def co_hair(self, obj, particle_no=0, step=0):
+        return mathutils.Vector(self._points[particle_no, step])
+
+    def uv_on_emitter(self, modifier, particle=None):
+        return mathutils.Vector(self._uvs[particle])
+
+
+class EmitterParticleSystem(bpy.types.ParticleSystem):
+    """ Emitter particle system of randomly placed and rotated particles, most of them are alive """
+
+    def __init__(self, name, count, rng):
+        super().__init__(name=name)
+        self.settings = bpy.types.ParticleSettings(name=name, type='EMITTER', render_type='HALO',
+                                                   material=1)
+
+        rotations = rng.normal(size=(count, 4)).astype(np.float32)
+        rotations /= np.linalg.norm(rotations, axis=1)[:, np.newaxis]
+        locations = rng.random((count, 3), dtype=np.float32) * 10.0
+        # Particle.alive_state values of foreach_get are DNA values of enum items
+        alive_states = np.where(rng.random(count) < 0.9, PARTICLE_ALIVE_STATES['ALIVE'],
+                                PARTICLE_ALIVE_STATES['UNBORN']).astype(np.int32)
+        self.particles = DataCollection(
+            count, alive_state=alive_states, location=locations, prev_location=locations * 0.99,
+            rotation=rotations, size=rng.random(count, dtype=np.float32) * 0.1)
+
+
+def create_object(name, obj_type, data, matrix_world, **kwargs):
+    obj = bpy.types.Object(
+        name=name, type=obj_type, mode='OBJECT', data=data, matrix_world=matrix_world,
+        pass_index=0, hide_render=False, modifiers=[], particle_systems=[], material_slots=[],
+        show_instancer_for_render=True, show_instancer_for_viewport=True,
+        cycles_visibility=types.SimpleNamespace(camera=True, diffuse=True, glossy=True,
+                                                transmission=True, scatter=True, shadow=True),
+        **kwargs)
+    obj.indirect_only_get = lambda view_layer=None: False
+    return obj
+
+
+def create_instance(parent, obj, random_id, matrix_world):
+    return bpy.types.DepsgraphObjectInstance(
+        is_instance=True, parent=parent, object=obj, instance_object=obj,
+        random_id=random_id, matrix_world=matrix_world)
+
+
+def create_scene(settings: SceneSettings, seed=0):
+    """ Creates scene with settings, returns its depsgraph """
+    rng = np.random.default_rng(seed)
+
+    materials = [create_material(f'Material.{i:03}', settings.material_nodes, rng)
+                 for i in range(settings.materials)]
+
+    objects = []
+    for i in range(settings.meshes):
+        mesh_materials = [materials[(i + k) % len(materials)]
+                          for k in range(settings.mesh_materials)] if materials else []
+        mesh = create_grid_mesh(f'Mesh.{i:03}', settings.triangles, len(mesh_materials), rng,
+                                use_auto_smooth=i % 2 == 1)
+        obj = create_object(f'Mesh.{i:03}', 'MESH', mesh,
+                            mathutils.Matrix.Translation((i * 2.5, 0.0, 0.0)))
+        obj.material_slots = [bpy.types.MaterialSlot(name=mat.name, material=mat)
+                              for mat in mesh_materials]
+
+        if i < settings.hair_meshes:
+            p_sys = HairParticleSystem(f'Hair.{i:03}', settings.strands, settings.render_step, rng)
+            obj.particle_systems = [p_sys]
+            obj.modifiers = [bpy.types.ParticleSystemModifier(
+                name=p_sys.name, type='PARTICLE_SYSTEM', show_render=True, particle_system=p_sys)]
+
+        elif i < settings.hair_meshes + settings.emitter_meshes:
+            p_sys = EmitterParticleSystem(f'Emitter.{i:03}', settings.particles, rng)
+            obj.particle_systems = [p_sys]
+            obj.modifiers = [bpy.types.ParticleSystemModifier(
+                name=p_sys.name, type='PARTICLE_SYSTEM', show_render=True, particle_system=p_sys)]
+
+        objects.append(obj)
+
+    if objects and settings.linked_duplicates:
+        source = objects[-1]
+        source.data.users = settings.linked_duplicates + 1
+        offsets = rng.random((settings.linked_duplicates, 3)) * 100.0
+        for i in range(settings.linked_duplicates):
+            obj = create_object(f'{source.name}.{i + 1:03}', 'MESH', source.data,
+                                mathutils.Matrix.Translation(offsets[i]))
+            obj.material_slots = source.material_slots
+            objects.append(obj)
+
+    # instances of meshes, they are parented by collection instancer empty
+    instancer = create_object('Instancer', 'EMPTY', None, mathutils.Matrix.Identity(4))
+    instances = []
+    if objects:
+        offsets = rng.random((settings.instances, 3)) * 100.0
+        for i in range(settings.instances):
+            instances.append(create_instance(instancer, objects[i % len(objects)], i,
+                                             mathutils.Matrix.Translation(offsets[i])))
+
+    camera_data = bpy.types.Camera(
+        name='Camera', type='PERSP', lens=50.0, ortho_scale=7.0, sensor_fit='AUTO',
+        sensor_width=36.0, sensor_height=24.0, shift_x=0.0, shift_y=0.0,
+        clip_start=0.1, clip_end=1000.0, dof=types.SimpleNamespace(use_dof=False))
+    camera = create_object('Camera', 'CAMERA', camera_data,
+                           mathutils.Matrix.Translation((0.0, -20.0, 5.0)))
+    objects.extend((instancer, camera))
+
+    scene = bpy.types.Scene(
+        name='Scene', camera=camera, world=bpy.types.World(name='World', use_nodes=False,
+                                                           color=(0.05, 0.05, 0.05)),
+        frame_current=1, frame_start=1, frame_end=1, frame_step=1,
+        render=types.SimpleNamespace(
+            engine='RPR', resolution_x=640, resolution_y=480, resolution_percentage=100,
+            use_border=False, film_transparent=False, use_motion_blur=False,
+            use_single_layer=False),
+    )
+    view_layer = bpy.types.ViewLayer(name='View Layer', material_override=None, use=True)
+    scene.view_layers = Collection(items=(view_layer,))
+
+    bpy.context.scene = scene
+    return bpy.types.Depsgraph(
+        scene=scene, scene_eval=scene, view_layer=view_layer, view_layer_eval=view_layer,
+        objects=Collection(items=objects),
+        object_instances=instances + [types.SimpleNamespace(is_instance=False, object=obj)
+                                      for obj in objects],
+        updates=[],
+    )
@@ -0,0 +1,91 @@
+#**********************************************************************
+# Copyright 2020 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#********************************************************************
+
+# script to check TileScheduler on fake render contexts which simulate per tile render cost
+# usage: blender --background --python cmd_tools/benchmark_tiles.py -- [width] [height] [tile] [speeds...]
+#   speeds are relative speeds of fake devices, for example: 1 4 4 for CPU + 2 GPUs
+
+import sys
+import time
+import threading
+from pathlib import Path
+
+src_path = str((Path(__file__).parent.parent/'src').resolve())
+if src_path not in sys.path:
+    sys.path.append(src_path)
+
+from rprblender import utils
+from rprblender.engine.tile_scheduler import TileScheduler
+
+
+# seconds to render 1 megapixel tile on the device with speed 1
+MEGAPIXEL_TIME = 1.0
+
+
+class FakeContext:
+    """ Render context which sleeps proportionally to tile area """
+
+    def __init__(self, name, speed):
+        self.name = name
+        self.speed = speed
+        self.tile_size = None
+
+    def render_tile(self, tile_size):
+        self.tile_size = tile_size
+        time.sleep(tile_size[0] * tile_size[1] / 1e6 * MEGAPIXEL_TIME / self.speed)
+
+
+def render(contexts, tiles):
+    main_thread = threading.current_thread()
+    rendered = []
+
+    def render_tile(rpr_context, tile_index, tile_pos, tile_size, is_stopped):
+        rpr_context.render_tile(tile_size)
+        return True
+
+    def tile_finished(rpr_context, tile_index, tile_pos, tile_size):
+        # results have to be written in the thread which runs scheduler
+        assert threading.current_thread() is main_thread
+        assert rpr_context.tile_size == tile_size
+        rendered.append(tile_index)
+
+    scheduler = TileScheduler(contexts, render_tile, tile_finished, lambda: False)
+    time_start = time.perf_counter()
+    assert scheduler.run(tiles)
+    render_time = time.perf_counter() - time_start
+
+    assert sorted(rendered) == list(range(len(tiles)))
+    return render_time, scheduler.tiles_count
+
+
+def main():
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+    width, height, tile = (int(v) for v in (argv[:3] + ['1920', '1080', '256'][len(argv[:3]):]))
+    speeds = [float(v) for v in argv[3:]] or [1.0, 4.0, 4.0]
+
+    tile_iterator = utils.tile_iterator('CENTER_SPIRAL', width, height, tile, tile)
+    tiles = list(tile_iterator())
+    contexts = [FakeContext(f"device{i}", speed) for i, speed in enumerate(speeds)]
+
+    fastest = max(contexts, key=lambda c: c.speed)
+    single_time, _ = render([fastest], tiles)
+    parallel_time, tiles_count = render(contexts, tiles)
+
+    print(f"Tiles: {len(tiles)}, devices speeds: {speeds}")
+    print(f"Fastest device only: {single_time:.3f}s")
+    print(f"All devices:         {parallel_time:.3f}s, tiles per device {tiles_count}")
+
+
+main()
@@ -0,0 +1,63 @@
+#**********************************************************************
+# Copyright 2020 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#********************************************************************
+
+# headless tests of addon export code, bpy and RPR core libraries are replaced by mocks
+# of sync benchmarks, see cmd_tools/benchmark_sync/mock_bpy.py and mock_pyrpr.py
+# usage: python -m pytest cmd_tools/tests
+
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+benchmark_path = Path(__file__).resolve().parent.parent / 'benchmark_sync'
+if str(benchmark_path) not in sys.path:
+    sys.path.insert(0, str(benchmark_path))
+
+# mocks are installed by importing benchmark runner
+import run
+import scenes
+
+from rprblender import config
+
+
+# small scene with all kinds of exported objects, hair and particles aren't needed by tests
+SCENE_SETTINGS = scenes.SceneSettings(meshes=6, triangles=50, instances=20, linked_duplicates=4,
+                                      materials=4, material_nodes=2, hair_meshes=0,
+                                      emitter_meshes=0)
+
+
+@pytest.fixture(scope='session', autouse=True)
+def setup_addon():
+    run.setup()
+    yield
+    shutil.rmtree(run.MESH_CACHE_DIR.parent, ignore_errors=True)
+
+
+@pytest.fixture
+def check_indices(monkeypatch):
+    """ RPRContext checks its secondary indices on every change """
+    monkeypatch.setattr(config, 'check_rpr_context_indices', True)
+
+
+@pytest.fixture
+def depsgraph():
+    return scenes.create_scene(SCENE_SETTINGS)
+
+
+@pytest.fixture
+def rpr_context(depsgraph):
+    return run.create_context(depsgraph)
@@ -0,0 +1,84 @@
+#**********************************************************************
+# Copyright 2020 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#********************************************************************
+
+# AnimationEngine continues state of previous frame only within one render job
+
+import pytest
+
+import run
+
+from rprblender.engine.animation_engine import AnimationEngine, AnimationState
+
+
+VIEW_LAYER = 'View Layer'
+
+
+@pytest.fixture
+def rpr_engine():
+    # RenderEngine keeps only weak reference to rpr_engine
+    return run.MockRenderEngine()
+
+
+@pytest.fixture
+def engine(monkeypatch, rpr_engine):
+    monkeypatch.setattr(AnimationEngine, 'states', {})
+    return AnimationEngine(rpr_engine)
+
+
+def set_state(engine, scene, frame):
+    state = AnimationState(engine._RPRContext(), scene.name, scene.rpr.is_contour_used)
+    state.frame = frame
+    AnimationEngine.states[VIEW_LAYER] = state
+    return state
+
+
+@pytest.mark.parametrize('frame_start, frame_end, frame_step, last_frame', (
+    (1, 10, 1, 10), (1, 10, 4, 9), (1, 10, 3, 10), (5, 5, 2, 5),
+))
+def test_last_frame(engine, depsgraph, monkeypatch, frame_start, frame_end, frame_step,
+                    last_frame):
+    scene = depsgraph.scene
+    scene.frame_start, scene.frame_end, scene.frame_step = frame_start, frame_end, frame_step
+    monkeypatch.setattr(engine, 'depsgraph_objects', lambda depsgraph: ())
+
+    for frame in range(frame_start, frame_end + 1, frame_step):
+        scene.frame_current = frame
+        engine.sync(depsgraph)
+        assert engine.is_last_frame == (frame == last_frame)
+
+
+def test_continued_state(engine, depsgraph):
+    scene = depsgraph.scene
+    scene.frame_start, scene.frame_end, scene.frame_step = 1, 20, 2
+
+    state = set_state(engine, scene, 3)
+    scene.frame_current = 5
+    assert engine._get_state(scene, VIEW_LAYER) is state
+
+
+@pytest.mark.parametrize('frame_start, prev_frame, frame', (
+    # new render job of later range, previous job was stopped
+    (8, 5, 8),
+    # frame isn't after previous one
+    (1, 5, 5), (1, 5, 3),
+))
+def test_reset_state(engine, depsgraph, frame_start, prev_frame, frame):
+    scene = depsgraph.scene
+    scene.frame_start, scene.frame_end, scene.frame_step = frame_start, 20, 1
+
+    set_state(engine, scene, prev_frame)
+    scene.frame_current = frame
+    assert engine._get_state(scene, VIEW_LAYER) is None
+    assert VIEW_LAYER not in AnimationEngine.states
@@ -0,0 +1,179 @@
+#**********************************************************************
+# Copyright 2020 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#********************************************************************
+
+# random sequences of RPRContext object changes, secondary indices are checked after each step
+
+import random
+
+import numpy as np
+import pytest
+
+import pyrpr
+
+
+OBJECT_KEYS = tuple(f'Object.{i:03}' for i in range(8))
+MASTER_KEYS = tuple(f'Mesh.{i:03}' for i in range(3))
+STEPS = 500
+
+
+def create_mesh(rpr_context, key, master=False):
+    vertices = np.array([(0.0, 0.0, 0.0), (1.0, 0.0, 0.0), (0.0, 1.0, 0.0)], dtype=np.float32)
+    normals = np.array([(0.0, 0.0, 1.0)], dtype=np.float32)
+    indices = np.arange(3, dtype=np.int32)
+    args = (vertices, normals, [], indices, np.zeros(3, dtype=np.int32), [],
+            np.array([3], dtype=np.int32))
+    if master:
+        return rpr_context.create_master_mesh(key, *args)
+
+    mesh = rpr_context.create_mesh(key, *args)
+    rpr_context.scene.attach(mesh)
+    return mesh
+
+
+class RandomChanges:
+    """ Applies random changes to rpr_context like object sync and sync_update do """
+
+    def __init__(self, rpr_context, seed):
+        self.rpr_context = rpr_context
+        self.rng = random.Random(seed)
+        self.next_id = 0
+
+    def new_id(self):
+        self.next_id += 1
+        return self.next_id
+
+    def meshes(self):
+        return [mesh for key, mesh in self.rpr_context.objects.items()
+                if isinstance(mesh, pyrpr.Mesh) and not isinstance(key, tuple)]
+
+    def base_mesh(self):
+        """ Returns mesh of scene object or master mesh of linked duplicates """
+        meshes = self.meshes()
+        if meshes and self.rng.random() < 0.5:
+            return self.rng.choice(meshes)
+
+        key = self.rng.choice(MASTER_KEYS)
+        mesh = self.rpr_context.master_meshes.get(key)
+        return mesh if mesh is not None else create_mesh(self.rpr_context, key, master=True)
+
+    def new_object_key(self):
+        """ Returns random object key, previous object of the key is removed like on update """
+        key = self.rng.choice(OBJECT_KEYS)
+        if key in self.rpr_context.objects:
+            self.rpr_context.remove_object(key)
+        return key
+
+    def create_mesh(self):
+        create_mesh(self.rpr_context, self.new_object_key())
+
+    def create_light(self):
+        light = self.rpr_context.create_light(self.new_object_key(), 'point')
+        self.rpr_context.scene.attach(light)
+
+    def create_instance(self):
+        key = (self.rng.choice(OBJECT_KEYS), self.new_id())
+        instance = self.rpr_context.create_instance(key, self.base_mesh())
+        self.rpr_context.scene.attach(instance)
+
+    def create_instances(self):
+        parent_key = self.rng.choice(OBJECT_KEYS)
+        keys = [(parent_key, self.new_id()) for _ in range(self.rng.randint(1, 5))]
+        transforms = np.tile(np.eye(4, dtype=np.float32), (len(keys), 1, 1))
+        instances = self.rpr_context.create_instances(keys, self.base_mesh(), transforms,
+                                                      [str(key) for key in keys])
+        for instance in instances:
+            self.rpr_context.scene.attach(instance)
+
+    def replace_instance(self):
+        """ Instance is recreated by the same key, e.g. when master mesh is updated """
+        keys = [key for key in self.rpr_context.objects if isinstance(key, tuple)]
+        if keys:
+            key = self.rng.choice(keys)
+            self.rpr_context.scene.detach(self.rpr_context.objects[key])
+            instance = self.rpr_context.create_instance(key, self.base_mesh())
+            self.rpr_context.scene.attach(instance)
+
+    def expire_master_mesh(self):
+        self.rpr_context.start_update()
+        self.rpr_context.expire_master_mesh(self.rng.choice(MASTER_KEYS))
+
+    def create_curve(self):
+        key = (self.rng.choice(OBJECT_KEYS), self.new_id())
+        curve = self.rpr_context.create_curve(key, np.zeros((2, 4, 3), dtype=np.float32),
+                                              np.ones(4, dtype=np.float32), None)
+        self.rpr_context.scene.attach(curve)
+
+    def create_volume(self):
+        volume = self.rpr_context.create_hetero_volume((self.rng.choice(OBJECT_KEYS),
+                                                         self.new_id()))
+        self.rpr_context.scene.attach(volume)
+
+    def set_material_slots(self):
+        keys = [key for key in self.rpr_context.objects if self.rng.random() < 0.3]
+        material_slots = {f'Material.{i:03}': [i] for i in range(self.rng.randint(0, 3))}
+        self.rpr_context.set_material_slots(keys, ('Object', None), material_slots)
+
+    def remove_object(self):
+        if self.rpr_context.objects:
+            self.rpr_context.remove_object(self.rng.choice(tuple(self.rpr_context.objects)))
+
+    def remove_curves(self):
+        self.rpr_context.remove_curves(self.rng.choice(OBJECT_KEYS))
+
+    def remove_volumes(self):
+        self.rpr_context.remove_volumes(self.rng.choice(OBJECT_KEYS))
+
+    def step(self):
+        change = self.rng.choice((
+            self.create_mesh, self.create_light, self.create_instance, self.create_instances,
+            self.replace_instance, self.expire_master_mesh, self.create_curve,
+            self.create_volume, self.set_material_slots,
+            self.remove_object, self.remove_object, self.remove_object,
+            self.remove_curves, self.remove_volumes,
+        ))
+        change()
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_random_changes(rpr_context, check_indices, seed):
+    changes = RandomChanges(rpr_context, seed)
+    for _ in range(STEPS):
+        changes.step()
+        rpr_context._check_indices()
+
+    # removing everything leaves empty indices, meshes with instances are only hidden
+    # by the first removal, they are removed when their instances are removed
+    while rpr_context.objects:
+        for key in tuple(rpr_context.objects):
+            if key in rpr_context.objects:
+                rpr_context.remove_object(key)
+    for key in OBJECT_KEYS:
+        rpr_context.remove_curves(key)
+        rpr_context.remove_volumes(key)
+    rpr_context._check_indices()
+
+    assert not rpr_context.child_object_keys
+    assert not rpr_context.object_curves
+    assert not rpr_context.object_volumes
+    assert not rpr_context.object_material_slots
+
+
+def test_broken_index_is_detected(rpr_context, check_indices):
+    mesh = create_mesh(rpr_context, OBJECT_KEYS[0])
+    rpr_context.create_instance((OBJECT_KEYS[1], 1), mesh)
+
+    rpr_context.child_object_keys.clear()
+    with pytest.raises(AssertionError):
+        rpr_context._check_indices()
@@ -0,0 +1,154 @@
+#**********************************************************************
+# Copyright 2020 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#********************************************************************
+
+# frame buffers data is copied to reusable numpy buffers of RPRContext,
+# they are allocated once per AOV and size and released on resize
+
+import numpy as np
+import pytest
+
+import pyrpr
+import run
+
+from rprblender.engine.engine import Engine
+
+
+WIDTH, HEIGHT = 8, 6
+FRAMES = 10
+
+AOVS = (pyrpr.AOV_COLOR, pyrpr.AOV_DEPTH)
+
+
+class StubFrameBuffer:
+    """ Frame buffer with data filled by AOV and frame, it counts allocated data arrays """
+
+    def __init__(self, aov_type, width, height):
+        self.aov_type = aov_type
+        self.width = width
+        self.height = height
+        self.channels = 4
+        self.frame = 0
+        self.allocations = 0
+
+    def resize(self, width, height):
+        self.width = width
+        self.height = height
+
+    def expected_data(self):
+        return np.full((self.height, self.width, self.channels),
+                       self.aov_type + self.frame, dtype=np.float32)
+
+    def get_data(self, buf=None):
+        if buf is None:
+            self.allocations += 1
+            buf = np.empty((self.height, self.width, self.channels), dtype=np.float32)
+
+        assert buf.shape == (self.height, self.width, self.channels)
+        buf[:] = self.expected_data()
+        return buf
+
+
+class StubRenderPasses(list):
+    """ bpy.types.RenderPasses which keeps data set by foreach_set() """
+
+    def __init__(self, passes):
+        super().__init__(passes)
+        self.rect = None
+
+    def foreach_set(self, attr, data):
+        self.rect = data.copy()
+
+
+class StubRenderPass:
+    def __init__(self, name, channels):
+        self.name = name
+        self.channels = channels
+
+
+@pytest.fixture
+def rpr_context(depsgraph):
+    rpr_context = run.create_context(depsgraph)
+    rpr_context.disable_aovs()
+    rpr_context.gl_interop = False
+    rpr_context.frame_buffers_aovs = {aov: {'res': StubFrameBuffer(aov, WIDTH, HEIGHT)}
+                                      for aov in AOVS}
+    rpr_context.resize(WIDTH, HEIGHT)
+    yield rpr_context
+
+    # stub frame buffers aren't attached to core context
+    rpr_context.frame_buffers_aovs = {}
+
+
+def frame_buffers(rpr_context):
+    return [rpr_context.frame_buffers_aovs[aov]['res'] for aov in AOVS]
+
+
+def set_frame(rpr_context, frame):
+    for fb in frame_buffers(rpr_context):
+        fb.frame = frame
+
+
+def test_pooled_image(rpr_context):
+    images = {}
+    for frame in range(FRAMES):
+        set_frame(rpr_context, frame)
+        for aov, fb in zip(AOVS, frame_buffers(rpr_context)):
+            image = rpr_context.get_image(aov, pooled=True)
+            np.testing.assert_array_equal(image, fb.expected_data())
+            assert images.setdefault(aov, image) is image
+
+    assert rpr_context.image_buffers_allocations == len(AOVS)
+    assert all(fb.allocations == 0 for fb in frame_buffers(rpr_context))
+
+    # not pooled images are allocated on every call
+    not_pooled = [rpr_context.get_image(aov) for _ in range(FRAMES) for aov in AOVS]
+    assert all(image is not images[aov] for image, aov in zip(not_pooled, AOVS * FRAMES))
+    assert sum(fb.allocations for fb in frame_buffers(rpr_context)) == FRAMES * len(AOVS)
+
+
+def test_render_result(rpr_context):
+    engine = Engine(run.MockRenderEngine())
+    engine.rpr_context = rpr_context
+    render_passes = StubRenderPasses((StubRenderPass('Combined', 4),
+                                      StubRenderPass('Color', 3)))
+
+    for frame in range(FRAMES):
+        set_frame(rpr_context, frame)
+        engine._set_render_result(render_passes, False)
+
+        color = frame_buffers(rpr_context)[0].expected_data()
+        pixels = WIDTH * HEIGHT
+        np.testing.assert_array_equal(render_passes.rect[:pixels * 4], color.ravel())
+        np.testing.assert_array_equal(render_passes.rect[pixels * 4:],
+                                      color[:, :, :3].ravel())
+
+    # render result buffer and buffers of Combined and Color instead of 3 arrays per frame
+    assert rpr_context.image_buffers_allocations == 3
+    assert all(fb.allocations == 0 for fb in frame_buffers(rpr_context))
+
+
+def test_resize(rpr_context):
+    image = rpr_context.get_image(pyrpr.AOV_COLOR, pooled=True)
+
+    rpr_context.resize(WIDTH, HEIGHT)
+    assert rpr_context.get_image(pyrpr.AOV_COLOR, pooled=True) is image
+    assert rpr_context.image_buffers_allocations == 1
+
+    # buffers of previous size are released, new image has new size
+    rpr_context.resize(WIDTH * 2, HEIGHT)
+    assert not rpr_context.image_buffers
+    resized_image = rpr_context.get_image(pyrpr.AOV_COLOR, pooled=True)
+    assert resized_image.shape == (HEIGHT, WIDTH * 2, 4)
+    assert rpr_context.image_buffers_allocations == 2
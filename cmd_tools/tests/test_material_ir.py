@@ -0,0 +1,181 @@
+#**********************************************************************
+# Copyright 2020 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#********************************************************************
+
+# MaterialIR of parsed node trees: serialization round trip, golden results of parsers
+# and emission of images by key
+# golden file is regenerated by: UPDATE_GOLDEN=1 python -m pytest cmd_tools/tests
+
+import json
+import os
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import bpy
+import pyrpr
+import pyrprwrap
+import scenes
+from mock_bpy import Collection
+from scenes import create_node, create_socket, link
+
+from rprblender.export import material
+from rprblender.nodes import material_ir
+from rprblender.nodes.material_ir import MaterialIR, IRNode, IRImage, IRBuffer
+
+
+GOLDEN_FILE = Path(__file__).parent / 'golden' / 'material_ir.json'
+
+
+def create_image(name, library_path=None):
+    return bpy.types.Image(
+        name=name, source='FILE', size=(4, 4), channels=4, filepath=f'//{name}.png',
+        library=SimpleNamespace(filepath=library_path) if library_path else None,
+        colorspace_settings=SimpleNamespace(name='sRGB'))
+
+
+def create_image_material(name, image):
+    """ Material: Image Texture linked to Base Color of Principled BSDF """
+    output = create_node('ShaderNodeOutputMaterial', 'Material Output', is_active_output=True,
+                         inputs=(create_socket('Surface', None, True),
+                                 create_socket('Volume', None, True),
+                                 create_socket('Displacement', (0.0, 0.0, 0.0))))
+    principled = create_node('ShaderNodeBsdfPrincipled', 'Principled BSDF',
+                             inputs=[create_socket(*i) for i in scenes.PRINCIPLED_INPUTS],
+                             outputs=(create_socket('BSDF', None, True),))
+    texture = create_node('ShaderNodeTexImage', 'Image Texture', image=image,
+                          image_user=SimpleNamespace(frame_current=1), extension='CLIP',
+                          interpolation='Linear', projection='FLAT',
+                          inputs=(create_socket('Vector', (0.0, 0.0, 0.0)),),
+                          outputs=(create_socket('Color', (0.0, 0.0, 0.0, 1.0)),
+                                   create_socket('Alpha', 1.0)))
+
+    link(principled, 'BSDF', output, 'Surface')
+    link(texture, 'Color', principled, 'Base Color')
+    link(texture, 'Alpha', principled, 'Alpha')
+
+    node_tree = bpy.types.ShaderNodeTree(name=name,
+                                         nodes=Collection(items=[output, principled, texture]))
+    return bpy.types.Material(name=name, node_tree=node_tree, pass_index=0,
+                              cycles=SimpleNamespace(displacement_method='BUMP'))
+
+
+def compile_material(rpr_context, mat):
+    output_node = material.get_material_output_node(mat)
+    material_ir, _params = material.compile_material(rpr_context, mat, output_node, mat.name,
+                                                     'Surface', None)
+    return material_ir
+
+
+def symbolic(data):
+    """
+    Replaces core constants in IR representation by their names: values of mocked constants
+    depend on names used by addon sources
+    """
+    names = {}
+    for name in dir(pyrprwrap):
+        value = getattr(pyrprwrap, name)
+        if name.isupper() and isinstance(value, int) and value >= 1000:
+            names[value] = name
+
+    def convert(value):
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, int):
+            return names.get(value, value)
+        if isinstance(value, float):
+            return round(value, 6)
+        if isinstance(value, list):
+            return [convert(v) for v in value]
+        if isinstance(value, dict):
+            return {k: convert(v) for k, v in value.items()}
+        return value
+
+    return convert(data)
+
+
+@pytest.fixture
+def materials():
+    image = create_image('Texture')
+    return [scenes.create_material(f'Material.{i:03}', nodes_count, np.random.default_rng(i))
+            for i, nodes_count in enumerate((1, 6))] + \
+        [create_image_material('Image Material', image)]
+
+
+def test_round_trip(rpr_context, materials):
+    # key of linked image is nested tuple
+    ir_image = IRImage((('Texture', '//library.blend'), 'sRGB', 3))
+    ir_image.set_wrap(pyrpr.IMAGE_WRAP_TYPE_REPEAT)
+    node = IRNode(pyrpr.MATERIAL_NODE_IMAGE_TEXTURE)
+    node.key = ('Image Texture', 'Color')
+    node.set_input(pyrpr.MATERIAL_INPUT_DATA, ir_image)
+    root = IRNode(pyrpr.MATERIAL_NODE_BUFFER_SAMPLER)
+    root.set_input(pyrpr.MATERIAL_INPUT_DATA,
+                   IRBuffer(np.linspace(0.0, 1.0, 12, dtype=np.float32),
+                            pyrpr.BUFFER_ELEMENT_TYPE_FLOAT32))
+    root.set_input(pyrpr.MATERIAL_INPUT_UV, node)
+    root.set_input(pyrpr.MATERIAL_INPUT_COLOR, (0.5, 0.5, 0.5))
+    root.set_input(pyrpr.MATERIAL_INPUT_WEIGHT, 0.5)
+
+    irs = [MaterialIR.from_root(root)] + [compile_material(rpr_context, mat) for mat in materials]
+    for ir in irs:
+        data = ir.to_dict()
+        loaded = MaterialIR.from_dict(json.loads(json.dumps(data)))
+        assert loaded.to_dict() == data
+
+        # node references are restored, shared images are the same object
+        for node, loaded_node in zip(ir.nodes, loaded.nodes):
+            for name, value in node.inputs.items():
+                loaded_value = loaded_node.inputs[name]
+                assert type(loaded_value) is type(value)
+                if isinstance(value, IRNode):
+                    assert loaded_value is loaded.nodes[ir.nodes.index(value)]
+
+
+def test_golden(rpr_context, materials):
+    results = {mat.name: symbolic(compile_material(rpr_context, mat).to_dict())
+               for mat in materials}
+
+    if os.environ.get('UPDATE_GOLDEN'):
+        GOLDEN_FILE.write_text(json.dumps(results, indent=1) + '\n')
+
+    assert results == json.loads(GOLDEN_FILE.read_text())
+
+
+def test_linked_image(rpr_context, monkeypatch):
+    local_image = create_image('Texture')
+    linked_image = create_image('Texture', '//library.blend')
+    monkeypatch.setattr(bpy.data, 'images', Collection(items=[local_image, linked_image]))
+
+    irs = [(image, compile_material(rpr_context, create_image_material('Image Material', image)))
+           for image in (linked_image, local_image)]
+
+    # images are exported on emission, exported image is recorded instead
+    emitted = []
+
+    def sync(rpr_context, image, use_color_space=None, frame_number=None):
+        emitted.append(image)
+        return None
+
+    monkeypatch.setattr(material_ir.image, 'sync', sync)
+
+    for image, ir in irs:
+        # image key survives serialization of persistent material cache
+        for material_ir_ in (ir, MaterialIR.from_dict(json.loads(json.dumps(ir.to_dict())))):
+            ir_image = next(value for node in material_ir_.nodes
+                            for value in node.inputs.values() if isinstance(value, IRImage))
+            material_ir.emit_image(rpr_context, ir_image)
+            assert emitted[-1] is image
@@ -0,0 +1,98 @@
+#**********************************************************************
+# Copyright 2020 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#********************************************************************
+
+# random sequences of object changes and material slots assignments, material slots index
+# of RPRContext is compared with brute force scan of all assigned slots after each step
+
+import pytest
+
+from test_context_indices import RandomChanges, OBJECT_KEYS
+
+
+MATERIAL_NAMES = tuple(f'Material.{i:03}' for i in range(5))
+STEPS = 500
+
+
+class RandomSlotChanges(RandomChanges):
+    """ Keeps all material slots assignments, the last one of existing object is valid """
+
+    def __init__(self, rpr_context, seed):
+        super().__init__(rpr_context, seed)
+
+        # key -> (rpr object, obj_ref, material name -> slot indices)
+        self.assigned_slots = {}
+
+    def set_material_slots(self):
+        keys = [key for key, obj in self.rpr_context.objects.items()
+                if obj is not None and self.rng.random() < 0.3]
+        obj_ref = (self.rng.choice(OBJECT_KEYS), None)
+        mat_names = self.rng.sample(MATERIAL_NAMES, self.rng.randint(0, 3))
+        material_slots = {mat_name: sorted(self.rng.sample(range(4), self.rng.randint(1, 2)))
+                          for mat_name in mat_names}
+
+        self.rpr_context.set_material_slots(keys, obj_ref, material_slots)
+        for key in keys:
+            self.assigned_slots[key] = (self.rpr_context.objects[key], obj_ref, material_slots)
+
+    def step(self):
+        # slots are assigned more often than other changes to fill index
+        if self.rng.random() < 0.3:
+            self.set_material_slots()
+        else:
+            super().step()
+
+    def scan_material_slot_users(self):
+        """ Returns material name -> {key: (obj_ref, indices)} of slots of existing objects """
+        users = {}
+        for key, (obj, obj_ref, material_slots) in self.assigned_slots.items():
+            # object could be removed or replaced by new object with the same key
+            if key not in self.rpr_context.objects or self.rpr_context.objects[key] is not obj:
+                continue
+
+            for mat_name, indices in material_slots.items():
+                users.setdefault(mat_name, {})[key] = (obj_ref, indices)
+
+        return users
+
+
+def check_material_slots(changes, rpr_context):
+    users = changes.scan_material_slot_users()
+    assert rpr_context.material_slot_users == users
+
+    object_material_slots = {}
+    for mat_name, mat_users in users.items():
+        for key in mat_users:
+            object_material_slots.setdefault(key, set()).add(mat_name)
+    assert {key: set(mat_names) for key, mat_names
+            in rpr_context.object_material_slots.items()} == object_material_slots
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_random_material_slots(rpr_context, check_indices, seed):
+    changes = RandomSlotChanges(rpr_context, seed)
+    for _ in range(STEPS):
+        changes.step()
+        check_material_slots(changes, rpr_context)
+
+    assert rpr_context.material_slot_users
+
+    while rpr_context.objects:
+        for key in tuple(rpr_context.objects):
+            if key in rpr_context.objects:
+                rpr_context.remove_object(key)
+        check_material_slots(changes, rpr_context)
+
+    assert not rpr_context.material_slot_users
+    assert not rpr_context.object_material_slots
@@ -0,0 +1,45 @@
+#**********************************************************************
+# Copyright 2020 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#********************************************************************
+
+# key of persistent mesh cache changes with data which exported normals depend on
+
+import pytest
+
+import run
+
+from rprblender.export import mesh
+
+
+def get_mesh_object(depsgraph, use_auto_smooth):
+    return next(obj for obj in run.mesh_objects(depsgraph)
+                if obj.data.use_auto_smooth == use_auto_smooth)
+
+
+@pytest.mark.parametrize('use_auto_smooth', (False, True))
+def test_sharp_edges(depsgraph, use_auto_smooth):
+    obj = get_mesh_object(depsgraph, use_auto_smooth)
+    key = mesh.get_mesh_cache_key(obj, obj.data, True)
+    assert mesh.get_mesh_cache_key(obj, obj.data, True) == key
+
+    obj.data.edges.arrays['use_edge_sharp'][0] = True
+    assert (mesh.get_mesh_cache_key(obj, obj.data, True) != key) == use_auto_smooth
+
+
+def test_auto_smooth_angle(depsgraph):
+    obj = get_mesh_object(depsgraph, True)
+    key = mesh.get_mesh_cache_key(obj, obj.data, True)
+
+    obj.data.auto_smooth_angle /= 2.0
+    assert mesh.get_mesh_cache_key(obj, obj.data, True) != key
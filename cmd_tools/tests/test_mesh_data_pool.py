@@ -0,0 +1,62 @@
+#**********************************************************************
+# Copyright 2020 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#********************************************************************
+
+# MeshDataPool returns the same data as serial export when sync skips some of queued objects
+
+import numpy as np
+
+from rprblender import config
+from rprblender.export import mesh
+
+
+WORKERS = 2
+
+
+def get_tasks(rpr_context, depsgraph):
+    objects = [obj for obj in depsgraph.objects if obj.type == 'MESH']
+    return list(mesh.MeshDataPool._iter_tasks(rpr_context, objects))
+
+
+def assert_equal_data(data, expected):
+    arrays = data.get_arrays()
+    expected_arrays = expected.get_arrays()
+    assert arrays.keys() == expected_arrays.keys()
+    for name, array in arrays.items():
+        np.testing.assert_array_equal(array, expected_arrays[name])
+
+
+def test_default_is_serial(rpr_context, depsgraph):
+    with mesh.MeshDataPool(rpr_context, depsgraph.objects,
+                           config.sync_mesh_workers) as mesh_data_pool:
+        assert mesh_data_pool.executor is None
+
+
+def test_skipped_objects(rpr_context, depsgraph):
+    tasks = get_tasks(rpr_context, depsgraph)
+    assert len(tasks) > WORKERS * 2
+
+    # every third object isn't synced, its prepared data must not block the queue
+    requested = [task for i, task in enumerate(tasks) if i % 3]
+    prepared = 0
+    with mesh.MeshDataPool(rpr_context, depsgraph.objects, WORKERS) as mesh_data_pool:
+        for data_key, obj, obj_mesh in requested:
+            prepared += data_key in mesh_data_pool.futures
+            data = mesh_data_pool.get(data_key, obj, obj_mesh)
+
+            assert len(mesh_data_pool.futures) <= mesh_data_pool.max_queued
+            assert_equal_data(data, mesh.init_mesh_data(obj, obj_mesh, mesh_data_pool.polygons))
+
+    # only the first object isn't prepared ahead
+    assert prepared == len(requested) - 1
@@ -0,0 +1,229 @@
+#**********************************************************************
+# Copyright 2020 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#********************************************************************
+
+# arithmetic of NodeItem is compiled to MaterialIR with and without node optimization,
+# compiled nodes are evaluated numerically and results are compared
+
+import random
+
+import numpy as np
+import pytest
+
+import pyrpr
+from rprblender import config
+from rprblender.nodes.material_ir import MaterialCompiler, MaterialIR, IRNode
+from rprblender.nodes.node_item import NodeItem, NodeExpr
+
+
+# material type of input nodes, they are replaced by random values in evaluation
+INPUT_TYPE = pyrpr.MATERIAL_NODE_INPUT_LOOKUP
+INPUTS_COUNT = 4
+
+CONSTANTS = (0.0, 1.0, 0.5, 2.0, (0.0, 0.0, 0.0), (1.0, 1.0, 1.0), (0.0, 0.0, 0.0, 0.0),
+             (1.0, 1.0, 1.0, 1.0), (0.0, 0.0, 0.0, 1.0), (1.0, 1.0, 1.0, 0.0), (0.5, 2.0, 1.0))
+
+ARITHMETIC_FUNCS = {
+    pyrpr.MATERIAL_NODE_OP_ADD: lambda a, b, c: a + b,
+    pyrpr.MATERIAL_NODE_OP_SUB: lambda a, b, c: a - b,
+    pyrpr.MATERIAL_NODE_OP_MUL: lambda a, b, c: a * b,
+    pyrpr.MATERIAL_NODE_OP_DIV: lambda a, b, c: a / b,
+    pyrpr.MATERIAL_NODE_OP_POW: lambda a, b, c: a ** b,
+    pyrpr.MATERIAL_NODE_OP_MIN: lambda a, b, c: np.minimum(a, b),
+    pyrpr.MATERIAL_NODE_OP_MAX: lambda a, b, c: np.maximum(a, b),
+    pyrpr.MATERIAL_NODE_OP_ABS: lambda a, b, c: np.abs(a),
+    pyrpr.MATERIAL_NODE_OP_GREATER: lambda a, b, c: (a > b).astype(float),
+    pyrpr.MATERIAL_NODE_OP_TERNARY: lambda a, b, c: np.where(a != 0.0, b, c),
+}
+
+
+def to_vec4(value, input_values):
+    """ Returns value of node input as it is set by pyrpr.MaterialNode.set_input """
+    if isinstance(value, IRNode):
+        return evaluate(value, input_values)
+
+    if isinstance(value, float):
+        return np.full(4, value)
+
+    return np.array(value if len(value) == 4 else (*value, 1.0))
+
+
+def evaluate(node: IRNode, input_values):
+    """ Numeric value of compiled node, input_values is input node -> vec4 """
+    if node.type == INPUT_TYPE:
+        return input_values[node]
+
+    def value(name):
+        return to_vec4(node.inputs[name], input_values) if name in node.inputs else None
+
+    if node.type == pyrpr.MATERIAL_NODE_BLEND_VALUE:
+        weight = value(pyrpr.MATERIAL_INPUT_WEIGHT)
+        return (1.0 - weight) * value(pyrpr.MATERIAL_INPUT_COLOR0) + \
+            weight * value(pyrpr.MATERIAL_INPUT_COLOR1)
+
+    assert node.type == pyrpr.MATERIAL_NODE_ARITHMETIC
+    func = ARITHMETIC_FUNCS[node.inputs[pyrpr.MATERIAL_INPUT_OP]]
+    return func(value(pyrpr.MATERIAL_INPUT_COLOR0), value(pyrpr.MATERIAL_INPUT_COLOR1),
+                value(pyrpr.MATERIAL_INPUT_COLOR2))
+
+
+def compile_items(items):
+    """ Returns IR nodes used by final nodes of items, nodes of expressions are created here """
+    root = IRNode(pyrpr.MATERIAL_NODE_ARITHMETIC)
+    for i, item in enumerate(items):
+        root.set_input(i, item.data)
+
+    return MaterialIR.from_root(root).nodes[:-1]
+
+
+class RandomExpressions:
+    """ Builds random expressions of inputs and constants by NodeItem operations """
+
+    def __init__(self, seed):
+        self.seed = seed
+
+    def build(self, compiler, count):
+        rng = random.Random(self.seed)
+        inputs = [NodeItem(compiler, compiler.create_material_node(INPUT_TYPE))
+                  for _ in range(INPUTS_COUNT)]
+        items = list(inputs)
+
+        def operand():
+            if rng.random() < 0.3:
+                return NodeItem(compiler, rng.choice(CONSTANTS))
+            return rng.choice(items)
+
+        for _ in range(count):
+            a, b, c = operand(), operand(), operand()
+            op = rng.randrange(9)
+            if op == 0:
+                item = a + b
+            elif op == 1:
+                item = a - b
+            elif op == 2:
+                item = a * b
+            elif op == 3:
+                # divisor is never zero, constant divisors are folded equally by both modes
+                item = a / (abs(rng.choice(inputs)) + 1.0 if rng.random() < 0.5 else
+                            rng.choice((1.0, 2.0, (1.0, 1.0, 1.0, 1.0))))
+            elif op == 4:
+                item = a ** rng.choice((1.0, 2.0, (1.0, 1.0, 1.0, 1.0)))
+            elif op == 5:
+                item = a.min(b) if rng.random() < 0.5 else a.max(b)
+            elif op == 6:
+                item = (a > b).if_else(c, c if rng.random() < 0.5 else b)
+            elif op == 7:
+                weight = rng.choice((0.0, 1.0, 0.5, (0.0, 0.0, 0.0, 0.0), (1.0, 1.0, 1.0, 1.0)))
+                weight = NodeItem(compiler, weight) if rng.random() < 0.5 else a
+                item = weight.blend(b, c if rng.random() < 0.7 else b)
+            else:
+                item = a * 0.0 + b
+
+            items.append(item)
+
+        return [item.data for item in inputs], items[INPUTS_COUNT:]
+
+
+@pytest.fixture
+def compiler():
+    return MaterialCompiler(None)
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_optimized_results(monkeypatch, seed):
+    expressions = RandomExpressions(seed)
+
+    results = {}
+    for optimize in (False, True):
+        monkeypatch.setattr(config, 'material_optimize_nodes', optimize)
+        inputs, items = expressions.build(MaterialCompiler(None), 200)
+        nodes = compile_items(items)
+
+        rng = np.random.default_rng(seed)
+        values = []
+        for _ in range(3):
+            input_values = {node: rng.uniform(-2.0, 2.0, 4) for node in inputs}
+            with np.errstate(all='ignore'):
+                values.append([to_vec4(item.data, input_values) for item in items])
+
+        # constant folding keeps 3 component vectors, their w isn't calculated like by nodes,
+        # so it differs when optimization replaces node by constant, only x, y, z are compared
+        values = np.array(values)[..., :3]
+
+        results[optimize] = (values, len(nodes))
+
+    (values, nodes_count), (optimized_values, optimized_count) = results[False], results[True]
+    np.testing.assert_allclose(optimized_values, values, rtol=1e-6, equal_nan=True)
+    assert optimized_count < nodes_count
+
+
+@pytest.mark.parametrize('optimize', (False, True))
+def test_identities(monkeypatch, compiler, optimize):
+    monkeypatch.setattr(config, 'material_optimize_nodes', optimize)
+    x = NodeItem(compiler, compiler.create_material_node(INPUT_TYPE))
+    one4 = (1.0, 1.0, 1.0, 1.0)
+    zero4 = (0.0, 0.0, 0.0, 0.0)
+
+    identities = [
+        (x + 0.0, x), (0.0 + x, x), (x + zero4, x), (x - 0.0, x), (x - zero4, x),
+        (x * 1.0, x), (1.0 * x, x), (x * one4, x), (x / 1.0, x), (x ** 1.0, x),
+        (x.min(x), x), (x.max(x), x),
+        (NodeItem(compiler, 0.0).blend(x, 2.0), x), (NodeItem(compiler, 1.0).blend(2.0, x), x),
+        (NodeItem(compiler, 0.5).blend(x, x), x),
+    ]
+    for item, expected in identities:
+        assert (item._data is expected._data) == optimize
+
+    for item in (x * 0.0, 0.0 * x, x * zero4):
+        assert (item._data == 0.0) == optimize
+
+    # simplified constant is the output of replaced node, its w is 1.0 as for node input
+    item = NodeItem(compiler, 0.0).blend((0.5, 0.5, 0.5), x)
+    assert item._data == (0.5, 0.5, 0.5, 1.0) if optimize else isinstance(item._data, NodeExpr)
+
+    # 3 component vector is set as (x, y, z, 1.0), it isn't identity of any operation
+    for item in (x + (0.0, 0.0, 0.0), x - (0.0, 0.0, 0.0), x * (1.0, 1.0, 1.0),
+                 x * (0.0, 0.0, 0.0), x * (1.0, 1.0, 1.0, 0.0)):
+        assert isinstance(item._data, NodeExpr)
+
+
+def test_common_subexpressions(monkeypatch, compiler):
+    monkeypatch.setattr(config, 'material_optimize_nodes', True)
+    x = NodeItem(compiler, compiler.create_material_node(INPUT_TYPE))
+    y = NodeItem(compiler, compiler.create_material_node(INPUT_TYPE))
+
+    a = (x + y) * 2.0
+    b = (x + y) * 2.0
+    assert a._data is b._data
+    assert (x - y)._data is not (y - x)._data
+    assert len(compile_items((a, b, a + b))) == 5
+
+    # expressions aren't shared by different compiled materials
+    other_compiler = MaterialCompiler(None)
+    other_x = NodeItem(other_compiler, x._data)
+    other_y = NodeItem(other_compiler, y._data)
+    other_a = (other_x + other_y) * 2.0
+    assert other_a._data is not a._data
+    assert other_a.data is not a.data
+
+
+def test_nodes_without_optimization(monkeypatch, compiler):
+    monkeypatch.setattr(config, 'material_optimize_nodes', False)
+    x = NodeItem(compiler, compiler.create_material_node(INPUT_TYPE))
+
+    a = x * 2.0
+    b = x * 2.0
+    assert a._data is not b._data
+    assert not compiler.node_exprs
+    assert len(compile_items((a, b))) == 3
@@ -0,0 +1,70 @@
+#**********************************************************************
+# Copyright 2020 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#********************************************************************
+
+# export of emitter particle systems as instances of master sphere
+
+import numpy as np
+import pytest
+
+import run
+import scenes
+from mock_bpy import PARTICLE_ALIVE_STATES
+
+from rprblender.export import particle
+
+
+SCENE_SETTINGS = scenes.SceneSettings(meshes=2, triangles=50, instances=0, linked_duplicates=0,
+                                      materials=1, hair_meshes=0, emitter_meshes=2, particles=200)
+
+
+@pytest.fixture
+def emitter_depsgraph():
+    return scenes.create_scene(SCENE_SETTINGS)
+
+
+def alive_count(p_sys):
+    return int(np.count_nonzero(
+        p_sys.particles.arrays['alive_state'] == PARTICLE_ALIVE_STATES['ALIVE']))
+
+
+def test_alive_particles(emitter_depsgraph, check_indices):
+    rpr_context = run.create_context(emitter_depsgraph)
+    for emitter in run.emitter_objects(emitter_depsgraph):
+        particle.sync(rpr_context, emitter)
+
+        p_sys = emitter.particle_systems[0]
+        particle_key = particle.key(p_sys, emitter)
+        assert 0 < alive_count(p_sys) < len(p_sys.particles)
+        assert len(rpr_context.child_object_keys[particle_key]) == alive_count(p_sys)
+
+
+def test_removed_particle_system(emitter_depsgraph, check_indices):
+    rpr_context = run.create_context(emitter_depsgraph)
+    emitter, other_emitter = run.emitter_objects(emitter_depsgraph)
+    particle.sync(rpr_context, emitter)
+    particle.sync(rpr_context, other_emitter)
+
+    p_sys = emitter.particle_systems[0]
+    particle_key = particle.key(p_sys, emitter)
+    emitter.particle_systems = []
+    assert particle.sync_update(rpr_context, emitter, True, False)
+
+    assert particle_key not in rpr_context.objects
+    assert particle_key not in rpr_context.child_object_keys
+
+    # particles of other emitter are kept
+    other_key = particle.key(other_emitter.particle_systems[0], other_emitter)
+    assert len(rpr_context.child_object_keys[other_key]) == \
+        alive_count(other_emitter.particle_systems[0])
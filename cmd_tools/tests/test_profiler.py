@@ -0,0 +1,174 @@
+#**********************************************************************
+# Copyright 2020 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#********************************************************************
+
+# statistics of core calls wrapped by profiler, time is measured by fake clock
+
+import json
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import pyrpr_profiler
+
+
+class StubCData:
+    """ cffi data: array or pointer, it has no nbytes attribute unlike numpy arrays """
+
+    def __init__(self, kind, size):
+        self.kind = kind
+        self.size = size
+
+
+class StubFFI:
+    CData = StubCData
+
+    @staticmethod
+    def new_array(size):
+        return StubCData('array', size)
+
+    @staticmethod
+    def new_pointer():
+        return StubCData('pointer', 8)
+
+    @staticmethod
+    def typeof(cdata):
+        return SimpleNamespace(kind=cdata.kind)
+
+    @staticmethod
+    def sizeof(cdata):
+        return cdata.size
+
+
+ffi = StubFFI()
+
+
+class FakeClock:
+    """ time.perf_counter() replacement, time is advanced only by stub core functions """
+
+    def __init__(self):
+        self.time = 100.0
+
+    def __call__(self):
+        return self.time
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(pyrpr_profiler.time, 'perf_counter', clock)
+    return clock
+
+
+@pytest.fixture
+def profiler(clock):
+    profiler = pyrpr_profiler.Profiler()
+    profiler.enabled = True
+    return profiler
+
+
+def wrap_stubs(profiler, clock):
+    """ Returns wrapped stub functions, each call takes duration passed as the first argument """
+    def ShapeSetTransform(duration, *argv):
+        clock.time += duration
+        return 'transform'
+
+    def MeshCreate(duration, *argv):
+        clock.time += duration
+        return 'mesh'
+
+    return (profiler.wrap(ShapeSetTransform, 'RPR', ffi),
+            profiler.wrap(MeshCreate, 'RPR', ffi))
+
+
+def test_wrap(profiler, clock):
+    set_transform, mesh_create = wrap_stubs(profiler, clock)
+    assert set_transform.__name__ == 'ShapeSetTransform'
+
+    vertices = np.zeros((10, 3), dtype=np.float32)
+    indices = ffi.new_array(24)
+    with profiler.phase('sync'):
+        assert mesh_create(0.5, vertices, indices, 3, None, True) == 'mesh'
+        assert mesh_create(1.5, vertices, ffi.new_pointer(), b'name') == 'mesh'
+        for duration in (0.25, 0.75, 0.5):
+            assert set_transform(duration, 1.0, False) == 'transform'
+
+    # calls without phase are attributed to default phase
+    set_transform(2.0, 'name')
+
+    report = profiler.get_report()
+    assert set(report) == {'sync', pyrpr_profiler.DEFAULT_PHASE}
+
+    sync = report['sync']
+    assert sync['calls'] == 5
+    assert sync['total_time'] == pytest.approx(3.5)
+    assert sync['wall'] == {'count': 1, 'busy_time': 3.5, 'begin': 0.0, 'end': 3.5}
+
+    # functions are sorted by total time
+    assert list(sync['functions']) == ['RPR::MeshCreate', 'RPR::ShapeSetTransform']
+    assert sync['functions']['RPR::MeshCreate'] == {
+        'count': 2, 'total_time': 2.0, 'max_time': 1.5,
+        # numpy array + ffi array + bytes, pointers and scalars don't pass data
+        'bytes': 2 * vertices.nbytes + 24 + len(b'name'),
+    }
+    assert sync['functions']['RPR::ShapeSetTransform'] == {
+        'count': 3, 'total_time': 1.5, 'max_time': 0.75, 'bytes': 0,
+    }
+
+    other = report[pyrpr_profiler.DEFAULT_PHASE]
+    assert 'wall' not in other
+    assert other['functions'] == {'RPR::ShapeSetTransform': {
+        'count': 1, 'total_time': 2.0, 'max_time': 2.0, 'bytes': len('name')}}
+
+
+def test_nested_phases(profiler, clock):
+    set_transform, mesh_create = wrap_stubs(profiler, clock)
+
+    for _ in range(2):
+        with profiler.phase('sync'):
+            set_transform(1.0)
+            with profiler.phase('mesh'):
+                mesh_create(2.0)
+            set_transform(1.0)
+
+    report = profiler.get_report()
+    assert list(report) == ['sync', 'mesh']
+    assert report['sync']['calls'] == 4
+    assert report['mesh']['calls'] == 2
+    assert report['sync']['wall'] == {'count': 2, 'busy_time': 8.0, 'begin': 0.0, 'end': 8.0}
+    assert report['mesh']['wall'] == {'count': 2, 'busy_time': 4.0, 'begin': 1.0, 'end': 7.0}
+
+
+def test_dump(profiler, clock, tmp_path):
+    set_transform, mesh_create = wrap_stubs(profiler, clock)
+    with profiler.phase('sync'):
+        mesh_create(1.0, np.zeros(4, dtype=np.float32))
+    set_transform(0.5)
+
+    file_path = tmp_path / 'profile.json'
+    profiler.dump(file_path)
+    assert json.loads(file_path.read_text()) == profiler.get_report()
+
+    profiler.reset()
+    assert profiler.get_report() == {}
+
+
+def test_disabled(clock):
+    profiler = pyrpr_profiler.Profiler()
+    assert profiler.phase('sync') is pyrpr_profiler.Profiler._null_phase
+    with profiler.phase('sync'):
+        pass
+
+    assert profiler.get_report() == {}
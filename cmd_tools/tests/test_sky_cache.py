@@ -0,0 +1,135 @@
+#**********************************************************************
+# Copyright 2020 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#********************************************************************
+
+# Sun & Sky images are generated by helper library only for new sky parameters,
+# generated images are reused from memory and from file cache
+
+from dataclasses import astuple
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from rprblender.export import world
+from rprblender.utils.file_cache import FileCache
+from rprblender.utils.sky_cache import SkyImageCache
+
+
+def create_sun_sky(**kwargs):
+    """ Sun & Sky parameters like RPR_EnvironmentProperties.sun_sky """
+    values = dict(resolution='256', azimuth=0.5, altitude=0.3, turbidity=0.2, sun_glow=1.0,
+                  sun_disc=0.5, saturation=0.5, horizon_height=0.001, horizon_blur=0.1,
+                  filter_color=(0.0, 0.0, 0.0), ground_color=(0.4, 0.4, 0.4))
+    values.update(kwargs)
+    return SimpleNamespace(**values)
+
+
+def get_params(**kwargs):
+    return astuple(world.WorldData.SunSkyData(create_sun_sky(**kwargs)))
+
+
+class StubHelperLib:
+    """ Helper library generating image of resolution filled by turbidity, it counts generations """
+
+    def __init__(self):
+        self.turbidity = None
+        self.generated = []
+
+    def set_sun_horizontal_coordinate(self, azimuth, altitude):
+        pass
+
+    def set_sky_params(self, turbidity, *params):
+        self.turbidity = turbidity
+
+    def generate_sky_image(self, width, height):
+        self.generated.append((width, height, self.turbidity))
+        return np.full((height, width, 3), self.turbidity, dtype=np.float32)
+
+
+@pytest.fixture
+def helper_lib(monkeypatch):
+    helper_lib = StubHelperLib()
+    monkeypatch.setattr(world, 'helper_lib', helper_lib)
+    return helper_lib
+
+
+@pytest.fixture
+def file_cache(tmp_path):
+    return FileCache(tmp_path / 'sky', 1024 * 1024 * 1024)
+
+
+def test_hit(helper_lib):
+    cache = SkyImageCache(world.generate_sky_image)
+    im = cache.get(get_params())
+    assert im.shape == (256, 256, 3)
+    assert not im.flags.writeable
+
+    # parameters of other SunSkyData with the same values
+    assert cache.get(get_params()) is im
+    assert len(helper_lib.generated) == 1
+
+
+@pytest.mark.parametrize('changes', ({'resolution': '1024'}, {'turbidity': 0.4}))
+def test_miss(helper_lib, changes):
+    cache = SkyImageCache(world.generate_sky_image)
+    im = cache.get(get_params())
+    changed_im = cache.get(get_params(**changes))
+
+    assert changed_im is not im
+    assert len(helper_lib.generated) == 2
+    resolution = int(changes.get('resolution', '256'))
+    assert helper_lib.generated[-1] == (resolution, resolution, changes.get('turbidity', 0.2))
+
+    # previous parameters are still cached
+    assert cache.get(get_params()) is im
+    assert len(helper_lib.generated) == 2
+
+
+def test_max_count(helper_lib):
+    cache = SkyImageCache(world.generate_sky_image, max_count=2)
+    for turbidity in (0.1, 0.2, 0.3, 0.1):
+        cache.get(get_params(turbidity=turbidity))
+
+    # the least recently used image of 0.1 turbidity was removed before its last request
+    assert [g[2] for g in helper_lib.generated] == [0.1, 0.2, 0.3, 0.1]
+    assert list(cache.images) == [get_params(turbidity=0.3), get_params(turbidity=0.1)]
+
+
+def test_file_cache(helper_lib, file_cache):
+    params = get_params()
+    im = SkyImageCache(world.generate_sky_image, file_cache=file_cache).get(params)
+    assert len(list(file_cache.cache_dir.rglob('*.npy'))) == 1
+
+    # new session loads image saved by previous one
+    cache = SkyImageCache(world.generate_sky_image, file_cache=file_cache)
+    loaded_im = cache.get(params)
+    assert len(helper_lib.generated) == 1
+    np.testing.assert_array_equal(loaded_im, im)
+    assert loaded_im.dtype == im.dtype
+    assert not loaded_im.flags.writeable
+
+    cache.get(get_params(turbidity=0.4))
+    assert len(helper_lib.generated) == 2
+
+
+def test_generation_failure(helper_lib, file_cache, monkeypatch):
+    monkeypatch.setattr(helper_lib, 'generate_sky_image', lambda width, height: None)
+    cache = SkyImageCache(world.generate_sky_image, file_cache=file_cache)
+    params = get_params()
+    assert cache.get(params) is None
+    assert not cache.images
+
+    # failed generation isn't cached in file
+    assert not list(file_cache.cache_dir.rglob('*.npy'))
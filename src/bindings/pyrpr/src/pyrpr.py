@@ -28,6 +28,8 @@ from typing import List
 import pyrprwrap
 from pyrprwrap import *
 
+from pyrpr_profiler import profiler
+
 
 lib_wrapped_log_calls = False
 
@@ -166,6 +168,8 @@ def init(log_fun, rprsdk_bin_path=None):
         # and to assert that SUCCESS is returned from them
         if lib_wrapped_log_calls:
             wrapped = wrap_core_log_call(wrapped, log_fun, 'RPR')
+        if profiler.enabled:
+            wrapped = profiler.wrap(wrapped, 'RPR', ffi)
         if wrapped.__name__ != 'RegisterPlugin':
             wrapped = wrap_core_check_success(wrapped, 'RPR')
         setattr(_module, name, wrapped)
@@ -422,7 +426,10 @@ class Scene(Object):
         super().delete()
 
     def attach(self, obj):
-        if isinstance(obj, Shape):
+        if isinstance(obj, ShapeChunks):
+            for chunk in obj.chunks:
+                SceneAttachShape(self, chunk)
+        elif isinstance(obj, Shape):
             SceneAttachShape(self, obj)
         elif isinstance(obj, AreaLight):
             SceneAttachShape(self, obj.mesh)
@@ -438,7 +445,10 @@ class Scene(Object):
         self.objects.add(obj)
 
     def detach(self, obj):
-        if isinstance(obj, Shape):
+        if isinstance(obj, ShapeChunks):
+            for chunk in obj.chunks:
+                SceneDetachShape(self, chunk)
+        elif isinstance(obj, Shape):
             SceneDetachShape(self, obj)
         elif isinstance(obj, AreaLight):
             SceneDetachShape(self, obj.mesh)
@@ -510,6 +520,7 @@ class Shape(Object):
         self.is_visible = True
 
         self.materials = []
+        self.material_faces = []    # [(material, face_indices)] kept by Mesh.set_material_faces()
         self.volume_material = None
         self.displacement_material = None
         self.hetero_volume = None
@@ -517,6 +528,11 @@ class Shape(Object):
         self.subdivision = None     # { 'factor': int, 'boundary': int, 'crease_weight': float }
         self.is_portal_light = False
 
+        self.visibility_flags = {}  # visibility type -> visible, set by set_visibility_ex()
+        self.light_group_id = None
+        self.object_id = None
+        self.contour_ignore = None
+
     def delete(self):
         if self.materials:
             self.set_material(None)
@@ -533,6 +549,7 @@ class Shape(Object):
         if self.materials:
             ShapeSetMaterial(self, None)
             self.materials.clear()
+            self.material_faces.clear()
 
         if material:
             ShapeSetMaterial(self, material)
@@ -598,12 +615,13 @@ class Shape(Object):
             "visible.primary": SHAPE_VISIBILITY_PRIMARY_ONLY_FLAG,
             }
         ShapeSetVisibilityFlag(self, flags[visibility_type], visible)
+        self.visibility_flags[visibility_type] = visible
 
     def set_visibility_in_specular(self, visible):
         ShapeSetVisibilityInSpecular(self, visible)
 
     def set_visibility_primary_only(self, visible):
-        ShapeSetVisibilityFlag(self, SHAPE_VISIBILITY_PRIMARY_ONLY_FLAG, visible)
+        self.set_visibility_ex("visible.primary", visible)
 
     def set_subdivision_factor(self, factor):
         ShapeSetSubdivisionFactor(self, factor)
@@ -622,6 +640,7 @@ class Shape(Object):
 
     def set_light_group_id(self, group_id):
         ShapeSetLightGroupID(self, group_id)
+        self.light_group_id = group_id
 
     def set_portal_light(self, is_portal):
         self.is_portal_light = is_portal
@@ -643,57 +662,77 @@ class Shape(Object):
 
     def set_id(self, id):
         ShapeSetObjectID(self, id)
+        self.object_id = id
+
+    def set_contour_ignore(self, ignore):
+        ShapeSetContourIgnore(self, ignore)
+        self.contour_ignore = ignore
+
+    def copy_settings(self, shape):
+        """
+        Applies materials, visibility and other settings of shape to this shape.
+        It is used when core shape is replaced by a new one with updated geometry.
+        Transform and vertex values aren't copied.
+        """
+        if shape.name is not None:
+            self.set_name(shape.name)
+        if shape.object_id is not None:
+            self.set_id(shape.object_id)
+
+        # whole shape material is the first one, followed by per face materials
+        if len(shape.materials) > len(shape.material_faces):
+            self.set_material(shape.materials[0])
+        for material, face_indices in shape.material_faces:
+            self.set_material_faces(material, face_indices)
+
+        if shape.volume_material:
+            self.set_volume_material(shape.volume_material)
+        if shape.displacement_material:
+            self.set_displacement_material(shape.displacement_material)
+        if shape.hetero_volume:
+            self.set_hetero_volume(shape.hetero_volume)
+
+        self.set_visibility(shape.is_visible)
+        for visibility_type, visible in shape.visibility_flags.items():
+            self.set_visibility_ex(visibility_type, visible)
+        if shape.shadow_catcher:
+            self.set_shadow_catcher(True)
+        if shape.reflection_catcher:
+            self.set_reflection_catcher(True)
+
+        self.subdivision = shape.subdivision
+        self.set_portal_light(shape.is_portal_light)
+        if shape.light_group_id is not None:
+            self.set_light_group_id(shape.light_group_id)
+        if shape.contour_ignore is not None:
+            self.set_contour_ignore(shape.contour_ignore)
 
 
 class Curve(Object):
     core_type_name = 'rpr_curve'
 
     def __init__(self, context, control_points, points_radii, uvs):
-        def to_segments(n):
-            """Index iterator which splits curve with n points to segments by 4"""
-            m = n - 1
-            for s in range(0, m, 3):
-                yield s
-                yield s + 1
-                yield min(s + 2, m)
-                yield min(s + 3, m)
-
-        def iter_segments_radii():
-            """ Get root and tip radii for each curve segment """
-            for e in range(0, curve_length, 4):
-                yield points_radii[segment_steps[e]]
-                yield points_radii[segment_steps[e + 3]]
-
         super().__init__()
         self.context = context
         self.material = None
 
         num_curves = control_points.shape[0]
-        segment_steps = np.fromiter(to_segments(control_points.shape[1]), dtype=np.int32)
-        curve_length = len(segment_steps)
-
-        # converting control_points to points splitted by segments
-        points = np.fromiter(
-            (elem for i in range(num_curves)
-                  for step in segment_steps
-                  for elem in control_points[i, step]),
-            dtype=np.float32
-        ).reshape(-1, 3)
+        points, curve_radii = self.split_segments(control_points, points_radii)
 
         if uvs is None:
             uvs_ptr = ffi.NULL
         else:
+            uvs = np.ascontiguousarray(uvs, dtype=np.float32)
             uvs_ptr = ffi.cast("float *", uvs.ctypes.data)
        
-        segments_per_curve = curve_length // 4
+        segments_per_curve = len(curve_radii) // 2
         # create list of indices 0-control_points length
         indices = np.arange(len(points), dtype=np.uint32)
 
-        # list full radius values for each curve
-        curve_radii = np.fromiter(iter_segments_radii(), dtype=np.float32)
-        radii = np.full((num_curves, len(curve_radii)), curve_radii, dtype=np.float32)
+        is_tapered = not np.all(curve_radii == curve_radii[0])
 
-        is_tapered = not np.all(radii == curve_radii[0])
+        # list full radius values for each curve
+        radii = np.tile(curve_radii, num_curves)
 
         # create list of segments per curve num_segments = length / 4
         segments = np.full(num_curves, segments_per_curve, dtype=np.int32)
@@ -705,7 +744,29 @@ class Curve(Object):
             uvs_ptr,
             ffi.cast('rpr_int*', segments.ctypes.data),
             1 if is_tapered else 0)
-        
+
+    @staticmethod
+    def split_segments(control_points, points_radii):
+        """
+        Splits curves of control_points (num_curves, num_points, 3) to segments by 4 points,
+        returns points of all segments and root and tip radii of segments of one curve
+        """
+        # indices which split curve with num_points points to segments by 4
+        last = control_points.shape[1] - 1
+        segment_starts = np.arange(0, last, 3, dtype=np.int32)
+        segment_steps = np.minimum(segment_starts[:, np.newaxis] + np.arange(4, dtype=np.int32),
+                                   last).ravel()
+
+        # converting control_points to points splitted by segments
+        points = np.ascontiguousarray(control_points[:, segment_steps], dtype=np.float32).reshape(-1, 3)
+
+        # root and tip radii for each curve segment
+        curve_radii = np.empty(len(segment_steps) // 2, dtype=np.float32)
+        curve_radii[0::2] = points_radii[segment_steps[0::4]]
+        curve_radii[1::2] = points_radii[segment_steps[3::4]]
+
+        return points, curve_radii
+
     def delete(self):
         self.set_material(None)
         super().delete()
@@ -787,12 +848,135 @@ class Mesh(Shape):
             )
 
 
+    def set_material_faces(self, material, face_indices: np.array):
+        super().set_material_faces(material, face_indices)
+        # face indices are kept to copy materials to mesh with updated geometry
+        self.material_faces.append((material, face_indices))
+
+
 class Instance(Shape):
     def __init__(self, context, mesh):
         super().__init__(context)
         self.mesh = mesh
         ContextCreateInstance(self.context, mesh, self)
 
+    @classmethod
+    def create_many(cls, context, mesh, transforms: np.array, names, settings=()):
+        """
+        Creates instances of mesh with transforms from (N, 4, 4) array of Blender matrices.
+        settings is a sequence of (method name, args) of Shape setters which are applied to every
+        instance, methods are looked up and transforms are converted once for all instances.
+        """
+        transforms = np.ascontiguousarray(transforms, dtype=np.float32)
+        transforms_ptr = ffi.cast('float*', transforms.ctypes.data)
+        transform_size = transforms[0].size if len(transforms) else 0
+        methods = tuple((getattr(cls, name), args) for name, args in settings)
+
+        instances = []
+        for i, name in enumerate(names):
+            instance = cls(context, mesh)
+            ShapeSetTransform(instance, True, transforms_ptr + i * transform_size)
+            instance.set_name(name)
+            for method, args in methods:
+                method(instance, *args)
+
+            instances.append(instance)
+
+        return instances
+
+
+class ShapeChunks(Shape):
+    """
+    Shape made of several core shapes (chunks), big mesh is exported by chunks of limited size.
+    There is no core object of ShapeChunks itself, Shape settings are applied to every chunk.
+    Face indices are indices of the whole shape faces, faces of chunks follow each other.
+    """
+
+    # Shape attributes which are set the same way for every chunk
+    CHUNK_STATE = ('name', 'shadow_catcher', 'reflection_catcher', 'is_visible',
+                   'volume_material', 'displacement_material', 'hetero_volume',
+                   'is_portal_light', 'light_group_id', 'object_id', 'contour_ignore')
+
+    def __init__(self, context, chunks):
+        # not super().__init__(), Mesh or Instance would create a core object
+        Shape.__init__(self, context)
+        self.chunks = chunks
+
+        chunk_faces = [chunk.poly_count if isinstance(chunk, Mesh) else chunk.mesh.poly_count
+                       for chunk in chunks]
+        self.poly_count = sum(chunk_faces)
+        self.face_offsets = np.cumsum([0] + chunk_faces, dtype=np.int64)
+
+    def _apply(self, method_name, *args):
+        for chunk in self.chunks:
+            getattr(chunk, method_name)(*args)
+
+        chunk = self.chunks[0]
+        for name in self.CHUNK_STATE:
+            setattr(self, name, getattr(chunk, name))
+        self.visibility_flags = chunk.visibility_flags.copy()
+
+    def __getattr__(self, name):
+        # backend specific methods of chunks, like set_motion_transform() of RPR 2
+        chunks = self.__dict__.get('chunks')
+        if chunks and name.startswith('set_') and all(hasattr(chunk, name) for chunk in chunks):
+            return lambda *args: self._apply(name, *args)
+
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    def set_material(self, material):
+        self._apply('set_material', material)
+        self.materials = [material] if material else []
+        self.material_faces = []
+
+    def set_material_faces(self, material, face_indices: np.array):
+        """ face_indices have to be sorted, they are split by chunks """
+        bounds = np.searchsorted(face_indices, self.face_offsets)
+        for i, chunk in enumerate(self.chunks):
+            if bounds[i] < bounds[i + 1]:
+                chunk.set_material_faces(material, np.ascontiguousarray(
+                    face_indices[bounds[i]:bounds[i + 1]] - self.face_offsets[i], dtype=np.int32))
+
+        self.materials.append(material)
+
+    def set_vertex_value(self, index: int, indices, values):
+        raise TypeError("Vertex values have to be set for every chunk", self)
+
+    def set_vertex_colors(self, colors):
+        raise TypeError("Vertex colors have to be set for every chunk", self)
+
+
+def _apply_to_chunks(method_name):
+    def method(self, *args):
+        self._apply(method_name, *args)
+
+    method.__name__ = method_name
+    return method
+
+
+for _method_name in ('set_name', 'set_volume_material', 'set_displacement_material',
+                     'set_displacement_scale', 'set_hetero_volume', 'set_transform',
+                     'set_linear_motion', 'set_angular_motion', 'set_scale_motion',
+                     'set_shadow_catcher', 'set_reflection_catcher', 'set_visibility',
+                     'set_visibility_ex', 'set_visibility_in_specular', 'set_subdivision_factor',
+                     'set_auto_adapt_subdivision_factor', 'set_subdivision_boundary_interop',
+                     'set_subdivision_crease_weight', 'set_subdivision_auto_ratio_cap',
+                     'set_light_group_id', 'set_portal_light', 'mark_static', 'set_id',
+                     'set_contour_ignore'):
+    setattr(ShapeChunks, _method_name, _apply_to_chunks(_method_name))
+
+
+class MeshChunks(ShapeChunks, Mesh):
+    """ Mesh exported by chunks, chunks are meshes of the same backend """
+
+
+class InstanceChunks(ShapeChunks, Instance):
+    """ Instance of MeshChunks, chunks are instances of mesh chunks """
+
+    def __init__(self, context, mesh: MeshChunks, chunks):
+        super().__init__(context, chunks)
+        self.mesh = mesh
+
 
 class Grid(Object):
     """ HeteroVolume grid data """
@@ -973,6 +1157,11 @@ class FrameBuffer(Object):
         ContextResolveFrameBuffer(self.context, self, resolved_fb, normalize_only)
         
     def get_data(self, buf=None):
+        if isinstance(buf, np.ndarray):
+            # preallocated numpy buffer of (height, width, channels) shape
+            FrameBufferGetInfo(self, FRAMEBUFFER_DATA, self.size(), ffi.cast('float*', buf.ctypes.data), ffi.NULL)
+            return buf
+
         if buf:
             FrameBufferGetInfo(self, FRAMEBUFFER_DATA, self.size(), ffi.cast('float*', buf), ffi.NULL)
             return buf
@@ -0,0 +1,193 @@
+#**********************************************************************
+# Copyright 2020 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#********************************************************************
+"""
+Aggregating profiler of core library calls.
+
+Library functions are wrapped only if profiler is enabled before library init(),
+therefore disabled profiler doesn't add any cost to core calls.
+Statistics are aggregated per phase and function: calls count, total and max time, bytes passed.
+Wall time of phases is recorded too: busy time summed over all threads and the first begin and
+the last end, so overlapping of phases executed in different threads is visible in report.
+"""
+
+import json
+import threading
+import time
+import functools
+
+
+DEFAULT_PHASE = 'other'
+
+# argument types which don't pass any data buffers
+SCALAR_TYPES = frozenset((int, float, bool, type(None)))
+
+
+class _NullPhase:
+    """ Phase context manager used when profiler is disabled """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+class _Phase:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.prev_name = None
+
+        self.time_begin = None
+
+    def __enter__(self):
+        local = self.profiler._local
+        self.prev_name = getattr(local, 'phase', DEFAULT_PHASE)
+        local.phase = self.name
+        self.time_begin = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.profiler.record_phase(self.name, self.time_begin, time.perf_counter())
+        self.profiler._local.phase = self.prev_name
+        return False
+
+
+class Profiler:
+    _null_phase = _NullPhase()
+
+    def __init__(self):
+        self.enabled = False
+
+        # (phase, function name) -> [count, total time, max time, bytes]
+        self.stats = {}
+        # phase -> [count, busy time, first begin, last end]
+        self.phase_times = {}
+        self.time_origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def phase(self, name):
+        """ Context manager which attributes core calls of current thread to phase name """
+        if not self.enabled:
+            return self._null_phase
+
+        return _Phase(self, name)
+
+    def reset(self):
+        with self._lock:
+            self.stats.clear()
+            self.phase_times.clear()
+            self.time_origin = time.perf_counter()
+
+    def record(self, name, elapsed, size=0):
+        key = (getattr(self._local, 'phase', DEFAULT_PHASE), name)
+        with self._lock:
+            stat = self.stats.get(key)
+            if stat is None:
+                self.stats[key] = [1, elapsed, elapsed, size]
+                return
+
+            stat[0] += 1
+            stat[1] += elapsed
+            if elapsed > stat[2]:
+                stat[2] = elapsed
+            stat[3] += size
+
+    def record_phase(self, name, time_begin, time_end):
+        with self._lock:
+            stat = self.phase_times.get(name)
+            if stat is None:
+                self.phase_times[name] = [1, time_end - time_begin, time_begin, time_end]
+                return
+
+            stat[0] += 1
+            stat[1] += time_end - time_begin
+            if time_begin < stat[2]:
+                stat[2] = time_begin
+            if time_end > stat[3]:
+                stat[3] = time_end
+
+    def wrap(self, f, module_name, ffi=None):
+        """ Wraps library function f to record its calls """
+        name = module_name + '::' + f.__name__
+        perf_counter = time.perf_counter
+
+        def get_size(argv):
+            size = 0
+            for arg in argv:
+                if type(arg) in SCALAR_TYPES:
+                    continue
+
+                if isinstance(arg, (bytes, str)):
+                    size += len(arg)
+                elif hasattr(arg, 'nbytes'):
+                    size += arg.nbytes
+                elif ffi is not None and isinstance(arg, ffi.CData) and ffi.typeof(arg).kind == 'array':
+                    size += ffi.sizeof(arg)
+            return size
+
+        @functools.wraps(f)
+        def wrapped(*argv):
+            time_begin = perf_counter()
+            result = f(*argv)
+            self.record(name, perf_counter() - time_begin, get_size(argv))
+            return result
+
+        return wrapped
+
+    def get_report(self) -> dict:
+        """
+        Returns statistics grouped by phase, functions are sorted by total time.
+        Phase 'wall' times are in seconds from reset(), busy time is summed over threads.
+        """
+        with self._lock:
+            items = sorted(self.stats.items(), key=lambda item: item[1][1], reverse=True)
+            phase_items = sorted(self.phase_times.items(), key=lambda item: item[1][2])
+            time_origin = self.time_origin
+
+        def new_phase_report():
+            return {'total_time': 0.0, 'calls': 0, 'functions': {}}
+
+        report = {}
+        for phase, (count, busy_time, time_begin, time_end) in phase_items:
+            report[phase] = new_phase_report()
+            report[phase]['wall'] = {
+                'count': count,
+                'busy_time': busy_time,
+                'begin': time_begin - time_origin,
+                'end': time_end - time_origin,
+            }
+
+        for (phase, name), (count, total, max_time, size) in items:
+            phase_report = report.setdefault(phase, new_phase_report())
+            phase_report['total_time'] += total
+            phase_report['calls'] += count
+            phase_report['functions'][name] = {
+                'count': count,
+                'total_time': total,
+                'max_time': max_time,
+                'bytes': size,
+            }
+
+        return report
+
+    def dump(self, file_path):
+        """ Saves statistics to JSON file """
+        with open(file_path, 'w') as f:
+            json.dump(self.get_report(), f, indent=2)
+
+
+profiler = Profiler()
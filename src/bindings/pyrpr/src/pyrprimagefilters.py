@@ -22,6 +22,7 @@ import pyrprimagefilterswrap
 from pyrprimagefilterswrap import *
 
 import pyrpr
+from pyrpr_profiler import profiler
 
 import bgl
 
@@ -69,6 +70,8 @@ def init(log_fun, rprsdk_bin_path):
 
         if lib_wrapped_log_calls:
             wrapped = pyrpr.wrap_core_log_call(wrapped, log_fun, 'RIF')
+        if profiler.enabled:
+            wrapped = profiler.wrap(wrapped, 'RIF', ffi)
         wrapped = pyrpr.wrap_core_check_success(wrapped, 'RIF')
         setattr(_module, name, wrapped)
     del _module
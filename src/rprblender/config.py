@@ -17,12 +17,56 @@ from .utils import logging
 logging.limit_log('', level_show_min=logging.INFO)
 
 pyrpr_log_calls = False
+# aggregated statistics of core calls is saved to $TEMP/rprblender at the end of final render
+pyrpr_profile_calls = False
 pyrprimagefilters_log_calls = False
 pyrprgltf_log_calls = False
 hybrid_unsupported_log_warn = False
 
+# debug mode: RPRContext checks its secondary object indices on every change
+check_rpr_context_indices = False
+
 material_library_path = None
 
+# persistent cache of converted image files, None means $TEMP/rprblender/cache/images
+image_cache_dir = None
+image_cache_max_size = 4 * 1024 ** 3    # bytes
+
+# generated Sun & Sky images are also stored on disk if size is set, 0 keeps them in memory only
+sky_image_cache_max_size = 0    # bytes
+
+# persistent cache of exported mesh data, could be a shared path of render farm, None disables it.
+# Mesh data is found by hash of evaluated mesh and modifier stack, so changed mesh is exported again,
+# least recently used files are removed when cache size exceeds mesh_cache_max_size
+mesh_cache_dir = None
+mesh_cache_max_size = 32 * 1024 ** 3    # bytes
+# smaller meshes aren't cached, their export is faster than calculation of cache key
+mesh_cache_min_polygons = 100000
+
+# mesh quads are exported as is instead of triangles if core supports them
+mesh_export_polygons = True
+
+# meshes with more polygons are exported by several core meshes (chunks) of this number of faces,
+# so memory used by export of big mesh depends on chunk size, 0 disables export by chunks
+mesh_export_chunk_size = 0
+
+# number of threads which prepare mesh data for export while engine makes core calls,
+# 0 means mesh data is prepared in sync thread.
+# Experimental, disabled by default: workers read mesh data by Blender API, which isn't thread safe
+sync_mesh_workers = 0
+
+# merging of equal material arithmetic nodes and simplification of identity operations
+material_optimize_nodes = True
+
+# compiled materials are cached by hash of material node tree, material nodes are created
+# without parsing of node tree on cache hit. This is max number of materials cached in memory,
+# 0 disables material cache
+material_cache_max_count = 1000
+# persistent cache of compiled materials, None means $TEMP/rprblender/cache/materials,
+# 0 size keeps compiled materials in memory only
+material_cache_dir = None
+material_cache_max_size = 256 * 1024 ** 2    # bytes
+
 enable_hybrid = True
 
 disable_athena_report = False
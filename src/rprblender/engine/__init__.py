@@ -30,6 +30,9 @@ def pyrpr_init(bindings_import_path, rprsdk_bin_path):
         sys.path.append(bindings_import_path)
 
     try:
+        import pyrpr_profiler
+        pyrpr_profiler.profiler.enabled = config.pyrpr_profile_calls
+
         import pyrpr
         import pyhybrid
         import pyrpr2
@@ -63,11 +66,13 @@ def pyrpr_init(bindings_import_path, rprsdk_bin_path):
     return True
 
 
+# core libraries of installed addon, pyrpr could be already loaded on addon reload
+rprsdk_bin_path = utils.package_root_dir()
+
 if 'pyrpr' not in sys.modules:
 
     # try loading pyrpr for installed addon
     bindings_import_path = str(utils.package_root_dir())
-    rprsdk_bin_path = utils.package_root_dir()
     if not pyrpr_init(bindings_import_path, rprsdk_bin_path):
         logging.warn("Failed to load rpr from %s. One more attempt will be provided." % bindings_import_path)
 
@@ -3,22 +3,332 @@
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at
-# 
+#
 #     http://www.apache.org/licenses/LICENSE-2.0
-# 
+#
 # Unless required by applicable law or agreed to in writing, software
 # distributed under the License is distributed on an "AS IS" BASIS,
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #********************************************************************
+import zlib
+
+import numpy as np
+
 from .render_engine import RenderEngine
 from .render_engine_2 import RenderEngine2
+from rprblender.export import object, material, world
+from rprblender.utils import get_data_from_collection
+
+from rprblender.utils import logging
+log = logging.Log(tag='AnimationEngine')
+
+
+class AnimationState:
+    """ Render context and exported data kept between frames of animation for one view layer """
+
+    def __init__(self, rpr_context, scene_name, use_contour):
+        self.rpr_context = rpr_context
+        self.scene_name = scene_name
+        self.use_contour = use_contour
+
+        self.frame = None
+        self.image_filter = None
+        self.world_data = None
+
+        # object key -> (transform, geometry, settings) signature of objects of previous frame
+        self.signatures = {}
+        # object key -> geometry signature of hidden objects exported as instances source
+        self.hidden_signatures = {}
+
+
+def get_geometry_signature(mesh):
+    """
+    Returns signature of exported mesh data: positions, topology, smoothing, material indices,
+    UVs and vertex colors. Custom normals can't be compared, None is returned for them.
+    """
+    if mesh.has_custom_normals:
+        return None
+
+    crc = 0
+    for collection, attribute, item_size, dtype in (
+            (mesh.vertices, 'co', 3, np.float32),
+            (mesh.loops, 'vertex_index', 1, np.int32),
+            (mesh.polygons, 'loop_total', 1, np.int32),
+            (mesh.polygons, 'use_smooth', 1, bool),
+            (mesh.polygons, 'material_index', 1, np.int32),
+            *((layer.data, 'uv', 2, np.float32) for layer in mesh.uv_layers),
+            *((layer.data, 'color', 4, np.float32) for layer in mesh.vertex_colors),
+    ):
+        data = get_data_from_collection(collection, attribute, (len(collection), item_size), dtype)
+        crc = zlib.crc32(data, crc)
+
+    return (len(mesh.vertices), len(mesh.polygons), len(mesh.loops), len(mesh.uv_layers),
+            len(mesh.vertex_colors), mesh.use_auto_smooth, mesh.auto_smooth_angle, crc)
+
+
+def get_settings_signature(obj):
+    """ Returns signature of object settings: visibility, catchers, subdivision, pass index """
+    cycles_visibility = obj.cycles_visibility
+    return (obj.pass_index, obj.hide_render, material.get_struct_values(obj.rpr),
+            (cycles_visibility.camera, cycles_visibility.diffuse, cycles_visibility.glossy,
+             cycles_visibility.transmission, cycles_visibility.scatter, cycles_visibility.shadow))
+
+
+def get_signature(obj):
+    """
+    Returns (transform, geometry, settings) signature of evaluated object.
+    Geometry signature is None if it can't be compared, such object is re-exported every frame.
+    """
+    transform = np.array(obj.matrix_world, dtype=np.float32).tobytes()
+    settings = get_settings_signature(obj)
+
+    if obj.type != 'MESH' or obj.mode != 'OBJECT' or \
+            any(p_sys.settings.type == 'HAIR' for p_sys in obj.particle_systems):
+        return transform, None, settings
+
+    return transform, get_geometry_signature(obj.data), settings
 
 
 class AnimationEngine(RenderEngine):
-    pass
+    """
+    Final render engine for animation.
+    Render context is kept between frames, only changed objects, materials and world are re-exported.
+    """
+
+    # AnimationState for each rendered view layer
+    states = {}
+
+    def __init__(self, rpr_engine):
+        super().__init__(rpr_engine)
+
+        self.state: AnimationState = None
+        self.is_last_frame = False
+        self.is_incremental = False
+        self.prev_hidden_signatures = {}
+        self.report = {}
+
+    def _get_state(self, scene, view_layer_name):
+        """ Returns state of previous frame if it could be continued by current frame """
+        state = AnimationEngine.states.get(view_layer_name)
+        if not state:
+            return None
+
+        # render job starts at frame_start, state of previous job could be left by stopped render
+        if type(state.rpr_context) is self._RPRContext and state.scene_name == scene.name and \
+                state.use_contour == scene.rpr.is_contour_used and \
+                state.frame < scene.frame_current and scene.frame_current != scene.frame_start:
+            return state
+
+        log(f"Reset animation state of view layer '{view_layer_name}'")
+        del AnimationEngine.states[view_layer_name]
+        return None
+
+    def _get_tile_devices(self, scene):
+        # contexts of separate devices aren't kept between frames
+        return []
+
+    def _init_rpr_context(self, scene):
+        if self.state:
+            self.rpr_context = self.state.rpr_context
+            return
+
+        super()._init_rpr_context(scene)
+        self.state = AnimationState(self.rpr_context, scene.name, self.use_contour)
+        AnimationEngine.states[self.render_layer_name] = self.state
+
+    def sync(self, depsgraph):
+        scene = depsgraph.scene
+
+        self.state = self._get_state(scene, depsgraph.view_layer.name)
+        self.is_incremental = self.state is not None
+        # with frame_step > 1 the last rendered frame could be lower than frame_end
+        self.is_last_frame = scene.frame_current + scene.frame_step > scene.frame_end
+        self.report = dict.fromkeys(('reused', 'transform', 'geometry', 'settings', 'material',
+                                     'light', 'added', 'removed', 'instances', 'world'), 0)
+
+        super().sync(depsgraph)
+
+        if not self.is_synced:
+            return
+
+        self.state.frame = scene.frame_current
+        log.info(f"Frame {scene.frame_current} sync:",
+                 ", ".join(f"{name} {count}" for name, count in self.report.items()))
+
+    def render(self):
+        try:
+            super().render()
+
+        finally:
+            if self.state and (not self.is_synced or self.is_last_frame or
+                               self.rpr_engine.test_break()):
+                AnimationEngine.states.pop(self.render_layer_name, None)
+                self.state = None
+
+    def setup_image_filter(self, settings):
+        self.image_filter = self.state.image_filter
+        super().setup_image_filter(settings)
+        self.state.image_filter = self.image_filter
+
+    def _remove_instances(self):
+        """ Removes instances, particles and instanced lights, they are exported again every frame """
+        for obj_key in tuple(key for key in self.rpr_context.objects if isinstance(key, tuple)):
+            self.rpr_context.remove_object(obj_key)
+
+    def _sync_object_materials(self, obj, is_updated_transform, material_override,
+                               updated_material_keys) -> bool:
+        """
+        Removes animated materials of object and object dependent materials of moved object,
+        they are exported again by object sync_update. Returns True if object has such materials.
+        """
+        materials = (material_override,) if material_override else \
+            (slot.material for slot in obj.material_slots if slot.material)
+
+        is_updated = False
+        for mat in materials:
+            if not (material.is_animated(mat) or is_updated_transform and
+                    material.is_material_object_dependent(mat, self.rpr_context)):
+                continue
+
+            is_updated = True
+            mat_key = material.key(mat, obj, rpr_context=self.rpr_context)
+            if mat_key in updated_material_keys:
+                continue
+
+            updated_material_keys.add(mat_key)
+            self.report['material'] += 1
+            for input_socket_key in ('Surface', 'Volume', 'Displacement'):
+                socket_key = material.key(mat, obj, input_socket_key, self.rpr_context)
+                if socket_key in self.rpr_context.materials:
+                    self.rpr_context.remove_material(socket_key)
+
+        return is_updated
+
+    def _sync_objects(self, depsgraph) -> bool:
+        if not self.is_incremental:
+            if not super()._sync_objects(depsgraph):
+                return False
+
+            self.state.signatures = {object.key(obj): get_signature(obj)
+                                     for obj in self.depsgraph_objects(depsgraph)}
+            self.report['added'] = len(self.state.signatures)
+            return True
+
+        scene = depsgraph.scene
+        view_layer = depsgraph.view_layer
+        material_override = view_layer.material_override
+
+        # instances are removed before objects so changed meshes aren't kept hidden by them
+        self._remove_instances()
+        self.rpr_context.start_update()
+
+        prev_signatures = self.state.signatures
+        signatures = {}
+        updated_material_keys = set()
+
+        objects_len = len(depsgraph.objects)
+        for i, obj in enumerate(self.depsgraph_objects(depsgraph)):
+            self.notify_status(0, "Syncing object (%d/%d): %s" % (i, objects_len, obj.name))
+
+            obj_key = object.key(obj)
+            signature = get_signature(obj)
+            signatures[obj_key] = signature
+            prev_signature = prev_signatures.get(obj_key)
+
+            # the correct collection visibility info is stored in original object
+            indirect_only = obj.original.indirect_only_get(view_layer=view_layer)
+            kwargs = {
+                'indirect_only': indirect_only,
+                'material_override': material_override,
+                'frame_current': scene.frame_current,
+                'use_contour': self.use_contour,
+            }
+
+            if prev_signature is None:
+                object.sync(self.rpr_context, obj, **kwargs)
+                self.report['added'] += 1
+
+            elif obj.type == 'LIGHT':
+                object.sync_update(self.rpr_context, obj, True, True, **kwargs)
+                self.report['light'] += 1
+
+            elif signature[2] != prev_signature[2]:
+                # object settings are applied only by full export
+                self.rpr_context.remove_object(obj_key)
+                object.sync(self.rpr_context, obj, **kwargs)
+                self.report['settings'] += 1
+
+            else:
+                is_updated_transform = signature[0] != prev_signature[0]
+                is_updated_geometry = signature[1] is None or signature[1] != prev_signature[1]
+                is_updated_material = self._sync_object_materials(
+                    obj, is_updated_transform, material_override, updated_material_keys)
+
+                if is_updated_geometry or is_updated_transform or is_updated_material:
+                    object.sync_update(self.rpr_context, obj, is_updated_geometry,
+                                       is_updated_transform, **kwargs)
+                    self.report['geometry' if is_updated_geometry else 'transform'] += 1
+                else:
+                    self.report['reused'] += 1
+
+            if self.rpr_engine.test_break():
+                log.warn("Syncing stopped by user termination")
+                return False
+
+        for obj_key in prev_signatures.keys() - signatures.keys():
+            self.rpr_context.remove_object(obj_key)
+            self.report['removed'] += 1
+
+        self.state.signatures = signatures
+        return True
+
+    def _sync_instances(self, depsgraph) -> bool:
+        self.prev_hidden_signatures = self.state.hidden_signatures
+        self.state.hidden_signatures = {}
+
+        if not super()._sync_instances(depsgraph):
+            return False
+
+        # hidden source objects which are not instanced anymore
+        for obj_key in self.prev_hidden_signatures.keys() - self.state.hidden_signatures.keys():
+            if obj_key in self.state.signatures:
+                continue
+
+            self.rpr_context.remove_object(obj_key)
+            self.report['removed'] += 1
+
+        self.report['instances'] = sum(isinstance(key, tuple) for key in self.rpr_context.objects)
+        return True
+
+    def _sync_instance(self, inst, view_layer, material_override, frame_current):
+        obj = inst.object
+        obj_key = object.key(obj)
+
+        # hidden source object of instances is exported by instance.sync and kept between frames
+        if obj_key not in self.state.signatures and obj_key not in self.state.hidden_signatures:
+            geometry = get_signature(obj)[1]
+            self.state.hidden_signatures[obj_key] = geometry
+
+            if self.is_incremental and obj_key in self.rpr_context.objects:
+                materials = (material_override,) if material_override else \
+                    (slot.material for slot in obj.material_slots if slot.material)
+                if geometry is None or geometry != self.prev_hidden_signatures.get(obj_key) or \
+                        any(material.is_animated(mat) for mat in materials):
+                    self.rpr_context.remove_object(obj_key)
+
+        super()._sync_instance(inst, view_layer, material_override, frame_current)
+
+    def _sync_world(self, depsgraph):
+        world_data = world.WorldData.init_from_world(self._get_evaluated_world(depsgraph))
+        if not self.is_incremental or world_data != self.state.world_data:
+            world_data.export(self.rpr_context)
+            self.state.world_data = world_data
+            self.report['world'] += 1
+
+        self.world_backplate = world_data.backplate
 
 
-class AnimationEngine2(RenderEngine2):
+class AnimationEngine2(AnimationEngine, RenderEngine2):
     pass
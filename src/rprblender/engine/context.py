@@ -13,9 +13,25 @@
 # limitations under the License.
 #********************************************************************
 import threading
+import numpy as np
 
 import pyrpr
 import pyrpr2
+from pyrpr_profiler import profiler
+
+from rprblender import config
+
+
+def _discard_index_key(index, index_key, key):
+    """ Removes key from set index[index_key], empty sets are removed from index """
+    keys = index.get(index_key)
+    if keys is None:
+        return
+
+    keys.discard(key)
+    if not keys:
+        del index[index_key]
+
 
 class RPRContext:
     """ Manager of pyrpr calls """
@@ -44,6 +60,9 @@ class RPRContext:
 
     _PostEffect = pyrpr.PostEffect
 
+    # mesh faces could be quads, otherwise meshes are triangulated
+    supports_quads = True
+
     def __init__(self):
         self.context = None
         self.material_system = None
@@ -61,6 +80,27 @@ class RPRContext:
         self.curves = {}
         self.volumes = {}
 
+        # secondary indices of objects, curves and volumes, they are kept in sync with
+        # the dictionaries above by create_*/remove_* methods:
+        # parent key -> keys of child objects with (parent key, ...) key
+        self.child_object_keys = {}
+        # mesh -> keys of its instances, and back
+        self.mesh_instances = {}
+        self.instance_meshes = {}
+        # base object key -> keys of its curves and volumes
+        self.object_curves = {}
+        self.object_volumes = {}
+
+        # hidden master meshes of linked duplicates: mesh data key -> master mesh, and back.
+        # Objects which share mesh data are instances of its master mesh,
+        # master mesh is removed with its last instance
+        self.master_meshes = {}
+        self.master_mesh_keys = {}
+        # keys of master meshes which were recreated during current update
+        self.updated_master_keys = set()
+        # object key -> kept data of deformed mesh, see export.mesh.sync_deformation()
+        self.mesh_deformations = {}
+
         self.do_motion_blur = False
         self.engine_type = None
 
@@ -68,12 +108,30 @@ class RPRContext:
         self.material_nodes = {}
         self.materials = {}
 
+        # material key -> node keys of material, used to remove material nodes without full scan
+        self.material_node_keys = {}
+        # material key -> object keys which use material, and back
+        self.material_users = {}
+        self.object_materials = {}
+        # material key -> params of material which could be updated in place
+        self.material_params = {}
+        # material name -> is material specialized per object, memoized during one update
+        self.object_dependent_materials = {}
+        # material name -> {object or instance key: (object reference, slot indices)} of shapes
+        # which have material in slots of object, and back: key -> material names of its slots
+        self.material_slot_users = {}
+        self.object_material_slots = {}
+
         self.images = {}
         self.post_effect = None
 
         # list of frame buffers for AOVs
         self.frame_buffers_aovs = {}
 
+        # reusable numpy buffers for frame buffers data: (key, shape) -> np.array
+        self.image_buffers = {}
+        self.image_buffers_allocations = 0
+
         # shadow and reflection catchers
         self.composite = None
         self.use_shadow_catcher = False
@@ -117,8 +175,26 @@ class RPRContext:
         self.curves = {}
         self.volumes = {}
 
+        self.child_object_keys = {}
+        self.mesh_instances = {}
+        self.instance_meshes = {}
+        self.object_curves = {}
+        self.object_volumes = {}
+
+        self.master_meshes = {}
+        self.master_mesh_keys = {}
+        self.updated_master_keys = set()
+        self.mesh_deformations = {}
+
         self.material_nodes = {}
         self.materials = {}
+        self.material_node_keys = {}
+        self.material_users = {}
+        self.object_materials = {}
+        self.material_params = {}
+        self.object_dependent_materials = {}
+        self.material_slot_users = {}
+        self.object_material_slots = {}
 
         self.images = {}
 
@@ -126,16 +202,40 @@ class RPRContext:
         if restart:
             self.clear_frame_buffers()
 
-        if tile is None:
-            self.context.render()
-        else:
-            self.context.render_tile(*tile)
+        with profiler.phase('render'):
+            if tile is None:
+                self.context.render()
+            else:
+                self.context.render_tile(*tile)
 
     def abort_render(self):
         self.context.abort_render()
 
-    def get_image(self, aov_type=None):
-        return self.get_frame_buffer(aov_type).get_data()
+    def get_image(self, aov_type=None, pooled=False):
+        """
+        Returns frame buffer data of aov_type.
+        If pooled is True data is copied to reusable buffer, which is valid till next
+        get_image(aov_type, pooled=True) call, so it has to be consumed before that.
+        """
+        fb = self.get_frame_buffer(aov_type)
+        if not pooled:
+            return fb.get_data()
+
+        return fb.get_data(self.get_image_buffer(aov_type, (fb.height, fb.width, fb.channels)))
+
+    def get_image_buffer(self, key, shape):
+        """ Returns reusable float32 buffer of required shape, buffers are released on resize """
+        buf_key = (key, shape)
+        buf = self.image_buffers.get(buf_key, None)
+        if buf is None:
+            buf = np.empty(shape, dtype=np.float32)
+            self.image_buffers[buf_key] = buf
+            self.image_buffers_allocations += 1
+
+        return buf
+
+    def clear_image_buffers(self):
+        self.image_buffers = {}
 
     def get_frame_buffer(self, aov_type=None):
         if aov_type is not None:
@@ -150,14 +250,15 @@ class RPRContext:
         return self.frame_buffers_aovs[pyrpr.AOV_COLOR]['res']
 
     def resolve(self):
-        for aov, fbs in self.frame_buffers_aovs.items():
-            fbs['aov'].resolve(fbs['res'], aov != pyrpr.AOV_SHADOW_CATCHER)
+        with profiler.phase('resolve'):
+            for aov, fbs in self.frame_buffers_aovs.items():
+                fbs['aov'].resolve(fbs['res'], aov != pyrpr.AOV_SHADOW_CATCHER)
 
-        if self.composite:
-            color_aov = self.frame_buffers_aovs[pyrpr.AOV_COLOR]
-            self.composite.compute(color_aov['composite'])
-            if self.gl_interop:
-                color_aov['composite'].resolve(color_aov['gl'])
+            if self.composite:
+                color_aov = self.frame_buffers_aovs[pyrpr.AOV_COLOR]
+                self.composite.compute(color_aov['composite'])
+                if self.gl_interop:
+                    color_aov['composite'].resolve(color_aov['gl'])
 
     def enable_aov(self, aov_type):
         if self.is_aov_enabled(aov_type):
@@ -181,6 +282,9 @@ class RPRContext:
         self.context.detach_aov(aov_type)
         del self.frame_buffers_aovs[aov_type]
 
+        for buf_key in tuple(k for k in self.image_buffers if k[0] == aov_type):
+            del self.image_buffers[buf_key]
+
     def disable_aovs(self):
         for aov_type in tuple(self.frame_buffers_aovs.keys()):
             self.disable_aov(aov_type)
@@ -192,6 +296,9 @@ class RPRContext:
         self.context.set_aov_index_lookup(key, r, g, b, a)
 
     def resize(self, width, height):
+        if (width, height) != (self.width, self.height):
+            self.clear_image_buffers()
+
         self.width = width
         self.height = height
 
@@ -355,8 +462,59 @@ class RPRContext:
     #
     # OBJECT'S CREATION FUNCTIONS
     #
+    def _set_object(self, key, obj, mesh=None):
+        """ Sets object by key, mesh is the base mesh of instance obj """
+        prev_mesh = None
+        if key in self.objects:
+            # master mesh of replaced instance could be the base mesh of new instance,
+            # it is released after new instance is registered
+            prev_mesh = self.instance_meshes.get(key)
+            self._pop_object(key, release_master_mesh=False)
+
+        self.objects[key] = obj
+        if isinstance(key, tuple):
+            self.child_object_keys.setdefault(key[0], set()).add(key)
+
+        if mesh is not None:
+            self.mesh_instances.setdefault(mesh, set()).add(key)
+            self.instance_meshes[key] = mesh
+
+        if prev_mesh is not None:
+            self._release_master_mesh(prev_mesh)
+
+    def _pop_object(self, key, release_master_mesh=True):
+        obj = self.objects.pop(key)
+        self.mesh_deformations.pop(key, None)
+        if isinstance(key, tuple):
+            _discard_index_key(self.child_object_keys, key[0], key)
+
+        mesh = self.instance_meshes.pop(key, None)
+        if mesh is not None:
+            _discard_index_key(self.mesh_instances, mesh, key)
+            if release_master_mesh:
+                self._release_master_mesh(mesh)
+
+        self._remove_material_slots(key)
+        return obj
+
+    def _release_master_mesh(self, mesh):
+        """ Removes master mesh which has no instances anymore """
+        if mesh in self.mesh_instances:
+            return
+
+        key = self.master_mesh_keys.pop(mesh, None)
+        if key is None:
+            return
+
+        # master mesh could be already replaced by updated one
+        if self.master_meshes.get(key) is mesh:
+            del self.master_meshes[key]
+
+        self.scene.detach(mesh)
+
     def create_empty_object(self, key):
-        self.objects[key] = None
+        self._set_object(key, None)
+        self._check_indices()
         return None
 
     def create_light(self, key, light_type):
@@ -375,7 +533,8 @@ class RPRContext:
         else:
             raise KeyError("No such light type", light_type)
 
-        self.objects[key] = light
+        self._set_object(key, light)
+        self._check_indices()
         return light
 
     def create_environment_light(self):
@@ -394,7 +553,8 @@ class RPRContext:
             num_face_vertices
         )
         light = self._AreaLight(mesh, self.material_system)
-        self.objects[key] = light
+        self._set_object(key, light)
+        self._check_indices()
         return light
 
     def create_mesh(
@@ -409,39 +569,225 @@ class RPRContext:
             vertex_indices, normal_indices, uv_indices,
             num_face_vertices
         )
-        self.objects[key] = mesh
+        self._set_object(key, mesh)
+        self._check_indices()
+        return mesh
+
+    def create_mesh_chunk(
+            self,
+            vertices, normals, uvs,
+            vertex_indices, normal_indices, uv_indices,
+            num_face_vertices
+    ):
+        """ Creates core mesh of one chunk of big mesh, it is registered by create_mesh_chunks() """
+        return self._Mesh(
+            self.context,
+            vertices, normals, uvs,
+            vertex_indices, normal_indices, uv_indices,
+            num_face_vertices
+        )
+
+    def create_mesh_chunks(self, key, chunks):
+        """
+        Creates mesh of key from meshes of create_mesh_chunk(). Chunks share transform,
+        materials and visibility, they are updated and removed together by key.
+        """
+        mesh = pyrpr.MeshChunks(self.context, chunks)
+        self._set_object(key, mesh)
+        self._check_indices()
+        return mesh
+
+    def update_mesh(
+            self, key,
+            vertices, normals, uvs,
+            vertex_indices, normal_indices, uv_indices,
+            num_face_vertices
+    ):
+        """
+        Replaces mesh of key by a new one with updated geometry, core has no way to change
+        vertices of existing mesh. Materials, visibility and other core settings are copied
+        from previous mesh, which must have no instances, they aren't exported again.
+        """
+        prev_mesh = self.objects[key]
+        mesh = self._Mesh(
+            self.context,
+            vertices, normals, uvs,
+            vertex_indices, normal_indices, uv_indices,
+            num_face_vertices
+        )
+        mesh.copy_settings(prev_mesh)
+
+        self._set_object(key, mesh)
+        self.scene.attach(mesh)
+        self.scene.detach(prev_mesh)
+        self._check_indices()
+        return mesh
+
+    def create_master_mesh(
+            self, key,
+            vertices, normals, uvs,
+            vertex_indices, normal_indices, uv_indices,
+            num_face_vertices
+    ):
+        """
+        Creates hidden mesh of mesh data key shared by linked duplicates.
+        It is removed when its last instance is removed.
+        """
+        mesh = self._Mesh(
+            self.context,
+            vertices, normals, uvs,
+            vertex_indices, normal_indices, uv_indices,
+            num_face_vertices
+        )
+        mesh.set_visibility(False)
+        self.scene.attach(mesh)
+
+        self.master_meshes[key] = mesh
+        self.master_mesh_keys[mesh] = key
         return mesh
 
+    def expire_master_mesh(self, key):
+        """
+        Marks master mesh of changed mesh data key as outdated, so it is recreated by next user.
+        During one update master mesh is recreated only once, previous master mesh is kept
+        until all its users are updated.
+        """
+        if key in self.updated_master_keys:
+            return
+
+        self.updated_master_keys.add(key)
+        self.master_meshes.pop(key, None)
+
+    def start_update(self):
+        """ Starts new update of scene objects """
+        self.updated_master_keys.clear()
+        self.object_dependent_materials.clear()
+
     def create_instance(self, key, mesh):
-        instance = self._Instance(self.context, mesh)
-        self.objects[key] = instance
+        if isinstance(mesh, pyrpr.MeshChunks):
+            instance = pyrpr.InstanceChunks(self.context, mesh, [self._Instance(self.context, chunk)
+                                                                for chunk in mesh.chunks])
+        else:
+            instance = self._Instance(self.context, mesh)
+
+        self._set_object(key, instance, mesh)
+        self._check_indices()
         return instance
 
+    def create_instances(self, keys, mesh, transforms, names, settings=()):
+        """
+        Creates instances of mesh by keys at once with transforms from (N, 4, 4) array,
+        settings are (method name, args) of Shape setters applied to every instance.
+        """
+        if isinstance(mesh, pyrpr.MeshChunks):
+            instances = []
+            for key, transform, name in zip(keys, transforms, names):
+                instance = self.create_instance(key, mesh)
+                instance.set_transform(np.ascontiguousarray(transform))
+                instance.set_name(name)
+                for method_name, args in settings:
+                    getattr(instance, method_name)(*args)
+
+                instances.append(instance)
+
+            return instances
+
+        instances = self._Instance.create_many(self.context, mesh, transforms, names, settings)
+        for key, instance in zip(keys, instances):
+            self._set_object(key, instance, mesh)
+
+        self._check_indices()
+        return instances
+
     def create_curve(self, key, control_points, points_radii, uvs):
         curve = self._Curve(self.context, control_points, points_radii, uvs)
         self.curves[key] = curve
+        self.object_curves.setdefault(key[0], set()).add(key)
+        self._check_indices()
         return curve
 
     def create_hetero_volume(self, key):
         volume = self._HeteroVolume(self.context)
         self.volumes[key] = volume
+        self.object_volumes.setdefault(key[0], set()).add(key)
+        self._check_indices()
         return volume
 
     def create_camera(self, key=None):
         camera = self._Camera(self.context)
         if key:
-            self.objects[key] = camera
+            self._set_object(key, camera)
+            self._check_indices()
         return camera
 
     def create_material_node(self, material_type):
         return self._MaterialNode(self.material_system, material_type)
 
     def set_material_node_key(self, key, material_node):
+        if key not in self.material_nodes:
+            self.material_node_keys.setdefault(key[0], []).append(key)
         self.material_nodes[key] = material_node
 
     def set_material_node_as_material(self, key, material_node):
         self.materials[key] = material_node
 
+    def set_material_params(self, key, params):
+        self.material_params[key] = params
+
+    def add_material_user(self, key, obj_key):
+        """ Registers object obj_key as user of material key """
+        self.material_users.setdefault(key, set()).add(obj_key)
+        self.object_materials.setdefault(obj_key, set()).add(key)
+
+    def set_material_slots(self, keys, obj_ref, material_slots: dict):
+        """
+        Registers materials in slots of objects or instances keys, material_slots is
+        material name -> slot indices, obj_ref is reference of object which owns slots.
+        Previously registered slots of keys are replaced.
+        """
+        for key in keys:
+            if key in self.object_material_slots:
+                self._remove_material_slots(key)
+
+        if not keys:
+            self._check_indices()
+            return
+
+        mat_names = tuple(material_slots)
+        users = tuple((self.material_slot_users.setdefault(mat_name, {}), (obj_ref, indices))
+                      for mat_name, indices in material_slots.items())
+        for key in keys:
+            for mat_users, user in users:
+                mat_users[key] = user
+            if mat_names:
+                self.object_material_slots[key] = mat_names
+
+        self._check_indices()
+
+    def _remove_material_slots(self, key):
+        for mat_name in self.object_material_slots.pop(key, ()):
+            users = self.material_slot_users[mat_name]
+            del users[key]
+            if not users:
+                del self.material_slot_users[mat_name]
+
+    def share_material_users(self, obj_key, keys):
+        """ Registers keys as users of all materials of object obj_key """
+        for mat_key in tuple(self.object_materials.get(obj_key, ())):
+            for key in keys:
+                self.add_material_user(mat_key, key)
+
+    def remove_material_users(self, obj_key):
+        """ Unregisters obj_key from its materials, materials without users are removed """
+        for mat_key in self.object_materials.pop(obj_key, ()):
+            users = self.material_users.get(mat_key)
+            if users is None:
+                continue
+
+            users.discard(obj_key)
+            if not users and mat_key in self.materials:
+                self.remove_material(mat_key)
+
     def create_image_file(self, key, filepath):
         image = pyrpr.ImageFile(self.context, filepath)
         if key:
@@ -499,11 +845,10 @@ class RPRContext:
 
         if isinstance(obj, pyrpr.Mesh):
             # removing and detaching related instances
-            instance_keys = tuple(k for k in self.objects.keys()
-                                    if isinstance(k, tuple) and k[0] == key)
-            for k in instance_keys:
-                instance = self.objects.pop(k)
+            for k in tuple(self.child_object_keys.get(key, ())):
+                instance = self._pop_object(k)
                 self.scene.detach(instance)
+                self.remove_material_users(k)
 
         self.remove_curves(key)
         self.remove_volumes(key)
@@ -511,34 +856,78 @@ class RPRContext:
         if isinstance(obj, pyrpr.Mesh):
             # checking if object has direct instances,
             # in this case we don't remove/detach object, just hiding it
-            has_instances = next((True for o in self.objects.values()
-                                       if isinstance(o, pyrpr.Instance) and o.mesh is obj), False)
-            if has_instances:
+            if self.mesh_instances.get(obj):
                 obj.set_visibility(False)
+                self._check_indices()
                 return
 
         if obj:
             self.scene.detach(obj)
 
-        del self.objects[key]
+        self._pop_object(key)
+        self.remove_material_users(key)
+        self._check_indices()
 
     def remove_curves(self, base_obj_key):
-        keys = tuple(k for k in self.curves.keys() if k[0] == base_obj_key)
-        for k in keys:
+        for k in self.object_curves.pop(base_obj_key, ()):
             particle = self.curves.pop(k)
             self.scene.detach(particle)
 
     def has_curves(self, base_obj_key):
-        return bool(next((k for k in self.curves.keys() if k[0] == base_obj_key), None))
+        return bool(self.object_curves.get(base_obj_key))
 
     def remove_volumes(self, base_obj_key):
-        keys = tuple(k for k in self.volumes.keys() if k[0] == base_obj_key)
-        for k in keys:
+        for k in self.object_volumes.pop(base_obj_key, ()):
             volume = self.volumes.pop(k)
             self.scene.detach(volume)
 
     def has_volumes(self, base_obj_key):
-        return bool(next((k for k in self.volumes.keys() if k[0] == base_obj_key), None))
+        return bool(self.object_volumes.get(base_obj_key))
+
+    def _check_indices(self):
+        """
+        Debug mode check that secondary indices correspond to objects, curves and volumes.
+        Enabled by config.check_rpr_context_indices, it does full scan on every change.
+        """
+        if not config.check_rpr_context_indices:
+            return
+
+        def group_keys(keys):
+            index = {}
+            for k in keys:
+                index.setdefault(k[0], set()).add(k)
+            return index
+
+        assert self.child_object_keys == group_keys(k for k in self.objects if isinstance(k, tuple)), \
+            "Incorrect child_object_keys index"
+        assert self.object_curves == group_keys(self.curves), "Incorrect object_curves index"
+        assert self.object_volumes == group_keys(self.volumes), "Incorrect object_volumes index"
+
+        assert all(isinstance(self.objects.get(k), pyrpr.Instance) and self.objects[k].mesh is mesh
+                   for k, mesh in self.instance_meshes.items()), "Incorrect instance_meshes index"
+        mesh_instances = {}
+        for k, mesh in self.instance_meshes.items():
+            mesh_instances.setdefault(mesh, set()).add(k)
+        assert self.mesh_instances == mesh_instances, "Incorrect mesh_instances index"
+
+        assert all(self.master_mesh_keys.get(mesh) == k for k, mesh in self.master_meshes.items()), \
+            "Incorrect master_mesh_keys index"
+        assert all(mesh in self.mesh_instances for mesh in self.master_mesh_keys), \
+            "Master mesh without instances"
+
+        assert all(isinstance(self.objects.get(k), pyrpr.Mesh) for k in self.mesh_deformations), \
+            "Incorrect mesh_deformations"
+
+        object_material_slots = {}
+        for mat_name, users in self.material_slot_users.items():
+            for k in users:
+                object_material_slots.setdefault(k, set()).add(mat_name)
+        assert object_material_slots == {k: set(mat_names) for k, mat_names
+                                         in self.object_material_slots.items()}, \
+            "Incorrect object_material_slots index"
+        assert all(k in self.objects for k in self.object_material_slots), \
+            "Material slots of removed object"
+        assert all(self.material_slot_users.values()), "Material without slot users"
 
     def remove_image(self, key):
         del self.images[key]
@@ -550,10 +939,16 @@ class RPRContext:
                 self.remove_material(mat_key)
 
         # removing all corresponded nodes
-        for node_key in tuple(self.material_nodes.keys()):
-            if node_key[0] == key:
-                del self.material_nodes[node_key]
+        for node_key in self.material_node_keys.pop(key, ()):
+            self.material_nodes.pop(node_key, None)
+
+        # users have to reassign material after it is recreated
+        for obj_key in self.material_users.pop(key, ()):
+            mat_keys = self.object_materials.get(obj_key)
+            if mat_keys is not None:
+                mat_keys.discard(key)
 
+        self.material_params.pop(key, None)
         del self.materials[key]
 
 
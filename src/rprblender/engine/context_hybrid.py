@@ -49,6 +49,8 @@ class RPRContext(context.RPRContext):
 
     _PostEffect = pyhybrid.PostEffect
 
+    supports_quads = False
+
     def init(self, context_flags, context_props, use_contour_integrator=False):
         context_flags -= {pyrpr.CREATION_FLAGS_ENABLE_GL_INTEROP}
         if context_props[0] == pyrpr.CONTEXT_SAMPLER_TYPE:
@@ -61,13 +61,17 @@ class Engine:
         :param render_passes: render passes to collect
         :return: images
         """
-        def zeros_image(channels):
-            return np.zeros((self.rpr_context.height, self.rpr_context.width, channels), dtype=np.float32)
+        width, height = self.rpr_context.width, self.rpr_context.height
 
-        images = []
+        # all AOV images are copied to one reusable buffer, which is passed to render passes
+        pixels = width * height
+        result = self.rpr_context.get_image_buffer(
+            'render_result', (sum(p.channels for p in render_passes) * pixels,))
 
+        offset = 0
         for p in render_passes:
             # finding corresponded aov
+            image = None
 
             if p.name == "Combined":
                 if apply_image_filter and self.image_filter:
@@ -75,31 +79,33 @@ class Engine:
 
                     # copying alpha component from rendered image to final denoised image,
                     # because image filter changes it to 1.0
-                    image[:, :, 3] = self.rpr_context.get_image()[:, :, 3]
+                    image[:, :, 3] = self.rpr_context.get_image(pooled=True)[:, :, 3]
 
                 else:
-                    image = self.rpr_context.get_image()
+                    image = self.rpr_context.get_image(pooled=True)
 
             elif p.name == "Color":
-                image = self.rpr_context.get_image(pyrpr.AOV_COLOR)
+                image = self.rpr_context.get_image(pyrpr.AOV_COLOR, pooled=True)
 
             else:
                 aov = next((aov for aov in RPR_ViewLayerProperites.aovs_info
                             if aov['name'] == p.name), None)
                 if aov and self.rpr_context.is_aov_enabled(aov['rpr']):
-                    image = self.rpr_context.get_image(aov['rpr'])
+                    image = self.rpr_context.get_image(aov['rpr'], pooled=True)
                 else:
                     log.warn(f"AOV '{p.name}' is not enabled in rpr_context "
                              f"or not found in aovs_info")
-                    image = zeros_image(p.channels)
 
-            if p.channels != image.shape[2]:
-                image = image[:, :, 0:p.channels]
+            pass_image = result[offset:offset + pixels * p.channels].reshape(height, width, p.channels)
+            if image is None:
+                pass_image.fill(0.0)
+            else:
+                pass_image[:] = image[:, :, 0:p.channels]
 
-            images.append(image.flatten())
+            offset += pixels * p.channels
 
         # efficient way to copy all AOV images
-        render_passes.foreach_set('rect', np.concatenate(images))
+        render_passes.foreach_set('rect', result)
 
     def update_render_result(self, tile_pos, tile_size, layer_name="",
                              apply_image_filter=False):
@@ -328,13 +334,17 @@ class Engine:
             self.image_filter.update_param('bandwidth', settings['bandwidth'])
 
     def update_image_filter_inputs(self, tile_pos=(0, 0)):
-        color = self.rpr_context.get_image()
+        # images are copied to image filter inputs right away, so pooled buffers could be used
+        def get_image(aov_type):
+            return self.rpr_context.get_image(aov_type, pooled=True)
+
+        color = get_image(None)
 
         filter_type = self.image_filter.settings['filter_type']
         if filter_type == 'BILATERAL':
-            world = self.rpr_context.get_image(pyrpr.AOV_WORLD_COORDINATE)
-            object_id = self.rpr_context.get_image(pyrpr.AOV_OBJECT_ID)
-            shading = self.rpr_context.get_image(pyrpr.AOV_SHADING_NORMAL)
+            world = get_image(pyrpr.AOV_WORLD_COORDINATE)
+            object_id = get_image(pyrpr.AOV_OBJECT_ID)
+            shading = get_image(pyrpr.AOV_SHADING_NORMAL)
 
             inputs = {
                 'color': color,
@@ -344,10 +354,10 @@ class Engine:
             }
 
         elif filter_type == 'EAW':
-            world = self.rpr_context.get_image(pyrpr.AOV_WORLD_COORDINATE)
-            object_id = self.rpr_context.get_image(pyrpr.AOV_OBJECT_ID)
-            depth = self.rpr_context.get_image(pyrpr.AOV_DEPTH)
-            shading = self.rpr_context.get_image(pyrpr.AOV_SHADING_NORMAL)
+            world = get_image(pyrpr.AOV_WORLD_COORDINATE)
+            object_id = get_image(pyrpr.AOV_OBJECT_ID)
+            depth = get_image(pyrpr.AOV_DEPTH)
+            shading = get_image(pyrpr.AOV_SHADING_NORMAL)
 
             inputs = {
                 'color': color,
@@ -359,10 +369,10 @@ class Engine:
             }
 
         elif filter_type == 'LWR':
-            world = self.rpr_context.get_image(pyrpr.AOV_WORLD_COORDINATE)
-            object_id = self.rpr_context.get_image(pyrpr.AOV_OBJECT_ID)
-            depth = self.rpr_context.get_image(pyrpr.AOV_DEPTH)
-            shading = self.rpr_context.get_image(pyrpr.AOV_SHADING_NORMAL)
+            world = get_image(pyrpr.AOV_WORLD_COORDINATE)
+            object_id = get_image(pyrpr.AOV_OBJECT_ID)
+            depth = get_image(pyrpr.AOV_DEPTH)
+            shading = get_image(pyrpr.AOV_SHADING_NORMAL)
 
             inputs = {
                 'color': color,
@@ -377,9 +387,9 @@ class Engine:
             inputs = {'color': color}
 
             if not self.image_filter.settings['ml_color_only']:
-                inputs['depth'] = self.rpr_context.get_image(pyrpr.AOV_DEPTH)
-                inputs['albedo'] = self.rpr_context.get_image(pyrpr.AOV_DIFFUSE_ALBEDO)
-                inputs['normal'] = self.rpr_context.get_image(pyrpr.AOV_SHADING_NORMAL)
+                inputs['depth'] = get_image(pyrpr.AOV_DEPTH)
+                inputs['albedo'] = get_image(pyrpr.AOV_DIFFUSE_ALBEDO)
+                inputs['normal'] = get_image(pyrpr.AOV_SHADING_NORMAL)
 
         else:
             raise ValueError("Incorrect filter type", filter_type)
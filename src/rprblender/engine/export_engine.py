@@ -23,7 +23,10 @@ from rprblender.export import (
     object,
     particle,
     world,
-    camera
+    camera,
+    image,
+    mesh,
+    material,
 )
 from .context import RPRContext, RPRContext2
 from .engine import Engine
@@ -95,6 +98,13 @@ class ExportEngine(Engine):
         # Exported scene will be rendered vertically flipped, flip it back
         self.rpr_context.set_parameter(pyrpr.CONTEXT_Y_FLIP, True)
 
+        log.info("Image cache:", image.get_image_cache().stats)
+        mesh_cache = mesh.get_mesh_cache()
+        if mesh_cache:
+            log.info("Mesh cache:", mesh_cache.stats)
+        material_cache = material.get_material_cache()
+        if material_cache:
+            log.info("Material cache:", material_cache.stats)
         log('Finish sync')
 
     def export_to_rpr(self, filepath: str, flags):
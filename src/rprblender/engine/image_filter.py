@@ -19,6 +19,7 @@ import pyrpr
 import pyhybrid
 import pyrpr2
 import pyrprimagefilters as rif
+from pyrpr_profiler import profiler
 
 from rprblender import utils
 from rprblender.utils.user_settings import get_user_settings
@@ -98,19 +99,21 @@ class ImageFilter(metaclass=ABCMeta):
         input_filter.set_parameter('outVarianceImg', out_variance_image)
 
     def run(self):
-        self.apply_parameters()
-        self.apply_sigmas()
-        
-        # updating input images
-        for image in self.inputs.values():
-            if isinstance(image, rif.FrameBufferImage):
-                image.update()
+        with profiler.phase('denoise'):
+            self.apply_parameters()
+            self.apply_sigmas()
+
+            # updating input images
+            for image in self.inputs.values():
+                if isinstance(image, rif.FrameBufferImage):
+                    image.update()
 
-        self.command_queue.execute()
+            self.command_queue.execute()
 
     def get_data(self):
-        self.command_queue.synchronize()
-        return self.output_image.get_data()
+        with profiler.phase('denoise'):
+            self.command_queue.synchronize()
+            return self.output_image.get_data()
 
 
 class ImageFilterBilateral(ImageFilter):
@@ -19,10 +19,12 @@ import math
 import numpy as np
 
 import pyrpr
+from pyrpr_profiler import profiler
 
-from rprblender import utils
+from rprblender import utils, config
 from .engine import Engine
-from rprblender.export import world, camera, object, instance, particle
+from .tile_scheduler import TileScheduler
+from rprblender.export import world, camera, object, instance, particle, mesh, material
 from rprblender.utils import render_stamp
 from rprblender.utils.conversion import perfcounter_to_str
 from rprblender.utils.user_settings import get_user_settings
@@ -62,9 +64,15 @@ class RenderEngine(Engine):
         self.camera_data: camera.CameraData = None
         self.tile_order = None
 
+        # devices and their contexts which render tiles in parallel
+        self.tile_devices = []
+        self.tile_contexts = []
+
         self.use_contour = False
 
         self.world_backplate = None
+        # depsgraph instances are collected by _sync_instance() and exported at once
+        self.instances_batch = None
 
         self.render_stamp_text = ""
 
@@ -172,19 +180,72 @@ class RenderEngine(Engine):
         athena_data = {}
 
         tile_iterator = utils.tile_iterator(self.tile_order, self.width, self.height, *self.tile_size)
+        time_begin = time.perf_counter()
+        athena_data['Start Time'] = datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f")
+        athena_data['End Status'] = "successful"
+
+        if len(self.tile_contexts) > 1:
+            progress = self._render_tiles_parallel(tile_iterator, time_begin)
+        else:
+            progress = self._render_tiles_sequential(tile_iterator, time_begin)
+
+        if self.rpr_engine.test_break():
+            athena_data['End Status'] = "cancelled"
+
+        if self.image_filter and not self.rpr_engine.test_break():
+            self.notify_status(1.0, "Applying denoising final image")
+
+            # getting already rendered images for every render pass
+            result = self.rpr_engine.get_result()
+            render_passes = result.layers[self.render_layer_name].passes
+            length = sum((len(p.rect) * p.channels for p in render_passes))
+            images = np.empty(length, dtype=np.float32)
+            render_passes.foreach_get('rect', images)
+
+            # updating points
+            result = self.rpr_engine.begin_result(
+                0, 0, self.width, self.height,
+                layer=self.render_layer_name)
+
+            render_passes = result.layers[0].passes
+            pos = 0
+            for p in render_passes:
+                length = len(p.rect) * p.channels
+
+                # we will update only Combined pass
+                if p.name == "Combined":
+                    self.image_filter.run()
+                    image = self.image_filter.get_data()
+                    images[pos: pos + length] = image.flatten()
+                    break
+
+                pos += length
+
+            render_passes.foreach_set('rect', images)
+
+            self.rpr_engine.end_result(result)
+
+        if not self.rpr_engine.test_break():
+            self.apply_render_stamp_to_image()
+
+        athena_data['Stop Time'] = datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f")
+        athena_data['Samples'] = round(self.render_samples * progress)
+
+        log.info(f"Scene synchronization time:", perfcounter_to_str(self.sync_time))
+        log.info(f"Render time:", perfcounter_to_str(self.current_render_time))
+
+        self.athena_send(athena_data)
+
+    def _render_tiles_sequential(self, tile_iterator, time_begin):
+        """ Renders tiles one by one in self.rpr_context, returns render progress """
         tiles_number = tile_iterator.len
         is_adaptive = self.rpr_context.is_aov_enabled(pyrpr.AOV_VARIANCE)
 
         rpr_camera = self.rpr_context.scene.camera
-
-        time_begin = time.perf_counter()
-        athena_data['Start Time'] = datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f")
-        athena_data['End Status'] = "successful"
         progress = 0.0
 
         for tile_index, (tile_pos, tile_size) in enumerate(tile_iterator()):
             if self.rpr_engine.test_break():
-                athena_data['End Status'] = "cancelled"
                 break
 
             log(f"Render tile {tile_index} / {tiles_number}: [{tile_pos}, {tile_size}]")
@@ -257,56 +318,95 @@ class RenderEngine(Engine):
             if self.image_filter and not self.rpr_engine.test_break():
                 self.update_image_filter_inputs(tile_pos)
 
-        if self.image_filter and not self.rpr_engine.test_break():
-            self.notify_status(1.0, "Applying denoising final image")
+        return progress
 
-            # getting already rendered images for every render pass
-            result = self.rpr_engine.get_result()
-            render_passes = result.layers[self.render_layer_name].passes
-            length = sum((len(p.rect) * p.channels for p in render_passes))
-            images = np.empty(length, dtype=np.float32)
-            render_passes.foreach_get('rect', images)
+    def _render_tiles_parallel(self, tile_iterator, time_begin):
+        """
+        Renders tiles in self.tile_contexts in parallel, every context takes the next tile
+        when it finishes the previous one. Returns render progress
+        """
+        tiles_number = tile_iterator.len
+        finished_tiles = 0
 
-            # updating points
-            result = self.rpr_engine.begin_result(
-                0, 0, self.width, self.height,
-                layer=self.render_layer_name)
+        def render_tile(rpr_context, tile_index, tile_pos, tile_size, is_stopped):
+            log(f"Render tile {tile_index} / {tiles_number}: [{tile_pos}, {tile_size}]")
 
-            render_passes = result.layers[0].passes
-            pos = 0
-            for p in render_passes:
-                length = len(p.rect) * p.channels
+            tile = ((tile_pos[0] / self.width, tile_pos[1] / self.height),
+                    (tile_size[0] / self.width, tile_size[1] / self.height))
+            # set camera for tile
+            self.camera_data.export(rpr_context.scene.camera, tile=tile)
+            rpr_context.resize(*tile_size)
 
-                # we will update only Combined pass
-                if p.name == "Combined":
-                    self.image_filter.run()
-                    image = self.image_filter.get_data()
-                    images[pos: pos + length] = image.flatten()
+            # export backplate section for tile if backplate present
+            if self.world_backplate:
+                self.world_backplate.export(rpr_context, (self.width, self.height), tile)
+
+            is_adaptive = rpr_context.is_aov_enabled(pyrpr.AOV_VARIANCE)
+            min_adaptive_samples = rpr_context.get_parameter(pyrpr.CONTEXT_ADAPTIVE_SAMPLING_MIN_SPP) \
+                if is_adaptive else 0
+
+            sample = 0
+            render_iteration = 0
+            render_update_samples = self.render_update_samples
+            while sample < self.render_samples:
+                if is_stopped():
+                    return False
+
+                update_samples = min(render_update_samples, self.render_samples - sample)
+                rpr_context.set_parameter(pyrpr.CONTEXT_ITERATIONS, update_samples)
+                rpr_context.set_parameter(pyrpr.CONTEXT_FRAMECOUNT, render_iteration)
+                rpr_context.render(restart=(sample == 0))
+
+                sample += update_samples
+
+                if is_adaptive and sample >= min_adaptive_samples and \
+                        rpr_context.get_info(pyrpr.CONTEXT_ACTIVE_PIXEL_COUNT, int) == 0:
                     break
 
-                pos += length
+                render_iteration += 1
+                if render_iteration > 1 and render_update_samples < MAX_RENDER_ITERATIONS and not self.use_contour:
+                    # progressively increase update samples up to 32
+                    render_update_samples *= 2
 
-            render_passes.foreach_set('rect', images)
+            rpr_context.resolve()
 
-            self.rpr_engine.end_result(result)
+            # store maximum actual number of used samples for render stamp info
+            self.current_sample = max(self.current_sample, sample)
+            return True
 
-        if not self.rpr_engine.test_break():
-            self.apply_render_stamp_to_image()
+        def tile_finished(rpr_context, tile_index, tile_pos, tile_size):
+            nonlocal finished_tiles
+            finished_tiles += 1
 
-        athena_data['Stop Time'] = datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f")
-        athena_data['Samples'] = round(self.render_samples * progress)
+            self.current_render_time = time.perf_counter() - time_begin
+            self.notify_status(finished_tiles / tiles_number,
+                               f"Render Time: {self.current_render_time:.1f} sec"
+                               f" | Tiles: {finished_tiles}/{tiles_number}"
+                               f" | Devices: {len(self.tile_contexts)}")
 
-        log.info(f"Scene synchronization time:", perfcounter_to_str(self.sync_time))
-        log.info(f"Render time:", perfcounter_to_str(self.current_render_time))
+            # render result and image filter inputs are read from self.rpr_context
+            main_rpr_context, self.rpr_context = self.rpr_context, rpr_context
+            try:
+                self.update_render_result(tile_pos, tile_size, layer_name=self.render_layer_name)
+                if self.image_filter:
+                    self.update_image_filter_inputs(tile_pos)
+            finally:
+                self.rpr_context = main_rpr_context
 
-        self.athena_send(athena_data)
+        scheduler = TileScheduler(self.tile_contexts, render_tile, tile_finished,
+                                  self.rpr_engine.test_break)
+        scheduler.run(tile_iterator())
+
+        log.info(f"Rendered tiles by devices {self.tile_devices}:", scheduler.tiles_count)
+        return finished_tiles / tiles_number
 
     def render(self):
         if not self.is_synced:
             return
 
-        self.rpr_context.sync_auto_adapt_subdivision()
-        self.rpr_context.sync_portal_lights()
+        for rpr_context in self.tile_contexts or (self.rpr_context,):
+            rpr_context.sync_auto_adapt_subdivision()
+            rpr_context.sync_portal_lights()
 
         log(f"Start render [{self.width}, {self.height}]")
         self.notify_status(0, "Start render")
@@ -319,8 +419,15 @@ class RenderEngine(Engine):
         self.notify_status(1, "Finish render")
         log('Finish render')
 
+        if profiler.enabled:
+            file_path = utils.get_temp_dir() / \
+                f"pyrpr_profile_{self.render_layer_name}_{datetime.datetime.now():%Y%m%d_%H%M%S}.json"
+            profiler.dump(file_path)
+            log.info("Core calls profile saved to", file_path)
+
     def _init_rpr_context(self, scene):
-        scene.rpr.init_rpr_context(self.rpr_context, use_contour_integrator=self.use_contour)
+        scene.rpr.init_rpr_context(self.rpr_context, use_contour_integrator=self.use_contour,
+                                   device=self.tile_devices[0] if self.tile_devices else None)
 
         self.rpr_context.scene.set_name(scene.name)
 
@@ -331,10 +438,10 @@ class RenderEngine(Engine):
         self.is_synced = False
 
         self.sync_time = time.perf_counter()
+        profiler.reset()
 
         scene = depsgraph.scene
         view_layer = depsgraph.view_layer
-        material_override = view_layer.material_override
 
         self.render_layer_name = view_layer.name
         self.status_title = f"{scene.name}: {self.render_layer_name}"
@@ -342,6 +449,7 @@ class RenderEngine(Engine):
         self.notify_status(0, "Start syncing")
 
         self.use_contour = scene.rpr.is_contour_used
+        self.tile_devices = self._get_tile_devices(scene)
         self._init_rpr_context(scene)
 
         border = ((0, 0), (1, 1)) if not scene.render.use_border else \
@@ -354,49 +462,63 @@ class RenderEngine(Engine):
         self.width = int(screen_width * border[1][0])
         self.height = int(screen_height * border[1][1])
 
-        self.rpr_context.resize(self.width, self.height)
+        if not self._sync_scene(depsgraph, (screen_width, screen_height), border):
+            return
 
-        if self.use_contour:
-            scene.rpr.export_contour_mode(self.rpr_context)
+        # Image filter
+        image_filter_settings = view_layer.rpr.denoiser.get_settings(scene)
+        image_filter_settings['resolution'] = (self.width, self.height)
+        self.setup_image_filter(image_filter_settings)
 
-        self.rpr_context.blender_data['depsgraph'] = depsgraph
+        if not self._sync_tile_contexts(depsgraph, (screen_width, screen_height), border):
+            return
 
-        # EXPORT OBJECTS
-        objects_len = len(depsgraph.objects)
-        for i, obj in enumerate(self.depsgraph_objects(depsgraph)):
-            self.notify_status(0, "Syncing object (%d/%d): %s" % (i, objects_len, obj.name))
+        self.render_samples, self.render_time = (scene.rpr.limits.max_samples, scene.rpr.limits.seconds)
 
-            # the correct collection visibility info is stored in original object
-            indirect_only = obj.original.indirect_only_get(view_layer=view_layer)
-            object.sync(self.rpr_context, obj,
-                        indirect_only=indirect_only, material_override=material_override,
-                        frame_current=scene.frame_current, use_contour=self.use_contour)
+        if scene.rpr.render_quality == 'FULL2':
+            if self.use_contour:
+                self.render_update_samples = 1
+            else:
+                self.render_update_samples = scene.rpr.limits.update_samples_rpr2
+        else:
+            self.render_update_samples = scene.rpr.limits.update_samples
 
-            if self.rpr_engine.test_break():
-                log.warn("Syncing stopped by user termination")
-                return
+        if scene.rpr.use_render_stamp:
+            self.render_stamp_text = self.prepare_scene_stamp_text(scene)
 
-        # EXPORT INSTANCES
-        instances_len = len(depsgraph.object_instances)
-        last_instances_percent = 0
-        self.notify_status(0, "Syncing instances 0%")
+        self.sync_time = time.perf_counter() - self.sync_time
 
-        for i, inst in enumerate(self.depsgraph_instances(depsgraph)):
-            instances_percent = (i * 100) // instances_len
-            if instances_percent > last_instances_percent:
-                self.notify_status(0, f"Syncing instances {instances_percent}%")
-                last_instances_percent = instances_percent
+        mesh_cache = mesh.get_mesh_cache()
+        if mesh_cache:
+            log.info("Mesh cache:", mesh_cache.stats)
+        material_cache = material.get_material_cache()
+        if material_cache:
+            log.info("Material cache:", material_cache.stats)
 
-            indirect_only = inst.parent.original.indirect_only_get(view_layer=view_layer)
-            instance.sync(self.rpr_context, inst,
-                          indirect_only=indirect_only, material_override=material_override,
-                          frame_current=scene.frame_current, use_contour=self.use_contour)
+        self.is_synced = True
+        self.notify_status(0, "Finish syncing")
+        log('Finish sync')
 
-            if self.rpr_engine.test_break():
-                log.warn("Syncing stopped by user termination")
-                return
+    def _sync_scene(self, depsgraph, screen_size, border) -> bool:
+        """ Exports scene to self.rpr_context, returns False if syncing was stopped by user """
+        scene = depsgraph.scene
+        view_layer = depsgraph.view_layer
+        screen_width, screen_height = screen_size
 
-        self.notify_status(0, "Syncing instances 100%")
+        self.rpr_context.resize(self.width, self.height)
+
+        if self.use_contour:
+            scene.rpr.export_contour_mode(self.rpr_context)
+
+        self.rpr_context.blender_data['depsgraph'] = depsgraph
+
+        with profiler.phase('sync objects'):
+            if not self._sync_objects(depsgraph):
+                return False
+
+        with profiler.phase('sync instances'):
+            if not self._sync_instances(depsgraph):
+                return False
 
         # EXPORT CAMERA
         camera_key = object.key(scene.camera)   # current camera key
@@ -431,12 +553,8 @@ class RenderEngine(Engine):
             self.camera_data.export(rpr_camera)
 
         # Environment is synced once per frame
-        if scene.world.is_evaluated:  # for some reason World data can came in unevaluated
-            world_data = scene.world
-        else:
-            world_data = scene.world.evaluated_get(depsgraph)
-        world_settings = world.sync(self.rpr_context, world_data)
-        self.world_backplate = world_settings.backplate
+        with profiler.phase('sync world'):
+            self._sync_world(depsgraph)
 
         # SYNC MOTION BLUR
         self.rpr_context.do_motion_blur = scene.render.use_motion_blur and \
@@ -450,13 +568,8 @@ class RenderEngine(Engine):
         # EXPORT PARTICLES
         # Note: particles should be exported after motion blur,
         #       otherwise prev_location of particle will be (0, 0, 0)
-        self.notify_status(0, "Syncing particles")
-        for obj in self.depsgraph_objects(depsgraph):
-            particle.sync(self.rpr_context, obj)
-
-        # objects linked to scene as a collection are instanced, so walk thru them for particles
-        for entry in self.depsgraph_instances(depsgraph):
-            particle.sync(self.rpr_context, entry.instance_object)
+        with profiler.phase('sync particles'):
+            self._sync_particles(depsgraph)
 
         # EXPORT: AOVS, adaptive sampling, shadow catcher, denoiser
         enable_adaptive = scene.rpr.limits.noise_threshold > 0.0
@@ -470,34 +583,133 @@ class RenderEngine(Engine):
         # Shadow catcher
         self.rpr_context.sync_catchers(scene.render.film_transparent)
 
-        # Image filter
-        image_filter_settings = view_layer.rpr.denoiser.get_settings(scene)
-        image_filter_settings['resolution'] = (self.width, self.height)
-        self.setup_image_filter(image_filter_settings)
-
         # SET rpr_context parameters
         self.rpr_context.set_parameter(pyrpr.CONTEXT_PREVIEW, False)
         scene.rpr.export_ray_depth(self.rpr_context)
         scene.rpr.export_pixel_filter(self.rpr_context)
 
-        self.render_samples, self.render_time = (scene.rpr.limits.max_samples, scene.rpr.limits.seconds)
+        return True
 
-        if scene.rpr.render_quality == 'FULL2':
-            if self.use_contour:
-                self.render_update_samples = 1
-            else:
-                self.render_update_samples = scene.rpr.limits.update_samples_rpr2
-        else:
-            self.render_update_samples = scene.rpr.limits.update_samples
+    def _get_tile_devices(self, scene):
+        return scene.rpr.get_tile_devices()
 
-        if scene.rpr.use_render_stamp:
-            self.render_stamp_text = self.prepare_scene_stamp_text(scene)
+    def _sync_tile_contexts(self, depsgraph, screen_size, border) -> bool:
+        """
+        Creates and exports scene to separate render context for every device
+        which renders tiles in parallel, self.rpr_context is used for the first device
+        """
+        scene = depsgraph.scene
+        rpr_context = self.rpr_context
+        self.tile_contexts = [rpr_context]
 
-        self.sync_time = time.perf_counter() - self.sync_time
+        try:
+            for device in self.tile_devices[1:]:
+                self.notify_status(0, f"Syncing scene for device {device}")
 
-        self.is_synced = True
-        self.notify_status(0, "Finish syncing")
-        log('Finish sync')
+                self.rpr_context = self._RPRContext()
+                self.tile_contexts.append(self.rpr_context)
+                scene.rpr.init_rpr_context(self.rpr_context, use_contour_integrator=self.use_contour,
+                                           device=device)
+                self.rpr_context.scene.set_name(scene.name)
+
+                if not self._sync_scene(depsgraph, screen_size, border):
+                    return False
+
+                # AOVs enabled by image filter are needed for every rendered tile
+                for aov_type in rpr_context.frame_buffers_aovs:
+                    self.rpr_context.enable_aov(aov_type)
+
+        finally:
+            self.rpr_context = rpr_context
+
+        return True
+
+    def _sync_objects(self, depsgraph) -> bool:
+        """ Exports depsgraph objects, returns False if syncing was stopped by user """
+        scene = depsgraph.scene
+        view_layer = depsgraph.view_layer
+        material_override = view_layer.material_override
+
+        objects_len = len(depsgraph.objects)
+        # mesh data is prepared by worker threads, core calls are made here in depsgraph order
+        with mesh.MeshDataPool(self.rpr_context, self.depsgraph_objects(depsgraph),
+                               config.sync_mesh_workers) as mesh_data_pool:
+            for i, obj in enumerate(self.depsgraph_objects(depsgraph)):
+                self.notify_status(0, "Syncing object (%d/%d): %s" % (i, objects_len, obj.name))
+
+                # the correct collection visibility info is stored in original object
+                indirect_only = obj.original.indirect_only_get(view_layer=view_layer)
+                object.sync(self.rpr_context, obj,
+                            indirect_only=indirect_only, material_override=material_override,
+                            frame_current=scene.frame_current, use_contour=self.use_contour,
+                            mesh_data_pool=mesh_data_pool)
+
+                if self.rpr_engine.test_break():
+                    log.warn("Syncing stopped by user termination")
+                    return False
+
+        return True
+
+    def _sync_instances(self, depsgraph) -> bool:
+        """ Exports depsgraph instances, returns False if syncing was stopped by user """
+        scene = depsgraph.scene
+        view_layer = depsgraph.view_layer
+        material_override = view_layer.material_override
+
+        instances_len = len(depsgraph.object_instances)
+        last_instances_percent = 0
+        self.notify_status(0, "Syncing instances 0%")
+
+        self.instances_batch = instance.InstancesBatch(
+            self.rpr_context, material_override=material_override,
+            frame_current=scene.frame_current, use_contour=self.use_contour)
+        try:
+            for i, inst in enumerate(self.depsgraph_instances(depsgraph)):
+                instances_percent = (i * 100) // instances_len
+                if instances_percent > last_instances_percent:
+                    self.notify_status(0, f"Syncing instances {instances_percent}%")
+                    last_instances_percent = instances_percent
+
+                self._sync_instance(inst, view_layer, material_override, scene.frame_current)
+
+                if self.rpr_engine.test_break():
+                    log.warn("Syncing stopped by user termination")
+                    return False
+
+            # instances of the same object and parent are created together
+            self.instances_batch.export()
+
+        finally:
+            self.instances_batch = None
+
+        self.notify_status(0, "Syncing instances 100%")
+        return True
+
+    def _sync_instance(self, inst, view_layer, material_override, frame_current):
+        """ Adds instance to instances_batch, material_override and frame_current are the batch ones """
+        indirect_only = inst.parent.original.indirect_only_get(view_layer=view_layer)
+        self.instances_batch.add(inst, indirect_only)
+
+    @staticmethod
+    def _get_evaluated_world(depsgraph):
+        scene = depsgraph.scene
+        if scene.world.is_evaluated:  # for some reason World data can came in unevaluated
+            return scene.world
+
+        return scene.world.evaluated_get(depsgraph)
+
+    def _sync_world(self, depsgraph):
+        world_settings = world.sync(self.rpr_context, self._get_evaluated_world(depsgraph))
+        self.world_backplate = world_settings.backplate
+
+    def _sync_particles(self, depsgraph):
+        self.notify_status(0, "Syncing particles")
+        for obj in self.depsgraph_objects(depsgraph):
+            particle.sync(self.rpr_context, obj)
+
+        # objects linked to scene as a collection are instanced, so walk thru them for particles
+        for entry in self.depsgraph_instances(depsgraph):
+            particle.sync(self.rpr_context, entry.instance_object)
 
     def athena_send(self, data: dict):
         if not (utils.IS_WIN or utils.IS_MAC):
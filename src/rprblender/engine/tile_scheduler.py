@@ -0,0 +1,148 @@
+#**********************************************************************
+# Copyright 2020 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#********************************************************************
+import queue
+import threading
+
+from rprblender.utils import logging
+log = logging.Log(tag='TileScheduler')
+
+
+class TileScheduler:
+    """
+    Renders tiles on several render contexts in parallel.
+    Every context renders in its own thread and takes next tile from the shared queue,
+    therefore faster devices render more tiles.
+
+    :param render_tile: render_tile(rpr_context, tile_index, tile_pos, tile_size, is_stopped) -> bool,
+        called in worker thread, returns False if tile wasn't finished
+    :param tile_finished: tile_finished(rpr_context, tile_index, tile_pos, tile_size),
+        called in the thread which runs scheduler, so Blender API could be used in it.
+        Worker waits until its finished tile is processed and only then renders the next one.
+    :param test_break: test_break() -> bool, called in the thread which runs scheduler
+    """
+
+    WAIT_TIME = 0.1     # seconds between test_break() checks
+
+    def __init__(self, rpr_contexts, render_tile, tile_finished, test_break):
+        self.rpr_contexts = rpr_contexts
+        self.render_tile = render_tile
+        self.tile_finished = tile_finished
+        self.test_break = test_break
+
+        self.tiles_queue = queue.Queue()
+        self.finished_queue = queue.Queue()
+        self.stop_event = threading.Event()
+
+        # number of rendered tiles by every context
+        self.tiles_count = [0] * len(rpr_contexts)
+
+    def is_stopped(self):
+        return self.stop_event.is_set()
+
+    def _work(self, context_index):
+        rpr_context = self.rpr_contexts[context_index]
+        processed_event = threading.Event()
+
+        try:
+            while not self.is_stopped():
+                try:
+                    tile_index, tile_pos, tile_size = self.tiles_queue.get_nowait()
+                except queue.Empty:
+                    break
+
+                if not self.render_tile(rpr_context, tile_index, tile_pos, tile_size, self.is_stopped):
+                    break
+
+                self.tiles_count[context_index] += 1
+
+                # rendered images are read from rpr_context, so it has to wait for tile_finished
+                processed_event.clear()
+                self.finished_queue.put((rpr_context, tile_index, tile_pos, tile_size, processed_event))
+                processed_event.wait()
+
+        except Exception as e:
+            log.error(f"Tile rendering failed on context {context_index}", e)
+            self.stop_event.set()
+            self.finished_queue.put(e)
+
+        finally:
+            self.finished_queue.put(None)
+
+    def run(self, tiles) -> bool:
+        """
+        Renders tiles: iterable of (tile_pos, tile_size).
+        Returns True if all tiles were rendered, False if rendering was stopped.
+        """
+        tiles_number = 0
+        for tile_index, (tile_pos, tile_size) in enumerate(tiles):
+            self.tiles_queue.put((tile_index, tile_pos, tile_size))
+            tiles_number += 1
+
+        threads = [threading.Thread(target=self._work, args=(i,))
+                   for i in range(len(self.rpr_contexts))]
+        for thread in threads:
+            thread.start()
+
+        error = None
+        finished_tiles = 0
+        active_workers = len(threads)
+        try:
+            while active_workers:
+                if not self.is_stopped() and self.test_break():
+                    self.stop_event.set()
+
+                try:
+                    item = self.finished_queue.get(timeout=self.WAIT_TIME)
+                except queue.Empty:
+                    continue
+
+                if item is None:
+                    active_workers -= 1
+                    continue
+
+                if isinstance(item, Exception):
+                    error = item
+                    continue
+
+                rpr_context, tile_index, tile_pos, tile_size, processed_event = item
+                try:
+                    if error is None and not self.is_stopped():
+                        self.tile_finished(rpr_context, tile_index, tile_pos, tile_size)
+                        finished_tiles += 1
+                finally:
+                    processed_event.set()
+
+        except BaseException:
+            self.stop_event.set()
+
+            # releasing workers which wait for processing of their tiles
+            while active_workers:
+                item = self.finished_queue.get()
+                if item is None:
+                    active_workers -= 1
+                elif isinstance(item, tuple):
+                    item[-1].set()
+
+            raise
+
+        finally:
+            for thread in threads:
+                thread.join()
+
+        if error is not None:
+            raise error
+
+        log(f"Rendered tiles by contexts: {self.tiles_count}")
+        return finished_tiles == tiles_number
@@ -27,9 +27,9 @@ from bpy_extras import view3d_utils
 import pyrpr
 from .engine import Engine
 from rprblender.export import camera, material, world, object, instance
-from rprblender.export.mesh import assign_materials
+from rprblender.export.mesh import assign_materials, MeshDataPool
 from rprblender.utils import gl
-from rprblender import utils
+from rprblender import utils, config
 from rprblender.utils.user_settings import get_user_settings
 
 from rprblender.utils import logging
@@ -245,22 +245,26 @@ class ViewportEngine(Engine):
         frame_current = depsgraph.scene.frame_current
         material_override = depsgraph.view_layer.material_override
         objects_len = len(depsgraph.objects)
-        for i, obj in enumerate(self.depsgraph_objects(depsgraph)):
-            if self.is_finished:
-                raise FinishRenderException
+        with MeshDataPool(self.rpr_context, self.depsgraph_objects(depsgraph),
+                          config.sync_mesh_workers) as mesh_data_pool:
+            for i, obj in enumerate(self.depsgraph_objects(depsgraph)):
+                if self.is_finished:
+                    raise FinishRenderException
 
-            time_sync = time.perf_counter() - time_begin
-            self.notify_status(f"Time {time_sync:.1f} | Object ({i}/{objects_len}): {obj.name}",
-                               "Sync")
+                time_sync = time.perf_counter() - time_begin
+                self.notify_status(f"Time {time_sync:.1f} | Object ({i}/{objects_len}): {obj.name}",
+                                   "Sync")
 
-            indirect_only = obj.original.indirect_only_get(view_layer=depsgraph.view_layer)
-            object.sync(self.rpr_context, obj,
-                        indirect_only=indirect_only, material_override=material_override,
-                        frame_current=frame_current)
+                indirect_only = obj.original.indirect_only_get(view_layer=depsgraph.view_layer)
+                object.sync(self.rpr_context, obj,
+                            indirect_only=indirect_only, material_override=material_override,
+                            frame_current=frame_current, mesh_data_pool=mesh_data_pool)
 
-        # exporting instances
+        # exporting instances, instances of the same object and parent are created together
         instances_len = len(depsgraph.object_instances)
         last_instances_percent = 0
+        instances_batch = instance.InstancesBatch(self.rpr_context, material_override=material_override,
+                                                  frame_current=frame_current)
 
         for i, inst in enumerate(self.depsgraph_instances(depsgraph)):
             if self.is_finished:
@@ -273,9 +277,9 @@ class ViewportEngine(Engine):
                 last_instances_percent = instances_percent
 
             indirect_only = inst.parent.original.indirect_only_get(view_layer=depsgraph.view_layer)
-            instance.sync(self.rpr_context, inst,
-                          indirect_only=indirect_only, material_override=material_override,
-                          frame_current=frame_current)
+            instances_batch.add(inst, indirect_only)
+
+        instances_batch.export()
 
         # shadow catcher
         self.rpr_context.sync_catchers(depsgraph.scene.render.film_transparent)
@@ -546,6 +550,7 @@ class ViewportEngine(Engine):
 
         self._sync_update_before()
         with self.render_lock:
+            self.rpr_context.start_update()
             for update in updates:
                 obj = update.id
                 log("sync_update", obj)
@@ -849,7 +854,7 @@ class ViewportEngine(Engine):
             res = True
 
             rpr_mesh_keys = set(key for key, obj in self.rpr_context.objects.items()
-                                if isinstance(obj, pyrpr.Mesh) and obj.is_visible)
+                                if isinstance(obj, (pyrpr.Mesh, pyrpr.Instance)) and obj.is_visible)
             unchanged_meshes_keys = tuple(e for e in depsgraph_keys if e in rpr_mesh_keys)
             log("Object keys to update material override", unchanged_meshes_keys)
             self.sync_collection_objects(depsgraph, unchanged_meshes_keys,
@@ -877,6 +882,7 @@ class ViewportEngine(Engine):
                 if not material_override:
                     rpr_obj.set_material(None)
                 assign_materials(self.rpr_context, rpr_obj, obj, material_override)
+                object.sync_material_slots(self.rpr_context, obj_key, obj)
                 res = True
             else:
                 indirect_only = obj.original.indirect_only_get(view_layer=depsgraph.view_layer)
@@ -903,7 +909,8 @@ class ViewportEngine(Engine):
                     if len(inst.object.material_slots) == 0:
                         # remove override from instance without assigned materials
                         inst_obj.set_material(None)
-                    assign_materials(self.rpr_context, inst_obj, inst.object)
+                    assign_materials(self.rpr_context, inst_obj, inst.object, user_key=instance_key)
+                    object.sync_material_slots(self.rpr_context, instance_key, inst.object)
                     res = True
             else:
                 indirect_only = inst.parent.original.indirect_only_get(view_layer=depsgraph.view_layer)
@@ -913,36 +920,69 @@ class ViewportEngine(Engine):
                 res = True
         return res
 
+    def material_slot_users(self, mat, depsgraph):
+        """ Yields (key, object) of exported objects and instances which have mat in slots """
+        users = self.rpr_context.material_slot_users.get(mat.name_full)
+        if not users:
+            return
+
+        # users are reassigned while iterating, so index is copied
+        for key, (obj_ref, _) in tuple(users.items()):
+            obj = bpy.data.objects.get(obj_ref)
+            if obj:
+                yield key, obj.evaluated_get(depsgraph)
+
     def update_material_on_scene_objects(self, mat, depsgraph):
         """ Find all mesh material users and reapply material """
         material_override = depsgraph.view_layer.material_override
         frame_current = depsgraph.scene.frame_current
 
         if material_override and material_override.name == mat.name:
-            objects = self.depsgraph_objects(depsgraph)
+            users = ((object.key(obj), obj) for obj in self.depsgraph_objects(depsgraph))
             active_mat = material_override
         else:
-            objects = tuple(obj for obj in self.depsgraph_objects(depsgraph)
-                            if mat.name in obj.material_slots.keys())
+            users = self.material_slot_users(mat, depsgraph)
             active_mat = mat
 
         updated = False
-        for obj in objects:
-            rpr_material = material.sync_update(self.rpr_context, active_mat, obj=obj)
-            rpr_volume = material.sync_update(self.rpr_context, active_mat, 'Volume', obj=obj)
-            rpr_displacement = material.sync_update(self.rpr_context, active_mat, 'Displacement', obj=obj)
+        # shared material is recreated only once, its other users just reassign it
+        updated_material_keys = set()
+        # materials which nodes are updated in place, their users keep assigned materials
+        params_material_keys = set()
+        for key, obj in users:
+            mat_key = material.key(active_mat, obj, rpr_context=self.rpr_context)
+            if mat_key not in updated_material_keys:
+                updated_material_keys.add(mat_key)
+
+                if material.update_params(self.rpr_context, active_mat, obj=obj):
+                    params_material_keys.add(mat_key)
+                    updated = True
 
-            if not rpr_material and not rpr_volume and not rpr_displacement:
-                continue
+                else:
+                    rpr_material = material.sync_update(self.rpr_context, active_mat, obj=obj)
+                    rpr_volume = material.sync_update(self.rpr_context, active_mat, 'Volume', obj=obj)
+                    rpr_displacement = material.sync_update(self.rpr_context, active_mat, 'Displacement', obj=obj)
+
+                    if not rpr_material and not rpr_volume and not rpr_displacement:
+                        continue
 
             indirect_only = obj.original.indirect_only_get(view_layer=depsgraph.view_layer)
 
-            if object.key(obj) not in self.rpr_context.objects:
+            if key not in self.rpr_context.objects:
                 object.sync(self.rpr_context, obj, indirect_only=indirect_only,
                             frame_current=frame_current)
                 updated = True
                 continue
 
+            if mat_key in params_material_keys:
+                continue
+
+            if isinstance(key, tuple):
+                # instance of linked duplicate has its own materials
+                updated |= assign_materials(self.rpr_context, self.rpr_context.objects[key], obj,
+                                            material_override, user_key=key)
+                continue
+
             updated |= object.sync_update(self.rpr_context, obj, False, False,
                                           indirect_only=indirect_only,
                                           material_override=material_override,
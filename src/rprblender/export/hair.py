@@ -13,6 +13,7 @@
 # limitations under the License.
 #********************************************************************
 from dataclasses import dataclass
+import itertools
 import numpy as np
 
 import bpy
@@ -27,6 +28,24 @@ def key(p_sys, emitter):
     return particle.key(p_sys, emitter)
 
 
+def weld_points(all_points: np.array):
+    """
+    Welds not available (0, 0, 0) points of curves by previous points in place.
+    all_points has shape (curves_count, length, 3)
+    """
+    curves_count, length = all_points.shape[:2]
+
+    # index of point itself for available points, 0 for (0, 0, 0) points
+    is_empty = ~all_points.any(axis=2)
+    is_empty[:, 0] = False
+    point_indices = np.where(is_empty, 0, np.arange(length, dtype=np.int32))
+
+    # forward fill: each empty point gets index of the last available point before it
+    np.maximum.accumulate(point_indices, axis=1, out=point_indices)
+
+    all_points[:] = all_points[np.arange(curves_count)[:, np.newaxis], point_indices]
+
+
 @dataclass(init=False)
 class CurveData:
     points: np.array
@@ -35,14 +54,6 @@ class CurveData:
 
     @staticmethod
     def init(p_sys: bpy.types.ParticleSystem, obj: bpy.types.Object, use_final_settings: bool):
-        def shape_f(x, shape):
-            """
-            Adjust hair radius by Hair Shape
-            f(0, shape) = 0, f(1, shape) = 1, f(x, 0) - linear
-            shape > 0 - curved up, shape < 0 - curved down
-            """
-            return x ** (10.0 ** -shape)
-
         # render_steps is number of segments to render in power of 2
         settings = p_sys.settings
 
@@ -54,28 +65,22 @@ class CurveData:
             (0, num_parents) if settings.child_type == 'NONE' else \
                 (num_parents, len(p_sys.child_particles))
 
-        # getting all points of all curves
+        if curves_count == 0:
+            return None
+
+        # getting all points of all curves in one buffer
         # Note: points which are not available are equal to (0, 0, 0).
         #       We will weld such points by updating (0, 0, 0) point to previous point
+        co_hair = p_sys.co_hair
         all_points = np.fromiter(
-            (elem for i in range(start_index, start_index + curves_count)
-             for step in range(length)
-             for elem in p_sys.co_hair(obj, particle_no=i, step=step)),
-            dtype=np.float32
-        ).reshape(-1, length, 3)
-
-        # welding (0, 0, 0) point by previous point
-        for curve in all_points:
-            for i in range(1, length):
-                # if all elements of curve[i] == 0 then make it equal to curve[i-1]
-                if np.count_nonzero(curve[i]) == 0:
-                    curve[i] = curve[i - 1]
-
-        # getting indices of curves rows (points) with any non-zero values
-        curve_indices = np.arange(len(all_points), dtype=np.int32)
-
-        if len(curve_indices) == 0:
-            return None
+            itertools.chain.from_iterable(
+                co_hair(obj, particle_no=i, step=step)
+                for i in range(start_index, start_index + curves_count)
+                for step in range(length)),
+            dtype=np.float32, count=curves_count * length * 3
+        ).reshape(curves_count, length, 3)
+
+        weld_points(all_points)
 
         data = CurveData()
 
@@ -85,16 +90,16 @@ class CurveData:
         root = settings.root_radius * radius_scale / 2.
         tip = settings.tip_radius * radius_scale / 2.
 
-        data.points_radii = np.fromiter(
-            (root + (tip - root) * shape_f(i / (length - 1), settings.shape) for i in
-             range(length)),
-            dtype=np.float32)
+        # Adjust hair radius by Hair Shape:
+        # f(0, shape) = 0, f(1, shape) = 1, f(x, 0) - linear
+        # shape > 0 - curved up, shape < 0 - curved down
+        x = np.linspace(0.0, 1.0, length, dtype=np.float32)
+        data.points_radii = (root + (tip - root) * x ** (10.0 ** -settings.shape)).astype(np.float32)
 
         if settings.use_close_tip:
             data.points_radii[length - 1] = 0.0
 
-        # getting final curve points
-        data.points = np.ascontiguousarray(all_points[curve_indices], dtype=np.float32)
+        data.points = all_points
 
         if obj.type == 'MESH' and len(obj.data.uv_layers) > 0:
             # finding corresponded active ParticleSystemModifier
@@ -108,17 +113,16 @@ class CurveData:
                 log.warn(f"No active particles modifier found for system {p_sys.name}")
                 return None
 
-            # getting all UVs
-            all_uvs = np.fromiter(
-                (elem for i in range(start_index, start_index + curves_count)
-                 for elem in p_sys.uv_on_emitter(p_modifier,
-                                                 particle=p_sys.particles[
-                                                     (i - start_index) % num_parents])),
-                dtype=np.float32
+            # getting UVs of parent particles only, children use UVs of their parents
+            parent_uvs = np.fromiter(
+                itertools.chain.from_iterable(
+                    p_sys.uv_on_emitter(p_modifier, particle=particle)
+                    for particle in p_sys.particles),
+                dtype=np.float32, count=num_parents * 2
             ).reshape(-1, 2)
 
-            # getting final UVs
-            data.uvs = np.ascontiguousarray(all_uvs[curve_indices], dtype=np.float32)
+            parent_indices = np.arange(curves_count, dtype=np.int32) % num_parents
+            data.uvs = np.ascontiguousarray(parent_uvs[parent_indices])
 
         else:
             data.uvs = None
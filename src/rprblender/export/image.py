@@ -19,10 +19,11 @@ from pathlib import Path
 import bpy
 import bpy_extras
 
-from rprblender import utils
+from rprblender import utils, config
 
 from rprblender.utils import logging
 from rprblender.utils import get_sequence_frame_file_path
+from rprblender.utils.file_cache import FileCache, hash_file, make_key
 
 log = logging.Log(tag='export.image')
 
@@ -42,13 +43,30 @@ IMAGE_FORMATS = {
 DEFAULT_FORMAT = ('PNG', 'png')
 
 
+def get_reference(image: bpy.types.Image):
+    """
+    Returns key of image in bpy.data.images: name of local image or (name, library filepath)
+    of linked image, which could have the same name as local one
+    """
+    if image.library:
+        return (image.name, image.library.filepath)
+    return image.name
+
+
 def key(image: bpy.types.Image, color_space, frame_number=None, UDIM_tile=0):
-    """ Generate image key for RPR """
+    """ Generate image key for RPR, image is found by key[0] in bpy.data.images """
+    image_ref = get_reference(image)
     if frame_number is not None:
-        return (image.name, color_space, frame_number)
+        return (image_ref, color_space, frame_number)
     if UDIM_tile:
-        return (image.name, color_space, 0, UDIM_tile)
-    return (image.name, color_space)
+        return (image_ref, color_space, 0, UDIM_tile)
+    return (image_ref, color_space)
+
+
+def get_identity(image: bpy.types.Image) -> tuple:
+    """ Returns image properties which exported image depends on, except of image content """
+    return (image.name_full, image.source, image.filepath, image.colorspace_settings.name,
+            tuple(image.size), image.channels)
 
 
 def sync(rpr_context, image: bpy.types.Image, use_color_space=None, frame_number=None):
@@ -189,9 +207,40 @@ class ImagePixels:
         return rpr_image
 
 
-def _get_temp_image_path(image: [bpy.types.Image, str], extension="png") -> str:
-    h = abs(hash(image if isinstance(image, str) else image.name))
-    return str(utils.get_temp_pid_dir() / f"{h}.{extension}")
+_image_cache: FileCache = None
+
+
+def get_image_cache() -> FileCache:
+    """ Returns persistent cache of converted image files """
+    global _image_cache
+    if not _image_cache:
+        cache_dir = config.image_cache_dir or utils.get_cache_dir() / "images"
+        _image_cache = FileCache(cache_dir, config.image_cache_max_size)
+
+    return _image_cache
+
+
+def _get_image_content(image: bpy.types.Image):
+    """ Returns image content to be hashed: file hash, packed file data or image pixels """
+    if not image.is_dirty:
+        if image.packed_file:
+            return image.packed_file.data
+
+        if image.source == 'FILE':
+            file_path = image.filepath_from_user()
+            if os.path.isfile(file_path):
+                return hash_file(file_path)
+
+    # generated, painted or missing images
+    return utils.get_prop_array_data(image.pixels)
+
+
+def _get_color_management(scene):
+    """ Scene settings which are applied by Image.save_render() """
+    view_settings = scene.view_settings
+    image_settings = scene.render.image_settings
+    return (scene.display_settings.display_device, view_settings.view_transform, view_settings.look,
+            view_settings.exposure, view_settings.gamma, image_settings.color_depth)
 
 
 def _save_temp_image(image, target_format, temp_path, depsgraph):
@@ -202,17 +251,24 @@ def _save_temp_image(image, target_format, temp_path, depsgraph):
     image.save_render(temp_path, scene=scene)
 
 
+def _cache_converted_image(image: bpy.types.Image, target_format, target_extension, depsgraph) -> str:
+    """ Returns path of image converted to target format, image is converted on cache miss only """
+    cache_key = make_key(_get_image_content(image), image.colorspace_settings.name, image.alpha_mode,
+                         target_format, *_get_color_management(depsgraph.scene_eval))
+
+    return get_image_cache().get(
+        cache_key, target_extension,
+        lambda path: _save_temp_image(image, target_format, path, depsgraph))
+
+
 def cache_image_file(image: bpy.types.Image, depsgraph) -> str:
     """
-    See if image is a file, cache image pixels to temporary folder if not.
+    See if image is a file, cache image pixels to persistent image cache if not.
     Return image file path.
     """
     if image.source != 'FILE':
-        temp_path = _get_temp_image_path(image)
-        if image.is_dirty or not os.path.isfile(temp_path):
-            image.save_render(temp_path)
-
-        return temp_path
+        target_format, target_extension = IMAGE_FORMATS.get(image.file_format, DEFAULT_FORMAT)
+        return _cache_converted_image(image, target_format, target_extension, depsgraph)
 
     file_path = image.filepath_from_user()
 
@@ -224,23 +280,14 @@ def cache_image_file(image: bpy.types.Image, depsgraph) -> str:
             log.warn("Can't load image", image, file_path)
             return None
 
-        temp_path = _get_temp_image_path(image, "ies")
-        if not os.path.isfile(temp_path):
-            # save data of packed file
-            Path(temp_path).write_bytes(image.packed_file.data)
-
-        return temp_path
+        # save data of packed file
+        data = image.packed_file.data
+        return get_image_cache().get(make_key(data), "ies", lambda path: Path(path).write_bytes(data))
 
     if image.is_dirty or not os.path.isfile(file_path) \
             or file_path.lower().endswith(UNSUPPORTED_IMAGES):
         target_format, target_extension = IMAGE_FORMATS.get(image.file_format, DEFAULT_FORMAT)
-
-        # getting file path from image cache and if such file not exist saving image to cache
-        temp_path = _get_temp_image_path(image, target_extension)
-        if image.is_dirty or not os.path.isfile(temp_path):
-            _save_temp_image(image, target_format, temp_path, depsgraph)
-
-        return temp_path
+        return _cache_converted_image(image, target_format, target_extension, depsgraph)
 
     return file_path
 
@@ -253,16 +300,16 @@ def cache_image_file_path(file_path: str, depsgraph) -> str:
     if file_path.lower().endswith('.exr'):
         target_format, target_extension = IMAGE_FORMATS['OPEN_EXR']
     else:
-        target_format, target_extension = IMAGE_FORMATS['TIFF']
-
-    temp_path = _get_temp_image_path(file_path, target_extension)
-    if os.path.isfile(temp_path):
-        return temp_path
+        target_format, target_extension = IMAGE_FORMATS.get('TIFF', DEFAULT_FORMAT)
 
-    image = bpy_extras.image_utils.load_image(file_path)
-    try:
-        _save_temp_image(image, target_format, temp_path, depsgraph)
-    finally:
-        bpy.data.images.remove(image)
+    def save_image(temp_path):
+        image = bpy_extras.image_utils.load_image(file_path)
+        try:
+            _save_temp_image(image, target_format, temp_path, depsgraph)
+        finally:
+            bpy.data.images.remove(image)
 
-    return temp_path
+    # image is loaded only on cache miss
+    cache_key = make_key(hash_file(file_path), target_format,
+                         *_get_color_management(depsgraph.scene_eval))
+    return get_image_cache().get(cache_key, target_extension, save_image)
@@ -15,6 +15,8 @@
 import numpy as np
 import bpy
 
+import pyrpr
+
 from . import object, light, mesh
 from rprblender.utils import logging
 log = logging.Log(tag='export.instance')
@@ -28,6 +30,136 @@ def get_transform(instance: bpy.types.DepsgraphObjectInstance):
     return np.array(instance.matrix_world, dtype=np.float32).reshape(4, 4)
 
 
+class ShapeSettings:
+    """
+    Records Shape setters called by export functions, so visibility and materials are calculated
+    once for a group of instances and then applied to every instance of the group
+    """
+
+    def __init__(self):
+        self.materials = []
+        self.calls = []     # [(method name, args)]
+
+    def __getattr__(self, name):
+        if not name.startswith('set_'):
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+        return lambda *args: self.calls.append((name, args))
+
+
+class InstancesGroup:
+    """ Instances of one object with the same parent, they share mesh, visibility and materials """
+
+    def __init__(self, rpr_mesh, settings: ShapeSettings, obj_key, material_slots=None):
+        self.rpr_mesh = rpr_mesh
+        self.settings = settings
+        # key of instanced object, instances share materials registered for it
+        self.obj_key = obj_key
+        # (object reference, material slots) if instances have own materials
+        self.material_slots = material_slots
+        self.keys = []
+        self.matrices = []
+
+
+class InstancesBatch:
+    """
+    Exports depsgraph instances grouped by instanced object and parent.
+    Instances are added one by one while depsgraph instances are iterated, mesh and settings
+    of group are calculated by the first instance, other instances keep only key and matrix.
+    All instances of group are created by export() at once.
+    """
+
+    def __init__(self, rpr_context, **kwargs):
+        self.rpr_context = rpr_context
+        self.kwargs = kwargs
+        # (object key, parent key, indirect_only) -> InstancesGroup or None if nothing is exported
+        self.groups = {}
+        # material faces of linked duplicates, they are shared by groups till export
+        self.material_faces = {}
+
+    def add(self, instance: bpy.types.DepsgraphObjectInstance, indirect_only=False):
+        assert instance.is_instance  # expecting: instance.is_instance == True
+
+        obj = instance.object
+        if obj.type not in ('MESH', 'CURVE', 'FONT', 'SURFACE', 'META'):
+            sync(self.rpr_context, instance, indirect_only=indirect_only, **self.kwargs)
+            return
+
+        group_key = (object.key(obj), object.key(instance.parent), indirect_only)
+        if group_key in self.groups:
+            group = self.groups[group_key]
+        else:
+            group = self._init_group(instance, indirect_only)
+            self.groups[group_key] = group
+
+        if group:
+            group.keys.append(key(instance))
+            # instance data must not be kept after iteration, matrix is copied
+            group.matrices.append(instance.matrix_world.copy())
+
+    def _init_group(self, instance, indirect_only):
+        obj = instance.object
+        rpr_mesh = get_instanced_mesh(self.rpr_context, obj, indirect_only=indirect_only, **self.kwargs)
+        if not rpr_mesh:
+            return None
+
+        # linked duplicate object is an instance itself, its master mesh is instanced
+        settings = ShapeSettings()
+        material_slots = None
+        if isinstance(rpr_mesh, pyrpr.Instance):
+            # master mesh has no materials, they are assigned to its instances
+            mesh.assign_materials(self.rpr_context, settings, obj, self.kwargs.get("material_override", None),
+                                  self.material_faces)
+            material_slots = (object.ref(obj), object.get_material_slots(obj))
+            rpr_mesh = rpr_mesh.mesh
+
+        # exporting visibility from parent object
+        mesh.export_visibility(instance.parent, settings, indirect_only)
+
+        return InstancesGroup(rpr_mesh, settings, object.key(obj), material_slots)
+
+    def export(self):
+        """ Creates all added instances """
+        log("export", len(self.groups))
+        for group in self.groups.values():
+            if not group:
+                continue
+
+            rpr_shapes = self.rpr_context.create_instances(
+                group.keys, group.rpr_mesh,
+                np.array(group.matrices, dtype=np.float32).reshape(-1, 4, 4),
+                [str(instance_key) for instance_key in group.keys],
+                group.settings.calls
+            )
+            for rpr_shape in rpr_shapes:
+                self.rpr_context.scene.attach(rpr_shape)
+
+            if group.material_slots:
+                self.rpr_context.set_material_slots(group.keys, *group.material_slots)
+                # instances use materials of instanced object, they keep materials alive
+                self.rpr_context.share_material_users(group.obj_key, group.keys)
+
+        self.groups.clear()
+        self.material_faces.clear()
+
+
+def get_instanced_mesh(rpr_context, obj: bpy.types.Object, **kwargs):
+    """
+    Returns exported shape of instanced object. If object itself isn't visible on the scene
+    it is exported with visibility set to False.
+    """
+    obj_key = object.key(obj)
+    rpr_mesh = rpr_context.objects.get(obj_key, None)
+    if not rpr_mesh:
+        object.sync(rpr_context, obj, **kwargs)
+        rpr_mesh = rpr_context.objects[obj_key]
+        if not rpr_mesh:
+            return None
+        rpr_mesh.set_visibility(False)
+
+    return rpr_mesh
+
+
 def sync(rpr_context, instance: bpy.types.DepsgraphObjectInstance, **kwargs):
     """ sync the blender instance """
 
@@ -39,21 +171,23 @@ def sync(rpr_context, instance: bpy.types.DepsgraphObjectInstance, **kwargs):
     obj = instance.object
 
     if obj.type in ('MESH', 'CURVE', 'FONT', 'SURFACE', 'META'):
-        obj_key = object.key(obj)
-        rpr_mesh = rpr_context.objects.get(obj_key, None)
+        rpr_mesh = get_instanced_mesh(rpr_context, obj, **kwargs)
         if not rpr_mesh:
-            # Instance of this object exists, but object itself isn't visible on the scene.
-            # In this case we do additional object export and set visibility to False
-            object.sync(rpr_context, obj, **kwargs)
-            rpr_mesh = rpr_context.objects[obj_key]
-            if not rpr_mesh:
-                return
-            rpr_mesh.set_visibility(False)
-
-        rpr_shape = rpr_context.create_instance(instance_key, rpr_mesh)
+            return
+
+        # linked duplicate object is an instance itself, its master mesh is instanced
+        is_linked_duplicate = isinstance(rpr_mesh, pyrpr.Instance)
+        rpr_shape = rpr_context.create_instance(instance_key,
+                                                rpr_mesh.mesh if is_linked_duplicate else rpr_mesh)
         rpr_shape.set_name(str(instance_key))
         rpr_shape.set_transform(get_transform(instance))
 
+        if is_linked_duplicate:
+            # master mesh has no materials, they are assigned to its instances
+            mesh.assign_materials(rpr_context, rpr_shape, obj, kwargs.get("material_override", None),
+                                  user_key=instance_key)
+            object.sync_material_slots(rpr_context, instance_key, obj)
+
         # exporting visibility from parent object
         indirect_only = kwargs.get("indirect_only", False)
         mesh.export_visibility(instance.parent, rpr_shape, indirect_only)
@@ -12,18 +12,222 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #********************************************************************
+import json
+
 import bpy
 
+from pyrpr_profiler import profiler
+
+from rprblender import bl_info, config, utils
 from rprblender.engine.context import RPRContext
 from rprblender.nodes.blender_nodes import ShaderNodeOutputMaterial
+from rprblender.nodes.material_ir import MaterialCompiler, MaterialIR, emit
+from rprblender.nodes.node_item import NodeExpr
+from rprblender.nodes.node_parser import MaterialParams, socket_key
+from rprblender.utils.file_cache import FileCache, make_key
+from . import image
 
 from rprblender.utils import logging
 log = logging.Log(tag='export.Material')
 
 
-def key(material: bpy.types.Material, obj=None, input_socket_key='Surface'):
+# Output sockets of nodes which values depend on the object material is assigned to,
+# None means any linked output
+OBJECT_DEPENDENT_NODES = {
+    'ShaderNodeObjectInfo': ('Location', 'Color', 'Object Index', 'Random'),
+    'ShaderNodeTexCoord': ('Generated',),
+    'ShaderNodeUVMap': None,
+    'ShaderNodeAttribute': None,
+}
+
+
+# Nodes which export depends on scene data outside of material node tree, such materials
+# aren't cached, see is_cacheable()
+SCENE_DEPENDENT_NODES = {
+    # camera projection uses camera transform
+    'RPRShaderProceduralUVNode': lambda node: node.procedural_type == 'MATERIAL_NODE_UVTYPE_PROJECT',
+}
+
+
+def has_node(node_tree, check, _visited_trees=None) -> bool:
+    """ Checks if node_tree or any of its group trees has node for which check(node) is True """
+    if not node_tree:
+        return False
+
+    if _visited_trees is None:
+        _visited_trees = set()
+    _visited_trees.add(node_tree.name_full)
+
+    for node in node_tree.nodes:
+        if node.bl_idname == 'ShaderNodeGroup':
+            if node.node_tree and node.node_tree.name_full not in _visited_trees and \
+                    has_node(node.node_tree, check, _visited_trees):
+                return True
+            continue
+
+        if check(node):
+            return True
+
+    return False
+
+
+def is_object_dependent_node(node) -> bool:
+    if node.bl_idname not in OBJECT_DEPENDENT_NODES:
+        return False
+
+    outputs = OBJECT_DEPENDENT_NODES[node.bl_idname]
+    return any(socket.is_linked for socket in node.outputs
+               if outputs is None or socket.name in outputs)
+
+
+def is_object_dependent(node_tree) -> bool:
+    """
+    Checks if node_tree or any of its group trees has nodes with object dependent outputs.
+    Materials without such nodes are exported once and shared between all objects.
+    """
+    return has_node(node_tree, is_object_dependent_node)
+
+
+def is_scene_dependent_node(node) -> bool:
+    check = SCENE_DEPENDENT_NODES.get(node.bl_idname)
+    return check is not None and check(node)
+
+
+def has_animation(id_data) -> bool:
+    anim_data = id_data.animation_data if id_data else None
+    return bool(anim_data and (anim_data.action or anim_data.drivers))
+
+
+def is_animated(material: bpy.types.Material) -> bool:
+    """ Checks if material, its node tree or any of its group trees has animation or drivers """
+    if has_animation(material):
+        return True
+
+    node_trees = [material.node_tree]
+    visited_trees = set()
+    while node_trees:
+        node_tree = node_trees.pop()
+        if not node_tree or node_tree in visited_trees:
+            continue
+
+        if has_animation(node_tree):
+            return True
+
+        visited_trees.add(node_tree)
+        node_trees.extend(node.node_tree for node in node_tree.nodes
+                          if node.bl_idname == 'ShaderNodeGroup')
+
+    return False
+
+
+# material inputs which are exported as separate materials
+MATERIAL_INPUT_SOCKETS = ('Surface', 'Volume', 'Displacement')
+
+# max depth of nested structs of node properties which are included in node tree signature
+MAX_PROPERTY_DEPTH = 3
+
+
+def get_property_value(struct, prop, depth=0):
+    """ Returns hashable value of struct RNA property, nested structs are unrolled """
+    value = getattr(struct, prop.identifier)
+    if prop.type == 'POINTER':
+        if value is None or isinstance(value, bpy.types.ID):
+            return value.name_full if value is not None else None
+
+        return get_struct_values(value, depth + 1)
+
+    if prop.type == 'COLLECTION':
+        return tuple(get_struct_values(item, depth + 1) for item in value)
+
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(value))
+
+    if isinstance(value, (int, float, str, bool)):
+        return value
+
+    return tuple(value)
+
+
+def get_struct_values(struct, depth=0, skip_properties=()):
+    """ Returns ((property identifier, value), ...) of struct RNA properties """
+    if depth > MAX_PROPERTY_DEPTH:
+        return None
+
+    return tuple((prop.identifier, get_property_value(struct, prop, depth))
+                 for prop in struct.bl_rna.properties
+                 if prop.identifier != 'rna_type' and prop.identifier not in skip_properties)
+
+
+def get_node_tree_state(material: bpy.types.Material):
+    """
+    Returns signature of material node tree and default values of its sockets by socket key.
+    Signature includes nodes, links and node properties, so materials with equal signatures
+    differ only by socket values.
+    """
+    # properties of base node class: name, location, inputs, outputs, etc
+    base_properties = set(bpy.types.ShaderNode.bl_rna.properties.keys())
+
+    signature = [material.pass_index, material.cycles.displacement_method]
+    values = {}
+
+    def add_node_tree(node_tree, group_nodes):
+        for node in node_tree.nodes:
+            signature.append((node.bl_idname, node.name, node.mute,
+                              get_struct_values(node, skip_properties=base_properties)))
+
+            node_image = getattr(node, 'image', None)
+            if node_image is not None:
+                signature.append(image.get_identity(node_image))
+
+            for socket in (*node.inputs, *node.outputs):
+                if socket.is_linked:
+                    signature.append(tuple((link.from_node.name, link.from_socket.identifier,
+                                            link.to_node.name, link.to_socket.identifier)
+                                           for link in socket.links))
+                    if not socket.is_output:
+                        continue
+
+                if not hasattr(socket, 'default_value'):
+                    continue
+
+                try:
+                    values[socket_key(node, socket, group_nodes)] = \
+                        ShaderNodeOutputMaterial._parse_val(socket.default_value)
+                except TypeError:
+                    pass
+
+            if node.bl_idname == 'ShaderNodeGroup' and node.node_tree:
+                add_node_tree(node.node_tree, (*group_nodes, node))
+
+    if material.node_tree:
+        add_node_tree(material.node_tree, ())
+
+    return tuple(signature), values
+
+
+def is_material_object_dependent(material: bpy.types.Material, rpr_context=None) -> bool:
+    """
+    Returns is_object_dependent() of material node tree. If rpr_context is set result is
+    memoized in it till the next update of scene objects, see RPRContext.start_update().
+    """
+    if rpr_context is None:
+        return is_object_dependent(material.node_tree)
+
+    # embedded node trees of all materials have the same name, so material name is used
+    mat_name = material.name_full
+    result = rpr_context.object_dependent_materials.get(mat_name)
+    if result is None:
+        result = rpr_context.object_dependent_materials[mat_name] = \
+            is_object_dependent(material.node_tree)
+
+    return result
+
+
+def key(material: bpy.types.Material, obj=None, input_socket_key='Surface', rpr_context=None):
     mat_key = material.name_full
-    obj_name = obj.name_full if obj is not None else ''
+    # object name is part of the key only for materials which are specialized per object
+    obj_name = obj.name_full if obj is not None and \
+        is_material_object_dependent(material, rpr_context) else ''
 
     return (mat_key, obj_name, input_socket_key)
 
@@ -66,18 +270,180 @@ def get_material_input_node(material, input_socket_key: str):
     return socket_in.links[0].from_node
 
 
+# changing of material export invalidates all persistently cached materials
+MATERIAL_CACHE_VERSION = 1
+MATERIAL_CACHE_EXTENSION = "json"
+# persistent cache of many small files is evicted not more often than this interval
+MATERIAL_CACHE_EVICTION_INTERVAL = 60.0     # seconds
+
+
+class MaterialCache:
+    """
+    Compiled materials by hash of material node tree, see get_cache_key(). Changed node tree has
+    another hash, so stale materials are never found, they are just evicted later.
+    Least recently used materials are removed from memory when there are more than max_count of them.
+    Materials compiled without params are also stored in persistent file_cache, they are shared
+    by Blender sessions and by frames rendered on render farm.
+    """
+
+    def __init__(self, max_count, file_cache: FileCache = None):
+        self.max_count = max_count
+        self.file_cache = file_cache
+
+        self.items = {}     # cache key -> (MaterialIR, MaterialParams or None)
+
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def stats(self):
+        requests = self.hits + self.misses
+        stats = {'hits': self.hits, 'misses': self.misses,
+                 'hit_rate': round(self.hits / requests, 3) if requests else 0.0}
+        if self.file_cache:
+            stats['file'] = self.file_cache.stats
+
+        return stats
+
+    def get(self, cache_key, compile_func, persistent: bool):
+        """
+        Returns (MaterialIR, MaterialParams or None) of cache_key.
+        On cache miss material is compiled by compile_func() function.
+        """
+        item = self.items.pop(cache_key, None)
+        if item is not None:
+            self.hits += 1
+        elif persistent and self.file_cache:
+            item, is_compiled = self._get_file(cache_key, compile_func)
+            if is_compiled:
+                self.misses += 1
+            else:
+                self.hits += 1
+        else:
+            self.misses += 1
+            item = compile_func()
+
+        # dict keeps insertion order, so the first item is the least recently used one
+        self.items[cache_key] = item
+        if len(self.items) > self.max_count:
+            del self.items[next(iter(self.items))]
+
+        return item
+
+    def _get_file(self, cache_key, compile_func):
+        """ Returns item from persistent cache and flag if material was compiled on cache miss """
+        compiled = []
+
+        def write_file(file_path):
+            compiled.append(compile_func())
+            with open(file_path, 'w') as f:
+                json.dump(compiled[0][0].to_dict(), f)
+
+        try:
+            file_path = self.file_cache.get(cache_key, MATERIAL_CACHE_EXTENSION, write_file)
+            if compiled:
+                return compiled[0], True
+
+            with open(file_path) as f:
+                return (MaterialIR.from_dict(json.load(f)), None), False
+
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # file could be removed or damaged by other process
+            log.warn("Can't use cached material", cache_key, e)
+            if compiled:
+                return compiled[0], True
+
+            # damaged file is written again on the next cache miss
+            self.file_cache.remove(cache_key, MATERIAL_CACHE_EXTENSION)
+            return compile_func(), True
+
+
+_material_cache: MaterialCache = None
+
+
+def get_material_cache() -> MaterialCache:
+    """ Returns cache of compiled materials, None if config.material_cache_max_count is 0 """
+    global _material_cache
+    if not config.material_cache_max_count:
+        return None
+
+    if not _material_cache:
+        file_cache = None
+        if config.material_cache_max_size:
+            cache_dir = config.material_cache_dir or utils.get_cache_dir() / "materials"
+            file_cache = FileCache(cache_dir, config.material_cache_max_size,
+                                   MATERIAL_CACHE_EVICTION_INTERVAL)
+
+        _material_cache = MaterialCache(config.material_cache_max_count, file_cache)
+
+    return _material_cache
+
+
+def is_cacheable(material: bpy.types.Material, mat_key, output_node) -> bool:
+    """
+    Checks if compiled material could be cached: it depends on node tree only,
+    it isn't specialized for object and doesn't use other scene data.
+    Material of not linked output socket is compiled faster than its cache key.
+    """
+    return output_node.inputs[mat_key[2]].is_linked and not mat_key[1] and \
+        not has_node(material.node_tree, is_scene_dependent_node)
+
+
+def get_cache_key(rpr_context: RPRContext, input_socket_key, use_params: bool,
+                  signature, values) -> str:
+    """
+    Returns hash of material node tree state and of export settings.
+    Material name isn't hashed, materials with equal node trees share compiled material.
+    """
+    return make_key(MATERIAL_CACHE_VERSION, bl_info['version'], type(rpr_context).__module__,
+                    type(rpr_context).__name__, input_socket_key, use_params,
+                    config.material_optimize_nodes, signature, values)
+
+
+def compile_material(rpr_context: RPRContext, material: bpy.types.Material, output_node,
+                     mat_key, input_socket_key, obj, signature=None):
+    """
+    Parses material node tree to MaterialIR.
+    Returns it and MaterialParams of used socket values if node tree signature is passed.
+    """
+    params = MaterialParams(signature) if signature is not None else None
+    data = {'material_key': mat_key, 'object': obj, 'params': params}
+
+    requested_count, created_count = NodeExpr.requested_count, NodeExpr.created_count
+    node_parser = ShaderNodeOutputMaterial(MaterialCompiler(rpr_context), material,
+                                           output_node, None, data=data)
+    material_ir = MaterialIR.from_root(node_parser.final_export(input_socket_key))
+
+    if params is not None:
+        # value which is passed through link to output node isn't set to any node input
+        params.pass_item(None)
+
+    # arithmetic nodes which would be created without optimization and actually created ones
+    log(f"Material {material.name_full} '{input_socket_key}' arithmetic nodes: "
+        f"{NodeExpr.requested_count - requested_count} -> {NodeExpr.created_count - created_count}, "
+        f"material nodes: {len(material_ir.nodes)}")
+
+    return material_ir, params
+
+
 def sync(rpr_context: RPRContext, material: bpy.types.Material, input_socket_key='Surface', *,
-         obj: bpy.types.Object = None):
+         obj: bpy.types.Object = None, user_key=None):
     """
     If material exists: returns existing material unless force_update is used
     In other cases: returns None
+    user_key is the key of object or instance which uses material, by default it is key of obj
     """
 
     log(f"sync {material} '{input_socket_key}'; obj {obj}")
 
-    mat_key = key(material, obj, input_socket_key)
+    if user_key is None and obj is not None:
+        user_key = obj.name_full
+
+    mat_key = key(material, obj, input_socket_key, rpr_context)
     rpr_material = rpr_context.materials.get(mat_key, None)
     if rpr_material:
+        if user_key is not None:
+            rpr_context.add_material_user(mat_key, user_key)
         return rpr_material
 
     output_node = get_material_output_node(material)
@@ -85,32 +451,90 @@ def sync(rpr_context: RPRContext, material: bpy.types.Material, input_socket_key
         log("No output node", material)
         return None
 
-    data = {'material_key': mat_key, 'object': obj}
-    node_parser = ShaderNodeOutputMaterial(rpr_context, material, output_node, None, data=data)
-    rpr_material = node_parser.final_export(input_socket_key)
+    from rprblender.engine.viewport_engine import ViewportEngine
+
+    with profiler.phase('materials'):
+        # socket values are tracked only in viewport, which updates materials in place
+        use_params = rpr_context.engine_type == ViewportEngine.TYPE
+        material_cache = get_material_cache()
+        if material_cache and not is_cacheable(material, mat_key, output_node):
+            material_cache = None
+
+        signature = values = None
+        if use_params or material_cache:
+            signature, values = get_node_tree_state(material)
+
+        def compile_node_tree():
+            return compile_material(rpr_context, material, output_node, mat_key, input_socket_key,
+                                    obj, signature if use_params else None)
+
+        if material_cache:
+            material_ir, params = material_cache.get(
+                get_cache_key(rpr_context, input_socket_key, use_params, signature, values),
+                compile_node_tree, persistent=not use_params)
+        else:
+            material_ir, params = compile_node_tree()
+
+        rpr_nodes = emit(material_ir, rpr_context, mat_key)
+        rpr_material = rpr_nodes.get(material_ir.root)
 
     if rpr_material:
         rpr_material.set_id(material.pass_index)
         rpr_context.set_aov_index_lookup(material.pass_index, material.pass_index,
                                          material.pass_index, material.pass_index, 1.0)
         rpr_context.set_material_node_as_material(mat_key, rpr_material)
+        if params is not None:
+            rpr_context.set_material_params(mat_key, params.bind(rpr_nodes))
+        if user_key is not None:
+            rpr_context.add_material_user(mat_key, user_key)
 
     return rpr_material
 
 
+def update_params(rpr_context: RPRContext, material: bpy.types.Material,
+                  obj: bpy.types.Object = None) -> bool:
+    """
+    Updates inputs of existing material nodes in place if only socket values are changed.
+    Returns False if material has to be recreated.
+    """
+    mat_keys = tuple(mat_key for mat_key in (key(material, obj, input_socket_key, rpr_context)
+                                             for input_socket_key in MATERIAL_INPUT_SOCKETS)
+                     if mat_key in rpr_context.materials)
+    if not mat_keys or any(mat_key not in rpr_context.material_params for mat_key in mat_keys):
+        return False
+
+    signature, values = get_node_tree_state(material)
+
+    updates = []
+    for mat_key in mat_keys:
+        params = rpr_context.material_params[mat_key]
+        changed = params.get_changed(values) if params.signature == signature else None
+        if changed is None:
+            return False
+
+        updates.append((params, changed))
+
+    log("update_params", material, [len(changed) for _, changed in updates])
+
+    for params, changed in updates:
+        params.update(changed)
+
+    return True
+
+
 def sync_update(rpr_context: RPRContext, material: bpy.types.Material, input_socket_key='Surface', 
                 obj: bpy.types.Object = None):
     """ Recreates existing material """
 
     log("sync_update", material)
 
-    mat_key = key(material, obj, input_socket_key)
+    mat_key = key(material, obj, input_socket_key, rpr_context)
     if mat_key in rpr_context.materials:
         rpr_context.remove_material(mat_key)
 
     sync(rpr_context, material, obj=obj)
 
-    displacement_key = key(material, obj, 'Displacement')
+    displacement_key = key(material, obj, 'Displacement', rpr_context)
     if displacement_key in rpr_context.materials:
         rpr_context.remove_material(displacement_key)
 
@@ -13,22 +13,158 @@
 # limitations under the License.
 #********************************************************************
 from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+import copy
 import math
+import zlib
 
 import bpy
 import bmesh
 import mathutils
 
 import pyrpr
+from pyrpr_profiler import profiler
 from rprblender.engine.context import RPRContext
 from . import object, material, volume
 from rprblender.utils import get_data_from_collection
+from rprblender.utils.file_cache import FileCache, make_key, save_arrays, load_arrays
+from rprblender import config
 
 from rprblender.utils import logging
 log = logging.Log(tag='export.mesh')
 
 
+# modifiers which don't change mesh geometry
+NON_GEOMETRY_MODIFIERS = {'PARTICLE_SYSTEM'}
+
+# core supports faces with 3 or 4 vertices, n-gons are triangulated
+MAX_FACE_VERTICES = 4
+
+
+def use_polygons(rpr_context: RPRContext) -> bool:
+    """ Checks if mesh polygons are exported as is, otherwise all faces are triangulated """
+    return config.mesh_export_polygons and rpr_context.supports_quads
+
+
+def get_polygon_faces(mesh: bpy.types.Mesh):
+    """
+    Returns loop indices, vertices count and polygon index of every exported face.
+    Triangles and quads are exported as is, n-gons are replaced by their loop triangles.
+    mesh.calc_loop_triangles() has to be called before.
+    """
+    polygons_len = len(mesh.polygons)
+    loop_start = get_data_from_collection(mesh.polygons, 'loop_start', (polygons_len,), np.int32)
+    loop_total = get_data_from_collection(mesh.polygons, 'loop_total', (polygons_len,), np.int32)
+
+    # loops of polygons in polygons order, usually they are already stored this way
+    loop_offsets = np.cumsum(loop_total, dtype=np.int32) - loop_total
+    loop_indices = np.arange(loop_total.sum(), dtype=np.int32)
+    if not np.array_equal(loop_start, loop_offsets):
+        loop_indices += np.repeat(loop_start - loop_offsets, loop_total)
+
+    face_polygons = np.arange(polygons_len, dtype=np.int32)
+
+    is_ngon = loop_total > MAX_FACE_VERTICES
+    if not is_ngon.any():
+        return loop_indices, loop_total, face_polygons
+
+    tris_len = len(mesh.loop_triangles)
+    tri_polygons = get_data_from_collection(mesh.loop_triangles, 'polygon_index', (tris_len,), np.int32)
+    tri_loops = get_data_from_collection(mesh.loop_triangles, 'loops', (tris_len, 3), np.int32)
+    is_ngon_tri = is_ngon[tri_polygons]
+
+    is_ngon_loop = np.repeat(is_ngon, loop_total)
+    loop_indices = np.concatenate((loop_indices[~is_ngon_loop], tri_loops[is_ngon_tri].ravel()))
+    num_face_vertices = np.concatenate((loop_total[~is_ngon],
+                                        np.full(np.count_nonzero(is_ngon_tri), 3, dtype=np.int32)))
+    face_polygons = np.concatenate((face_polygons[~is_ngon], tri_polygons[is_ngon_tri]))
+
+    return loop_indices, num_face_vertices, face_polygons
+
+
+def get_face_material_indices(mesh: bpy.types.Mesh, polygons: bool):
+    """ Returns material index of every exported face: polygon or loop triangle """
+    if not polygons:
+        return get_data_from_collection(mesh.loop_triangles, 'material_index',
+                                        (len(mesh.loop_triangles),), np.int32)
+
+    material_indices = get_data_from_collection(mesh.polygons, 'material_index',
+                                                (len(mesh.polygons),), np.int32)
+    _, _, face_polygons = get_polygon_faces(mesh)
+    return material_indices[face_polygons]
+
+
+def unique_rows(data: np.array):
+    """ Returns unique rows of 2D array data and index of every data row in them """
+    rows = np.ascontiguousarray(data).view(np.dtype((np.void, data.dtype.itemsize * data.shape[1])))
+    _, first_indices, indices = np.unique(rows.ravel(), return_index=True, return_inverse=True)
+    return data[first_indices], indices.astype(np.int32)
+
+
+def unique_loop_values(values: np.array, loop_vertices: np.array, vertices_len: int):
+    """
+    Returns unique values of loops (normals, uvs) and index of every loop value in them.
+    Loops of the same vertex usually have the same value except on seams and sharp edges,
+    therefore values are compared with value of one loop of the vertex first,
+    only the rest values are sorted to find duplicates. Equal values of different vertices
+    are kept separately.
+    """
+    # one loop of every used vertex
+    vertex_loops = np.full(vertices_len, -1, dtype=np.int32)
+    vertex_loops[loop_vertices] = np.arange(len(loop_vertices), dtype=np.int32)
+    used_vertices = np.flatnonzero(vertex_loops >= 0)
+    vertex_values = values[vertex_loops[used_vertices]]
+
+    vertex_slots = np.full(vertices_len, -1, dtype=np.int32)
+    vertex_slots[used_vertices] = np.arange(len(used_vertices), dtype=np.int32)
+    indices = vertex_slots[loop_vertices]
+
+    is_shared = (values == values[vertex_loops[loop_vertices]]).all(axis=1)
+    if is_shared.all():
+        return vertex_values, indices
+
+    is_split = ~is_shared
+    split_values, split_indices = unique_rows(values[is_split])
+    indices[is_split] = split_indices + len(vertex_values)
+    return np.concatenate((vertex_values, split_values)), indices
+
+
+def get_vertex_normals(mesh: bpy.types.Mesh, loop_indices, vertex_indices):
+    """
+    Returns normals and normal indices of face corners for mesh without split normals:
+    smooth polygons use vertex normals, flat polygons use polygon normals
+    """
+    vertices_len = len(mesh.vertices)
+    normals = get_data_from_collection(mesh.vertices, 'normal', (vertices_len, 3))
+    normal_indices = vertex_indices.copy()
+
+    polygons_len = len(mesh.polygons)
+    use_smooth = get_data_from_collection(mesh.polygons, 'use_smooth', (polygons_len,), bool)
+    if use_smooth.all():
+        return normals, normal_indices
+
+    flat_polygons = np.flatnonzero(~use_smooth)
+    polygon_normals = get_data_from_collection(mesh.polygons, 'normal', (polygons_len, 3))
+    loop_start = get_data_from_collection(mesh.polygons, 'loop_start', (polygons_len,), np.int32)
+    loop_total = get_data_from_collection(mesh.polygons, 'loop_total', (polygons_len,), np.int32)
+
+    # index of flat polygon normal of every loop, -1 for loops of smooth polygons
+    flat_loop_total = loop_total[flat_polygons]
+    flat_loop_offsets = np.cumsum(flat_loop_total, dtype=np.int32) - flat_loop_total
+    flat_loops = np.arange(flat_loop_total.sum(), dtype=np.int32) + \
+        np.repeat(loop_start[flat_polygons] - flat_loop_offsets, flat_loop_total)
+    loop_flat_normals = np.full(len(mesh.loops), -1, dtype=np.int32)
+    loop_flat_normals[flat_loops] = np.repeat(
+        np.arange(vertices_len, vertices_len + len(flat_polygons), dtype=np.int32), flat_loop_total)
+
+    corner_flat_normals = loop_flat_normals[loop_indices]
+    is_flat = corner_flat_normals >= 0
+    normal_indices[is_flat] = corner_flat_normals[is_flat]
+
+    return np.concatenate((normals, polygon_normals[flat_polygons])), normal_indices
+
+
 @dataclass(init=False)
 class MeshData:
     """ Dataclass which holds all mesh settings. It is used also for area lights creation """
@@ -43,9 +179,46 @@ class MeshData:
     vertex_colors: np.array = None
     area: float = None
 
+    # arrays which are stored in mesh cache, uvs and uv_indices are stored per layer
+    ARRAY_NAMES = ('vertices', 'normals', 'vertex_indices', 'normal_indices', 'num_face_vertices')
+
+    def get_arrays(self) -> dict:
+        """ Returns dict name -> np.array of mesh data for saving to mesh cache """
+        arrays = {name: getattr(self, name) for name in self.ARRAY_NAMES}
+        for i, (uvs, uv_indices) in enumerate(zip(self.uvs, self.uv_indices)):
+            arrays[f'uvs{i}'] = uvs
+            arrays[f'uv_indices{i}'] = uv_indices
+
+        if self.vertex_colors is not None:
+            arrays['vertex_colors'] = self.vertex_colors
+
+        return arrays
+
     @staticmethod
-    def init_from_mesh(mesh: bpy.types.Mesh, calc_area=False, obj=None):
-        """ Returns MeshData from bpy.types.Mesh """
+    def init_from_arrays(arrays: dict):
+        """ Returns MeshData from arrays of get_arrays(), arrays are used without copying """
+        if not arrays:
+            return None
+
+        data = MeshData()
+        for name in MeshData.ARRAY_NAMES:
+            setattr(data, name, arrays[name])
+
+        data.uvs = []
+        data.uv_indices = []
+        while f'uvs{len(data.uvs)}' in arrays:
+            data.uv_indices.append(arrays[f'uv_indices{len(data.uvs)}'])
+            data.uvs.append(arrays[f'uvs{len(data.uvs)}'])
+
+        data.vertex_colors = arrays.get('vertex_colors', None)
+        return data
+
+    @staticmethod
+    def init_from_mesh(mesh: bpy.types.Mesh, calc_area=False, obj=None, polygons=False):
+        """
+        Returns MeshData from bpy.types.Mesh.
+        Faces are triangles or, if polygons is set, triangles, quads and triangulated n-gons.
+        """
 
         # Looks more like Blender's bug that we have to check that mesh has calc_normals_split().
         # It is possible after deleting corresponded object with such mesh from the scene.
@@ -53,8 +226,13 @@ class MeshData:
             log.warn("No calc_normals_split() in mesh", mesh)
             return None
 
+        # split normals are needed only for auto smooth and custom normals,
+        # otherwise normals of smooth faces are vertex normals
+        use_split_normals = mesh.use_auto_smooth or mesh.has_custom_normals
+
         # preparing mesh to export
-        mesh.calc_normals_split()
+        if use_split_normals:
+            mesh.calc_normals_split()
         mesh.calc_loop_triangles()
 
         # getting mesh export data
@@ -65,46 +243,51 @@ class MeshData:
         data = MeshData()
         data.vertices = get_data_from_collection(mesh.vertices, 'co', (len(mesh.vertices), 3))
 
-        len_loop_triangles = len(mesh.loop_triangles)
-        data.normals = get_data_from_collection(mesh.loop_triangles, 'split_normals',
-                                                (len_loop_triangles * 3, 3))
+        # loop index of every face corner, normals, uvs and vertex colors are stored per loop
+        if polygons:
+            loop_indices, data.num_face_vertices, _ = get_polygon_faces(mesh)
+        else:
+            loop_indices = get_data_from_collection(mesh.loop_triangles, 'loops',
+                                                    (tris_len * 3,), np.int32)
+            data.num_face_vertices = np.full((tris_len,), 3, dtype=np.int32)
+
+        loop_vertices = get_data_from_collection(mesh.loops, 'vertex_index',
+                                                 (len(mesh.loops),), np.int32)
+        data.vertex_indices = loop_vertices[loop_indices]
+
+        # normals and uvs are deduplicated, equal values of different loops are stored once
+        if use_split_normals:
+            normals = get_data_from_collection(mesh.loops, 'normal', (len(mesh.loops), 3))
+            data.normals, normal_indices = unique_loop_values(normals, loop_vertices,
+                                                              len(data.vertices))
+            data.normal_indices = normal_indices[loop_indices]
+        else:
+            data.normals, data.normal_indices = get_vertex_normals(mesh, loop_indices,
+                                                                   data.vertex_indices)
 
         data.uvs = []
         data.uv_indices = []
 
         primary_uv = mesh.rpr.primary_uv_layer
         if primary_uv:
-            uvs = get_data_from_collection(primary_uv.data, 'uv', (len(primary_uv.data), 2))
-            uv_indices = get_data_from_collection(mesh.loop_triangles, 'loops',
-                                                  (len_loop_triangles * 3,), np.int32)
+            for uv_layer in (primary_uv, mesh.rpr.secondary_uv_layer(obj)):
+                if not uv_layer or len(uv_layer.data) == 0:
+                    continue
 
-            if len(uvs) > 0:
+                uvs = get_data_from_collection(uv_layer.data, 'uv', (len(uv_layer.data), 2))
+                uvs, uv_indices = unique_loop_values(uvs, loop_vertices, len(data.vertices))
                 data.uvs.append(uvs)
-                data.uv_indices.append(uv_indices)
-
-            secondary_uv = mesh.rpr.secondary_uv_layer(obj)
-            if secondary_uv:
-                uvs = get_data_from_collection(secondary_uv.data, 'uv', (len(secondary_uv.data), 2))
-                if len(uvs) > 0:
-                    data.uvs.append(uvs)
-                    data.uv_indices.append(uv_indices)
-
-        data.num_face_vertices = np.full((tris_len,), 3, dtype=np.int32)
-        data.vertex_indices = get_data_from_collection(mesh.loop_triangles, 'vertices',
-                                                       (len_loop_triangles * 3,), np.int32)
-        data.normal_indices = np.arange(tris_len * 3, dtype=np.int32)
+                data.uv_indices.append(uv_indices[loop_indices])
 
         if calc_area:
-            data.area = sum(tri.area for tri in mesh.loop_triangles)
+            data.area = get_data_from_collection(mesh.loop_triangles, 'area', (tris_len,)).sum()
 
         # set active vertex color map
         if mesh.vertex_colors.active:
             color_data = mesh.vertex_colors.active.data
-            # getting vertex colors and its indices (the same as uv_indices)
+            # getting vertex colors and its indices, colors are stored per loop like uvs
             colors = get_data_from_collection(color_data, 'color', (len(color_data), 4))
-            color_indices = data.uv_indices[0] if (data.uv_indices is not None and len(data.uv_indices) > 0) else \
-                get_data_from_collection(mesh.loop_triangles, 'loops',
-                                         (len_loop_triangles * 3,), np.int32)
+            color_indices = loop_indices
 
             # preparing vertex_color buffer with the same size as vertices and
             # setting its data by indices from vertex colors
@@ -114,6 +297,120 @@ class MeshData:
 
         return data
 
+    @staticmethod
+    def iter_chunks_from_mesh(mesh: bpy.types.Mesh, chunk_size: int, obj=None, polygons=False):
+        """
+        Yields MeshData of chunks of mesh faces, chunk has up to chunk_size faces and its vertices.
+        Faces are in the same order as in init_from_mesh(). Blender collections are read at once,
+        so per loop data is read for the whole mesh, but indices, deduplicated normals and uvs
+        and other buffers passed to core are created only for current chunk.
+        """
+        if not hasattr(mesh, 'calc_normals_split'):
+            log.warn("No calc_normals_split() in mesh", mesh)
+            return
+
+        use_split_normals = mesh.use_auto_smooth or mesh.has_custom_normals
+        if use_split_normals:
+            mesh.calc_normals_split()
+        mesh.calc_loop_triangles()
+
+        tris_len = len(mesh.loop_triangles)
+        if tris_len == 0:
+            return
+
+        vertices = get_data_from_collection(mesh.vertices, 'co', (len(mesh.vertices), 3))
+        if polygons:
+            loop_indices, num_face_vertices, face_polygons = get_polygon_faces(mesh)
+        else:
+            loop_indices = get_data_from_collection(mesh.loop_triangles, 'loops',
+                                                    (tris_len * 3,), np.int32)
+            num_face_vertices = np.full((tris_len,), 3, dtype=np.int32)
+            face_polygons = get_data_from_collection(mesh.loop_triangles, 'polygon_index',
+                                                     (tris_len,), np.int32)
+
+        face_offsets = np.cumsum(num_face_vertices, dtype=np.int64) - num_face_vertices
+        loops_len = len(mesh.loops)
+        loop_vertices = get_data_from_collection(mesh.loops, 'vertex_index', (loops_len,), np.int32)
+
+        if use_split_normals:
+            normals = get_data_from_collection(mesh.loops, 'normal', (loops_len, 3))
+        else:
+            normals = get_data_from_collection(mesh.vertices, 'normal', (len(vertices), 3))
+            polygons_len = len(mesh.polygons)
+            use_smooth = get_data_from_collection(mesh.polygons, 'use_smooth', (polygons_len,), bool)
+            polygon_normals = None if use_smooth.all() else \
+                get_data_from_collection(mesh.polygons, 'normal', (polygons_len, 3))
+
+        uv_layers = []
+        primary_uv = mesh.rpr.primary_uv_layer
+        if primary_uv:
+            for uv_layer in (primary_uv, mesh.rpr.secondary_uv_layer(obj)):
+                if uv_layer and len(uv_layer.data) > 0:
+                    uv_layers.append(get_data_from_collection(uv_layer.data, 'uv',
+                                                              (len(uv_layer.data), 2)))
+
+        colors = None
+        if mesh.vertex_colors.active:
+            color_data = mesh.vertex_colors.active.data
+            colors = get_data_from_collection(color_data, 'color', (len(color_data), 4))
+
+        # chunk vertices are renumbered, only vertices of chunk faces are exported.
+        # Mesh vertex -> chunk vertex map is filled by used vertices only, it's faster than sorting
+        is_chunk_vertex = np.zeros(len(vertices), dtype=bool)
+        chunk_vertex_indices = np.empty(len(vertices), dtype=np.int32)
+
+        faces_len = len(num_face_vertices)
+        for face_begin in range(0, faces_len, chunk_size):
+            face_end = min(face_begin + chunk_size, faces_len)
+            chunk_face_vertices = num_face_vertices[face_begin:face_end]
+            corner_loops = loop_indices[face_offsets[face_begin]:
+                                        face_offsets[face_end - 1] + chunk_face_vertices[-1]]
+
+            corner_vertices = loop_vertices[corner_loops]
+            is_chunk_vertex[corner_vertices] = True
+            chunk_vertices = np.flatnonzero(is_chunk_vertex)
+            is_chunk_vertex[chunk_vertices] = False
+
+            vertices_len = len(chunk_vertices)
+            chunk_vertex_indices[chunk_vertices] = np.arange(vertices_len, dtype=np.int32)
+            vertex_indices = chunk_vertex_indices[corner_vertices]
+
+            data = MeshData()
+            data.vertices = vertices[chunk_vertices]
+            data.vertex_indices = vertex_indices
+            data.num_face_vertices = chunk_face_vertices
+
+            if use_split_normals:
+                data.normals, data.normal_indices = unique_loop_values(
+                    normals[corner_loops], vertex_indices, vertices_len)
+            else:
+                data.normals = normals[chunk_vertices]
+                data.normal_indices = vertex_indices
+                if polygon_normals is not None:
+                    chunk_polygons = face_polygons[face_begin:face_end]
+                    is_flat = ~use_smooth[chunk_polygons]
+                    if is_flat.any():
+                        # corners of flat faces use normal of their polygon
+                        flat_polygons, flat_indices = np.unique(chunk_polygons[is_flat],
+                                                                return_inverse=True)
+                        data.normals = np.concatenate((data.normals, polygon_normals[flat_polygons]))
+                        data.normal_indices = vertex_indices.copy()
+                        data.normal_indices[np.repeat(is_flat, chunk_face_vertices)] = np.repeat(
+                            flat_indices.astype(np.int32) + vertices_len, chunk_face_vertices[is_flat])
+
+            data.uvs = []
+            data.uv_indices = []
+            for uvs in uv_layers:
+                uvs, uv_indices = unique_loop_values(uvs[corner_loops], vertex_indices, vertices_len)
+                data.uvs.append(uvs)
+                data.uv_indices.append(uv_indices)
+
+            if colors is not None:
+                data.vertex_colors = np.zeros((vertices_len, 4), dtype=np.float32)
+                data.vertex_colors[vertex_indices] = colors[corner_loops]
+
+            yield data
+
     @staticmethod
     def init_from_shape_type(shape_type, size, size_y, segments):
         """
@@ -171,7 +468,11 @@ class MeshData:
             data.normal_indices = data.vertex_indices
             data.uv_indices = [data.vertex_indices]
 
-            data.area = sum(face.calc_area() for face in bm.faces)
+            # bmesh has no foreach_get(), but area is calculated from triangles without python loop
+            triangles = data.vertices[data.vertex_indices.reshape(-1, 3)]
+            data.area = float(np.linalg.norm(
+                np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0]),
+                axis=1).sum() * 0.5)
 
             return data
 
@@ -179,15 +480,132 @@ class MeshData:
             bm.free()
 
 
+# changing of MeshData export invalidates all cached meshes
+MESH_CACHE_VERSION = 1
+MESH_CACHE_EXTENSION = "rprmesh"
+
+_mesh_cache: FileCache = None
+
+
+def get_mesh_cache() -> FileCache:
+    """ Returns persistent cache of exported mesh data, None if config.mesh_cache_dir isn't set """
+    global _mesh_cache
+    if not config.mesh_cache_dir:
+        return None
+
+    if not _mesh_cache:
+        _mesh_cache = FileCache(config.mesh_cache_dir, config.mesh_cache_max_size)
+
+    return _mesh_cache
+
+
+def is_cached_mesh(mesh: bpy.types.Mesh) -> bool:
+    """
+    Checks if mesh data is stored in mesh cache. Small meshes aren't cached.
+    Meshes with custom normals aren't cached, their split normals would be needed for cache key.
+    """
+    return len(mesh.polygons) >= config.mesh_cache_min_polygons and not mesh.has_custom_normals
+
+
+def get_mesh_cache_key(obj: bpy.types.Object, mesh: bpy.types.Mesh, polygons: bool) -> str:
+    """
+    Returns hash of evaluated mesh data which MeshData is made of and of modifier stack.
+    Triangulation and normals are calculated from hashed data, so they aren't read,
+    edges are hashed for auto smooth normals.
+    """
+    vertices_len, loops_len, polygons_len = len(mesh.vertices), len(mesh.loops), len(mesh.polygons)
+
+    parts = [
+        MESH_CACHE_VERSION, polygons, vertices_len, loops_len, polygons_len,
+        mesh.use_auto_smooth, mesh.auto_smooth_angle,
+        tuple((modifier.type, modifier.name) for modifier in obj.modifiers),
+        get_data_from_collection(mesh.vertices, 'co', (vertices_len, 3)),
+        get_data_from_collection(mesh.loops, 'vertex_index', (loops_len,), np.int32),
+        get_data_from_collection(mesh.polygons, 'loop_start', (polygons_len,), np.int32),
+        get_data_from_collection(mesh.polygons, 'loop_total', (polygons_len,), np.int32),
+        get_data_from_collection(mesh.polygons, 'use_smooth', (polygons_len,), bool),
+    ]
+
+    if mesh.use_auto_smooth:
+        # auto smooth split normals depend on sharp edges
+        edges_len = len(mesh.edges)
+        parts.extend((
+            get_data_from_collection(mesh.edges, 'vertices', (edges_len, 2), np.int32),
+            get_data_from_collection(mesh.edges, 'use_edge_sharp', (edges_len,), bool),
+        ))
+
+    primary_uv = mesh.rpr.primary_uv_layer
+    if primary_uv:
+        for uv_layer in (primary_uv, mesh.rpr.secondary_uv_layer(obj)):
+            if uv_layer and len(uv_layer.data) > 0:
+                parts.append(get_data_from_collection(uv_layer.data, 'uv', (len(uv_layer.data), 2)))
+
+    if mesh.vertex_colors.active:
+        color_data = mesh.vertex_colors.active.data
+        parts.append(get_data_from_collection(color_data, 'color', (len(color_data), 4)))
+
+    return make_key(*parts)
+
+
+def init_mesh_data(obj: bpy.types.Object, mesh: bpy.types.Mesh, polygons: bool):
+    """
+    Returns MeshData of mesh, big meshes are taken from persistent mesh cache if it is enabled.
+    On cache hit arrays are memory mapped cache file, they are passed to core without copying.
+    """
+    mesh_cache = get_mesh_cache()
+    if not mesh_cache or not hasattr(mesh, 'calc_normals_split') or not is_cached_mesh(mesh):
+        return MeshData.init_from_mesh(mesh, obj=obj, polygons=polygons)
+
+    created_data = []
+
+    def write_file(file_path):
+        data = MeshData.init_from_mesh(mesh, obj=obj, polygons=polygons)
+        created_data.append(data)
+        save_arrays(file_path, data.get_arrays() if data else {})
+
+    file_path = mesh_cache.get(get_mesh_cache_key(obj, mesh, polygons), MESH_CACHE_EXTENSION,
+                               write_file)
+    if created_data:
+        return created_data[0]
+
+    try:
+        data = MeshData.init_from_arrays(load_arrays(file_path))
+        log("Mesh cache hit", mesh, file_path)
+        return data
+
+    except (OSError, ValueError, KeyError) as e:
+        # file could be removed or damaged by other process
+        log.warn("Can't load cached mesh data", mesh, file_path, e)
+        return MeshData.init_from_mesh(mesh, obj=obj, polygons=polygons)
+
+
+def get_material_faces(material_indices: np.array):
+    """
+    Returns used material indices and dict material index -> indices of its faces.
+    Faces are grouped by one stable sort, face indices are views of the sorted array.
+    """
+    # Blender material index is short, sorting of 16 bit integers is linear radix sort
+    order = np.argsort(material_indices.astype(np.int16), kind='stable').astype(np.int32)
+    sorted_indices = material_indices[order]
+
+    splits = np.flatnonzero(sorted_indices[1:] != sorted_indices[:-1]) + 1
+    unique_indices = sorted_indices[np.concatenate(([0], splits))]
+    return unique_indices, dict(zip(unique_indices, np.split(order, splits)))
+
+
 def assign_materials(rpr_context: RPRContext, rpr_shape: pyrpr.Shape, obj: bpy.types.Object,
-                     material_override=None) -> bool:
+                     material_override=None, material_faces_cache: dict = None,
+                     user_key=None) -> bool:
     """
     Assigns materials from material_slots to rpr_shape. It also syncs new material.
     Override material is used instead of mesh-assigned if present.
+    material_faces_cache (master_key -> material faces) could be used only for linked duplicates,
+    it shares faces of the same mesh between objects.
+    user_key is the key of rpr_shape if it isn't the key of obj, e.g. key of instance.
     """
     # ViewLayer override is used for all objects in scene on that view layer
     if material_override:
-        return assign_override_material(rpr_context, rpr_shape, obj, material_override)
+        return assign_override_material(rpr_context, rpr_shape, obj, material_override, user_key)
 
     material_slots = obj.material_slots
     if len(material_slots) == 0:
@@ -202,8 +620,14 @@ def assign_materials(rpr_context: RPRContext, rpr_shape: pyrpr.Shape, obj: bpy.t
     # mesh here could actually be curve data which wouldn't have loop_triangles
     if len(material_slots) > 1 and getattr(mesh, 'loop_triangles', None):
         # Multiple materials found, going to collect indices of actually used materials
-        material_indices = np.fromiter((tri.material_index for tri in mesh.loop_triangles), dtype=np.int32)
-        material_unique_indices = np.unique(material_indices)
+        mesh_key = master_key(mesh)
+        if material_faces_cache is not None and mesh_key in material_faces_cache:
+            material_unique_indices, material_faces = material_faces_cache[mesh_key]
+        else:
+            material_unique_indices, material_faces = get_material_faces(
+                get_face_material_indices(mesh, use_polygons(rpr_context)))
+            if material_faces_cache is not None:
+                material_faces_cache[mesh_key] = material_unique_indices, material_faces
 
     # Apply used materials to mesh
     for i in material_unique_indices:
@@ -214,7 +638,7 @@ def assign_materials(rpr_context: RPRContext, rpr_shape: pyrpr.Shape, obj: bpy.t
 
         log(f"Syncing material '{slot.name}'; {slot}")
 
-        rpr_material = material.sync(rpr_context, slot.material, obj=obj)
+        rpr_material = material.sync(rpr_context, slot.material, obj=obj, user_key=user_key)
 
         if rpr_material:
             if len(material_unique_indices) == 1:
@@ -222,8 +646,7 @@ def assign_materials(rpr_context: RPRContext, rpr_shape: pyrpr.Shape, obj: bpy.t
             else:
                 # It is important not to remove previous unused materials here, because core
                 # could crash. They will be in memory till mesh exists.
-                face_indices = np.array(np.where(material_indices == i)[0], dtype=np.int32)
-                rpr_shape.set_material_faces(rpr_material, face_indices)
+                rpr_shape.set_material_faces(rpr_material, material_faces[i])
         else:
             rpr_shape.set_material(None)
 
@@ -234,12 +657,13 @@ def assign_materials(rpr_context: RPRContext, rpr_shape: pyrpr.Shape, obj: bpy.t
         smoke_modifier = volume.get_smoke_modifier(obj)
         if not smoke_modifier:
             # setting volume material
-            rpr_volume = material.sync(rpr_context, mat, 'Volume', obj=obj)
+            rpr_volume = material.sync(rpr_context, mat, 'Volume', obj=obj, user_key=user_key)
             rpr_shape.set_volume_material(rpr_volume)
 
         # setting displacement material
         if mat.cycles.displacement_method in {'DISPLACEMENT', 'BOTH'}:
-            rpr_displacement = material.sync(rpr_context, mat, 'Displacement', obj=obj)
+            rpr_displacement = material.sync(rpr_context, mat, 'Displacement', obj=obj,
+                                             user_key=user_key)
             rpr_shape.set_displacement_material(rpr_displacement)
         else:
             rpr_shape.set_displacement_material(None)
@@ -247,10 +671,11 @@ def assign_materials(rpr_context: RPRContext, rpr_shape: pyrpr.Shape, obj: bpy.t
     return True
 
 
-def assign_override_material(rpr_context, rpr_shape, obj, material_override) -> bool:
+def assign_override_material(rpr_context, rpr_shape, obj, material_override, user_key=None) -> bool:
     """ Apply override material to shape if material is correct """
-    rpr_material = material.sync(rpr_context, material_override, obj=obj)
-    rpr_displacement = material.sync(rpr_context, material_override, 'Displacement', obj=obj)
+    rpr_material = material.sync(rpr_context, material_override, obj=obj, user_key=user_key)
+    rpr_displacement = material.sync(rpr_context, material_override, 'Displacement', obj=obj,
+                                     user_key=user_key)
     rpr_shape.set_material(rpr_material)
     rpr_shape.set_displacement_material(rpr_displacement)
 
@@ -288,7 +713,7 @@ def sync_visibility(rpr_context, obj: bpy.types.Object, rpr_shape: pyrpr.Shape,
     obj.rpr.export_subdivision(rpr_shape)
 
     if use_contour:
-        pyrpr.ShapeSetContourIgnore(rpr_shape, not obj.rpr.visibility_contour)
+        rpr_shape.set_contour_ignore(not obj.rpr.visibility_contour)
 
     if obj.rpr.portal_light:
         # Register mesh as a portal light, set "Environment" light group
@@ -300,6 +725,318 @@ def sync_visibility(rpr_context, obj: bpy.types.Object, rpr_shape: pyrpr.Shape,
         rpr_shape.set_portal_light(False)
 
 
+def get_fingerprint(rpr_context: RPRContext, obj: bpy.types.Object, mesh: bpy.types.Mesh,
+                    material_override=None):
+    """
+    Returns topology fingerprint of exported mesh: elements counts, hashes of triangles indices,
+    material indices, UVs and vertex colors, and exported materials of object. Meshes with
+    the same fingerprint differ only by vertex positions and normals, like with armature,
+    shape keys or cloth deformation. Loop triangles define polygons topology too.
+    """
+    mesh.calc_loop_triangles()
+    tris_len = len(mesh.loop_triangles)
+    vertex_indices = get_data_from_collection(mesh.loop_triangles, 'vertices',
+                                              (tris_len * 3,), np.int32)
+
+    material_indices_hash = None
+    if len(obj.material_slots) > 1:
+        material_indices = get_data_from_collection(mesh.loop_triangles, 'material_index',
+                                                    (tris_len,), np.int32)
+        material_indices_hash = zlib.crc32(material_indices)
+
+    # UVs and vertex colors are not exported again by deformation update,
+    # so their values are compared without deduplication
+    uv_layers = (mesh.rpr.primary_uv_layer, mesh.rpr.secondary_uv_layer(obj)) \
+        if mesh.rpr.primary_uv_layer else ()
+    loop_layers = [(uv_layer, 'uv', 2) for uv_layer in uv_layers]
+    loop_layers.append((mesh.vertex_colors.active, 'color', 4))
+
+    loop_data_hash = 0
+    for layer, attribute, item_size in loop_layers:
+        if layer and len(layer.data) > 0:
+            loop_data_hash = zlib.crc32(get_data_from_collection(
+                layer.data, attribute, (len(layer.data), item_size)), loop_data_hash)
+
+    # exported materials of object are removed by animated materials update,
+    # slots materials change if other material is assigned
+    material_keys = frozenset(rpr_context.object_materials.get(object.key(obj), ()))
+    slots_materials = tuple(slot.material.name_full if slot.material else None
+                            for slot in obj.material_slots)
+
+    return (
+        len(mesh.vertices), len(mesh.polygons), len(mesh.loops), tris_len,
+        zlib.crc32(vertex_indices), material_indices_hash, loop_data_hash,
+        material_keys, slots_materials,
+        material_override.name_full if material_override else None,
+    )
+
+
+class MeshDeformation:
+    """
+    Exported data of mesh which is kept for deformation updates, see sync_deformation().
+    Only vertices and normals are read again from deformed mesh, indices, UVs and vertex colors
+    buffers of the previous export are reused.
+    """
+
+    def __init__(self, fingerprint, data: MeshData, loop_indices, loop_vertices):
+        self.fingerprint = fingerprint
+
+        # vertices and normals are passed to core and aren't needed anymore
+        self.data = copy.copy(data)
+        self.data.vertices = self.data.normals = self.data.normal_indices = None
+
+        # loop index of every face corner and vertex of every loop, see MeshData.init_from_mesh()
+        self.loop_indices = loop_indices
+        self.loop_vertices = loop_vertices
+
+    @staticmethod
+    def init(rpr_context: RPRContext, obj: bpy.types.Object, mesh: bpy.types.Mesh,
+             data: MeshData, material_override=None):
+        fingerprint = get_fingerprint(rpr_context, obj, mesh, material_override)
+        if use_polygons(rpr_context):
+            loop_indices = get_polygon_faces(mesh)[0]
+        else:
+            loop_indices = get_data_from_collection(mesh.loop_triangles, 'loops',
+                                                    (len(mesh.loop_triangles) * 3,), np.int32)
+        loop_vertices = get_data_from_collection(mesh.loops, 'vertex_index',
+                                                 (len(mesh.loops),), np.int32)
+
+        return MeshDeformation(fingerprint, data, loop_indices, loop_vertices)
+
+    def deform(self, mesh: bpy.types.Mesh) -> MeshData:
+        """ Returns MeshData with vertices and normals of deformed mesh """
+        use_split_normals = mesh.use_auto_smooth or mesh.has_custom_normals
+        if use_split_normals:
+            mesh.calc_normals_split()
+
+        data = copy.copy(self.data)
+        data.vertices = get_data_from_collection(mesh.vertices, 'co', (len(mesh.vertices), 3))
+        if use_split_normals:
+            normals = get_data_from_collection(mesh.loops, 'normal', (len(mesh.loops), 3))
+            data.normals, normal_indices = unique_loop_values(normals, self.loop_vertices,
+                                                              len(data.vertices))
+            data.normal_indices = normal_indices[self.loop_indices]
+        else:
+            data.normals, data.normal_indices = get_vertex_normals(mesh, self.loop_indices,
+                                                                   data.vertex_indices)
+
+        return data
+
+
+def sync_deformation(rpr_context: RPRContext, obj: bpy.types.Object, rpr_shape: pyrpr.Shape,
+                     **kwargs) -> bool:
+    """
+    Updates deformed mesh if its topology fingerprint isn't changed. Only vertices and normals
+    are exported again. Core mesh can't be changed, so it is recreated from new vertices and
+    normals and buffers of previous export, its core settings are copied from previous mesh.
+    Materials, visibility and catchers aren't exported again. Returns False if full mesh export
+    is required, after it deformation of mesh is tracked, see sync(track_deformation=True).
+    """
+    mesh = obj.data
+    obj_key = object.key(obj)
+    deformation = rpr_context.mesh_deformations.get(obj_key, None)
+    if deformation is None or not isinstance(rpr_shape, pyrpr.Mesh) or \
+            rpr_context.mesh_instances.get(rpr_shape) or is_linked_duplicate(obj, mesh):
+        return False
+
+    if not hasattr(mesh, 'calc_normals_split') or \
+            get_fingerprint(rpr_context, obj, mesh, kwargs.get("material_override", None)) != \
+            deformation.fingerprint:
+        return False
+
+    log("sync_deformation", obj, mesh)
+
+    data = deformation.deform(mesh)
+    rpr_mesh = rpr_context.update_mesh(
+        obj_key,
+        data.vertices, data.normals, data.uvs,
+        data.vertex_indices, data.normal_indices, data.uv_indices,
+        data.num_face_vertices
+    )
+    rpr_context.mesh_deformations[obj_key] = deformation
+
+    if data.vertex_colors is not None:
+        rpr_mesh.set_vertex_colors(data.vertex_colors)
+
+    rpr_mesh.set_transform(object.get_transform(obj))
+    return True
+
+
+def master_key(mesh: bpy.types.Mesh):
+    return mesh.name_full
+
+
+def is_linked_duplicate(obj: bpy.types.Object, mesh: bpy.types.Mesh) -> bool:
+    """
+    Checks if obj shares its mesh data with other objects (Alt+D duplicates).
+    Evaluated mesh of such object is the same for all of them only if modifiers don't change it.
+    """
+    return mesh.original.users > 1 and \
+        all(modifier.type in NON_GEOMETRY_MODIFIERS for modifier in obj.modifiers)
+
+
+class MeshDataPool:
+    """
+    Prepares MeshData of depsgraph objects in worker threads ahead of their sync.
+    Objects are still synced one by one in depsgraph order by engine, which takes prepared data
+    with get(), so all core calls are made by sync thread in the same order as without pool.
+    Blender API calls don't release GIL, therefore mostly numpy processing of different meshes
+    runs concurrently with core calls. If workers is 0 data is prepared in get() call.
+    Workers read meshes by Blender API, which isn't thread safe, so workers are enabled only
+    by config.sync_mesh_workers. Data of objects skipped by sync is dropped by next get() call.
+    """
+
+    def __init__(self, rpr_context: RPRContext, objects, workers=0):
+        self.polygons = use_polygons(rpr_context)
+        self.executor = None
+        if workers <= 0:
+            return
+
+        # tasks are listed by sync thread, data key -> position in depsgraph order
+        self.tasks = list(self._iter_tasks(rpr_context, objects))
+        self.task_indices = {task[0]: i for i, task in enumerate(self.tasks)}
+        self.next_task = 0
+        self.futures = {}
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='MeshData')
+        # prepared data is kept until its object is synced, queue size limits used memory
+        self.max_queued = workers * 2
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @staticmethod
+    def _iter_tasks(rpr_context, objects):
+        """ Iterates (data key, obj, mesh) of objects exported by sync() in depsgraph order """
+        master_keys = set()
+        for obj in objects:
+            if obj.type != 'MESH' or obj.mode != 'OBJECT':
+                continue
+
+            mesh = obj.data
+            if is_linked_duplicate(obj, mesh):
+                mesh_key = master_key(mesh)
+                if mesh_key in rpr_context.master_meshes or mesh_key in master_keys:
+                    continue
+
+                # data of linked duplicates is prepared only for the first user of master mesh
+                master_keys.add(mesh_key)
+                yield ('master', mesh_key), obj, mesh
+
+            elif not is_chunked_mesh(mesh):
+                yield ('object', object.key(obj)), obj, mesh
+
+    def _init_data(self, obj, mesh):
+        with profiler.phase('prepare meshes'):
+            return init_mesh_data(obj, mesh, self.polygons)
+
+    def _fill_queue(self):
+        while len(self.futures) < self.max_queued and self.next_task < len(self.tasks):
+            data_key, obj, mesh = self.tasks[self.next_task]
+            self.next_task += 1
+            self.futures[data_key] = self.executor.submit(self._init_data, obj, mesh)
+
+    def get(self, data_key, obj, mesh):
+        """ Returns prepared MeshData of data_key or prepares it now if it wasn't queued """
+        if not self.executor:
+            return self._init_data(obj, mesh)
+
+        task_index = self.task_indices.get(data_key)
+        if task_index is None:
+            return self._init_data(obj, mesh)
+
+        # objects are synced in depsgraph order, data queued before this one won't be requested
+        for key in [key for key in self.futures if self.task_indices[key] < task_index]:
+            self.futures.pop(key).cancel()
+
+        future = self.futures.pop(data_key, None)
+        self.next_task = max(self.next_task, task_index + 1)
+        self._fill_queue()
+        if future is None:
+            return self._init_data(obj, mesh)
+
+        with profiler.phase('wait meshes'):
+            return future.result()
+
+    def close(self):
+        if not self.executor:
+            return
+
+        for future in self.futures.values():
+            future.cancel()
+
+        self.executor.shutdown()
+        self.executor = None
+        self.futures.clear()
+
+
+def is_chunked_mesh(mesh: bpy.types.Mesh) -> bool:
+    """ Checks if mesh is exported by chunks of config.mesh_export_chunk_size faces """
+    return 0 < config.mesh_export_chunk_size < len(mesh.polygons)
+
+
+def create_mesh_chunks(rpr_context: RPRContext, obj: bpy.types.Object, mesh: bpy.types.Mesh):
+    """
+    Creates big mesh by chunks, every chunk is passed to core before the next one is prepared.
+    Chunked meshes aren't prepared by MeshDataPool and aren't stored in mesh cache.
+    """
+    chunks = []
+    for data in MeshData.iter_chunks_from_mesh(mesh, config.mesh_export_chunk_size, obj=obj,
+                                               polygons=use_polygons(rpr_context)):
+        chunk = rpr_context.create_mesh_chunk(
+            data.vertices, data.normals, data.uvs,
+            data.vertex_indices, data.normal_indices, data.uv_indices,
+            data.num_face_vertices
+        )
+        if data.vertex_colors is not None:
+            chunk.set_vertex_colors(data.vertex_colors)
+
+        chunks.append(chunk)
+
+    if not chunks:
+        return None
+
+    log("create_mesh_chunks", mesh, len(chunks))
+    return rpr_context.create_mesh_chunks(object.key(obj), chunks)
+
+
+def get_mesh_data(rpr_context: RPRContext, obj: bpy.types.Object, mesh: bpy.types.Mesh,
+                  data_key, mesh_data_pool: MeshDataPool = None):
+    if mesh_data_pool:
+        return mesh_data_pool.get(data_key, obj, mesh)
+
+    return init_mesh_data(obj, mesh, use_polygons(rpr_context))
+
+
+def get_master_mesh(rpr_context: RPRContext, obj: bpy.types.Object, mesh: bpy.types.Mesh,
+                    mesh_data_pool: MeshDataPool = None):
+    """ Returns hidden master mesh of linked duplicates, mesh data is exported only once """
+
+    mesh_key = master_key(mesh)
+    rpr_mesh = rpr_context.master_meshes.get(mesh_key, None)
+    if rpr_mesh:
+        return rpr_mesh
+
+    data = get_mesh_data(rpr_context, obj, mesh, ('master', mesh_key), mesh_data_pool)
+    if not data:
+        return None
+
+    rpr_mesh = rpr_context.create_master_mesh(
+        mesh_key,
+        data.vertices, data.normals, data.uvs,
+        data.vertex_indices, data.normal_indices, data.uv_indices,
+        data.num_face_vertices
+    )
+    rpr_mesh.set_name(mesh.name)
+
+    if data.vertex_colors is not None:
+        rpr_mesh.set_vertex_colors(data.vertex_colors)
+
+    return rpr_mesh
+
+
 def sync(rpr_context: RPRContext, obj: bpy.types.Object, **kwargs):
     """ Creates pyrpr.Shape from obj.data:bpy.types.Mesh """
 
@@ -307,29 +1044,52 @@ def sync(rpr_context: RPRContext, obj: bpy.types.Object, **kwargs):
     material_override = kwargs.get("material_override", None)
     indirect_only = kwargs.get("indirect_only", False)
     use_contour = kwargs.get("use_contour", False)
+    # prepared data is used only for obj.data, other meshes are not queued by pool
+    mesh_data_pool = kwargs.get("mesh_data_pool", None) if "mesh" not in kwargs else None
     log("sync", mesh, obj, "IndirectOnly" if indirect_only else "")
 
     obj_key = object.key(obj)
-    data = MeshData.init_from_mesh(mesh, obj=obj)
-    if not data:
-        rpr_context.create_empty_object(obj_key)
-        return
+    if "mesh" not in kwargs and is_linked_duplicate(obj, mesh):
+        # linked duplicate is an instance of master mesh with its own transform, materials and visibility
+        rpr_mesh = get_master_mesh(rpr_context, obj, mesh, mesh_data_pool)
+        if not rpr_mesh:
+            rpr_context.create_empty_object(obj_key)
+            return
+
+        rpr_shape = rpr_context.create_instance(obj_key, rpr_mesh)
+
+    elif is_chunked_mesh(mesh):
+        rpr_shape = create_mesh_chunks(rpr_context, obj, mesh)
+        if not rpr_shape:
+            rpr_context.create_empty_object(obj_key)
+            return
+
+    else:
+        data = get_mesh_data(rpr_context, obj, mesh, ('object', obj_key), mesh_data_pool)
+        if not data:
+            rpr_context.create_empty_object(obj_key)
+            return
+
+        rpr_shape = rpr_context.create_mesh(
+            obj_key,
+            data.vertices, data.normals, data.uvs,
+            data.vertex_indices, data.normal_indices, data.uv_indices,
+            data.num_face_vertices
+        )
+
+        if data.vertex_colors is not None:
+            rpr_shape.set_vertex_colors(data.vertex_colors)
 
-    rpr_shape = rpr_context.create_mesh(
-        obj_key,
-        data.vertices, data.normals, data.uvs,
-        data.vertex_indices, data.normal_indices, data.uv_indices,
-        data.num_face_vertices
-    )
     rpr_shape.set_name(obj.name)
     rpr_shape.set_id(obj.pass_index)
     rpr_context.set_aov_index_lookup(obj.pass_index, obj.pass_index,
                                      obj.pass_index, obj.pass_index, 1.0)
 
-    if data.vertex_colors is not None:
-        rpr_shape.set_vertex_colors(data.vertex_colors)
-
     assign_materials(rpr_context, rpr_shape, obj, material_override)
+    if kwargs.get("track_deformation", False) and "mesh" not in kwargs and \
+            isinstance(rpr_shape, pyrpr.Mesh) and not isinstance(rpr_shape, pyrpr.MeshChunks):
+        rpr_context.mesh_deformations[obj_key] = MeshDeformation.init(
+            rpr_context, obj, mesh, data, material_override)
 
     rpr_context.scene.attach(rpr_shape)
     rpr_shape.set_transform(object.get_transform(obj))
@@ -347,8 +1107,16 @@ def sync_update(rpr_context: RPRContext, obj: bpy.types.Object, is_updated_geome
     rpr_shape = rpr_context.objects.get(obj_key, None)
     if rpr_shape:
         if is_updated_geometry:
+            if sync_deformation(rpr_context, obj, rpr_shape, **kwargs):
+                return True
+
             rpr_context.remove_object(obj_key)
-            sync(rpr_context, obj)
+            if is_linked_duplicate(obj, mesh):
+                # shared mesh data is exported again only by the first updated user
+                rpr_context.expire_master_mesh(master_key(mesh))
+
+            # mesh geometry is updated, probably it will be deformed again
+            sync(rpr_context, obj, track_deformation=True, **kwargs)
             return True
 
         if is_updated_transform:
@@ -30,6 +30,28 @@ def get_transform(obj: bpy.types.Object):
     return np.array(obj.matrix_world, dtype=np.float32).reshape(4, 4)
 
 
+def ref(obj: bpy.types.Object) -> tuple:
+    """ Reference of original object, it is found by bpy.data.objects.get(ref) """
+    obj = obj.original
+    return obj.name, obj.library.filepath if obj.library else None
+
+
+def get_material_slots(obj: bpy.types.Object) -> dict:
+    """ Returns material name -> indices of object material slots """
+    material_slots = {}
+    for i, slot in enumerate(obj.material_slots):
+        if slot.material:
+            material_slots.setdefault(slot.material.name_full, []).append(i)
+
+    return {mat_name: tuple(indices) for mat_name, indices in material_slots.items()}
+
+
+def sync_material_slots(rpr_context, obj_key, obj: bpy.types.Object):
+    """ Registers materials in obj slots as used by exported object or instance obj_key """
+    if obj_key in rpr_context.objects:
+        rpr_context.set_material_slots((obj_key,), ref(obj), get_material_slots(obj))
+
+
 def sync(rpr_context, obj: bpy.types.Object, **kwargs):
     """ sync the object and any data attached """
 
@@ -71,6 +93,8 @@ def sync(rpr_context, obj: bpy.types.Object, **kwargs):
         if rpr_context.engine_type != RenderEngine.TYPE:
             particle.sync(rpr_context, obj)
 
+    sync_material_slots(rpr_context, key(obj), obj)
+
 
 def sync_update(rpr_context, obj: bpy.types.Object, is_updated_geometry, is_updated_transform, **kwargs):
     """ Updates existing rpr object. Checks obj.type and calls corresponded sync_update() """
@@ -105,4 +129,5 @@ def sync_update(rpr_context, obj: bpy.types.Object, is_updated_geometry, is_upda
         updated |= hair.sync_update(rpr_context, obj, is_updated_geometry, is_updated_transform)
         updated |= particle.sync_update(rpr_context, obj, is_updated_geometry, is_updated_transform)
 
+    sync_material_slots(rpr_context, key(obj), obj)
     return updated
@@ -15,7 +15,6 @@
 import numpy as np
 
 import bpy
-import mathutils
 
 from . import mesh, material, object
 
@@ -23,6 +22,10 @@ from rprblender.utils import logging
 log = logging.Log(tag='export.particle')
 
 
+# Particle.alive_state is read by foreach_get as DNA value of ParticleData.alive
+PARTICLE_ALIVE = bpy.types.Particle.bl_rna.properties['alive_state'].enum_items['ALIVE'].value
+
+
 def key(p_sys: bpy.types.ParticleSystem, emitter: bpy.types.Object):
     return (object.key(emitter), p_sys.name)
 
@@ -58,17 +61,78 @@ def emitter_p_sys(emitter):
     return (p_sys for p_sys in emitter.particle_systems if p_sys.settings.type == 'EMITTER')
 
 
-def sync(rpr_context, emitter: bpy.types.Object):
-    """ sync the particle system """
+def get_particles_attribute(particles, name, size):
+    data = np.empty(len(particles) * size, dtype=np.float32)
+    particles.foreach_get(name, data)
+    return data.reshape(-1, size)
+
+
+def get_transforms(locations: np.array, rotations: np.array, sizes: np.array):
+    """
+    Returns (N, 4, 4) array of Translation(location) @ Quaternion(rotation) @ Scale(size)
+    matrices of particles, rotations are unit quaternions (w, x, y, z)
+    """
+    w, x, y, z = rotations.T
+    transforms = np.zeros((len(locations), 4, 4), dtype=np.float32)
+    transforms[:, 0, 0] = 1.0 - 2.0 * (y * y + z * z)
+    transforms[:, 0, 1] = 2.0 * (x * y - w * z)
+    transforms[:, 0, 2] = 2.0 * (x * z + w * y)
+    transforms[:, 1, 0] = 2.0 * (x * y + w * z)
+    transforms[:, 1, 1] = 1.0 - 2.0 * (x * x + z * z)
+    transforms[:, 1, 2] = 2.0 * (y * z - w * x)
+    transforms[:, 2, 0] = 2.0 * (x * z - w * y)
+    transforms[:, 2, 1] = 2.0 * (y * z + w * x)
+    transforms[:, 2, 2] = 1.0 - 2.0 * (x * x + y * y)
+    transforms[:, :3, :3] *= sizes[:, np.newaxis]
+    transforms[:, :3, 3] = locations
+    transforms[:, 3, 3] = 1.0
+    return transforms
+
+
+def export_instances(rpr_context, particle_key, master_shape, transforms: np.array):
+    """
+    Sets transforms to instances of master_shape with keys (particle_key, i). Existing instances
+    are reused as a pool, only missing instances are created and extra ones are removed.
+    Returns instances list.
+    """
+    count = len(transforms)
+    prev_count = len(rpr_context.child_object_keys.get(particle_key, ()))
+
+    instances = []
+    for i in range(min(count, prev_count)):
+        instance = rpr_context.objects[(particle_key, i)]
+        instance.set_transform(transforms[i])
+        instances.append(instance)
+
+    if count > prev_count:
+        keys = [(particle_key, i) for i in range(prev_count, count)]
+        new_instances = rpr_context.create_instances(
+            keys, master_shape, transforms[prev_count:], [str(instance_key) for instance_key in keys],
+            (('set_visibility', (True,)),)
+        )
+        for instance in new_instances:
+            rpr_context.scene.attach(instance)
 
-    for p_sys in emitter_p_sys(emitter):
-        if p_sys.settings.render_type != 'HALO':
-            log.warn("Skipping particle system type", p_sys.settings.render_type, p_sys, emitter)
-            return
+        instances.extend(new_instances)
 
-        log("sync", p_sys, emitter)
+    for i in range(count, prev_count):
+        rpr_context.remove_object((particle_key, i))
 
-        particle_key = key(p_sys, emitter)
+    return instances
+
+
+def sync_particle_system(rpr_context, p_sys: bpy.types.ParticleSystem, emitter: bpy.types.Object):
+    """ Exports alive particles as instances of master shape, already exported ones are updated """
+
+    log("sync", p_sys, emitter)
+
+    particle_key = key(p_sys, emitter)
+
+    master_shape = rpr_context.objects.get(particle_key, None)
+    if not master_shape:
+        # instances of removed master shape could be left by removed emitter
+        for instance_key in tuple(rpr_context.child_object_keys.get(particle_key, ())):
+            rpr_context.remove_object(instance_key)
 
         # make master object for render type
         master_shape = create_sphere_master(rpr_context, particle_key)
@@ -77,45 +141,74 @@ def sync(rpr_context, emitter: bpy.types.Object):
         rpr_context.scene.attach(master_shape)
         master_shape.set_visibility(False)
 
-        # add the material to master
-        rpr_material = get_particle_system_material(rpr_context, p_sys, emitter)
-        if rpr_material:
-            master_shape.set_material(rpr_material)
-
-        # walk through particle list and create rpr_instances of ones that are ALIVE
-        for i, particle in p_sys.particles.items():
-            if not particle.alive_state == 'ALIVE':
-                continue
+    # add the material to master
+    rpr_material = get_particle_system_material(rpr_context, p_sys, emitter)
+    if rpr_material or master_shape.materials:
+        master_shape.set_material(rpr_material)
+
+    # only ALIVE particles are exported, their data is read at once
+    particles = p_sys.particles
+    alive_states = np.empty(len(particles), dtype=np.int32)
+    particles.foreach_get('alive_state', alive_states)
+    is_alive = alive_states == PARTICLE_ALIVE
+
+    locations = get_particles_attribute(particles, 'location', 3)[is_alive]
+    transforms = get_transforms(locations,
+                                get_particles_attribute(particles, 'rotation', 4)[is_alive],
+                                get_particles_attribute(particles, 'size', 1)[is_alive])
+
+    instances = export_instances(rpr_context, particle_key, master_shape, transforms)
+
+    # do motion blur.
+    if rpr_context.do_motion_blur and instances:
+        prev_locations = get_particles_attribute(particles, 'prev_location', 3)[is_alive]
+        if hasattr(instances[0], 'set_motion_transform'):
+            prev_transforms = transforms.copy()
+            prev_transforms[:, :3, 3] = prev_locations
+            for instance, prev_transform in zip(instances, prev_transforms):
+                instance.set_motion_transform(prev_transform)
+        else:
+            for instance, velocity in zip(instances, (locations - prev_locations).tolist()):
+                instance.set_linear_motion(*velocity)
+
+        # TODO angular motion doesn't work right.
+        #rotation = (particle.rotation[i] - particle.prev_rotation[i] for i in range(4))
+        #instance.set_angular_motion(*rotation)
 
-            instance_key = (particle_key, i)
-            instance = rpr_context.create_instance(instance_key, master_shape)
 
-            loc = mathutils.Matrix.Translation(particle.location)
-            scale = mathutils.Matrix.Scale(particle.size, 4)
-            rot = mathutils.Quaternion(particle.rotation)
-            mat = np.array(loc @ rot.to_matrix().to_4x4() @ scale, dtype=np.float32).reshape(4, 4)
-
-            rpr_context.scene.attach(instance)
-            instance.set_transform(mat)
-            instance.set_visibility(True)
+def sync(rpr_context, emitter: bpy.types.Object):
+    """ sync the particle system """
 
-            # do motion blur.
-            if rpr_context.do_motion_blur:
-                if hasattr(instance, 'set_motion_transform'):
-                    prev_loc = mathutils.Matrix.Translation(particle.prev_location)
-                    prev_mat = np.array(prev_loc @ rot.to_matrix().to_4x4() @ scale, dtype=np.float32)\
-                        .reshape(4, 4)
-                    instance.set_motion_transform(prev_mat)
-                else:
-                    velocity = (particle.location[i] - particle.prev_location[i] for i in range(3))
-                    instance.set_linear_motion(*velocity)
+    for p_sys in emitter_p_sys(emitter):
+        if p_sys.settings.render_type != 'HALO':
+            log.warn("Skipping particle system type", p_sys.settings.render_type, p_sys, emitter)
+            continue
 
-                # TODO angular motion doesn't work right.
-                #rotation = (particle.rotation[i] - particle.prev_rotation[i] for i in range(4))
-                #instance.set_angular_motion(*rotation)
+        sync_particle_system(rpr_context, p_sys, emitter)
 
 
 def sync_update(rpr_context, emitter: bpy.types.Object,
                 is_updated_geometry, is_updated_transform):
-    # TODO: Implement sync_update
-    return False
+    """ Updates particles of emitter, instances of exported particles are reused """
+
+    updated = False
+    for p_sys in emitter_p_sys(emitter):
+        particle_key = key(p_sys, emitter)
+        if p_sys.settings.render_type != 'HALO':
+            if particle_key in rpr_context.objects:
+                rpr_context.remove_object(particle_key)
+                updated = True
+
+            continue
+
+        sync_particle_system(rpr_context, p_sys, emitter)
+        updated = True
+
+    # master shapes and instances of particle systems removed from emitter
+    p_sys_names = {p_sys.name for p_sys in emitter_p_sys(emitter)}
+    for particle_key in tuple(rpr_context.child_object_keys.get(object.key(emitter), ())):
+        if isinstance(particle_key[1], str) and particle_key[1] not in p_sys_names:
+            rpr_context.remove_object(particle_key)
+            updated = True
+
+    return updated
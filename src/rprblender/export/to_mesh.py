@@ -58,7 +58,7 @@ def sync_update(rpr_context, obj: bpy.types.Object, is_updated_geometry, is_upda
 
     if is_updated_geometry:
         rpr_context.remove_object(obj_key)
-        sync(rpr_context, obj)
+        sync(rpr_context, obj, **kwargs)
         return True
 
     if is_updated_transform:
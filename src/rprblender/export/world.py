@@ -12,7 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #********************************************************************
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields, astuple
 from typing import Tuple
 
 import numpy as np
@@ -25,8 +25,11 @@ import pyrpr
 
 from . import image
 from .image import ImagePixels
+from rprblender import config, utils
 from rprblender.engine.context import RPRContext
 from rprblender.utils import helper_lib
+from rprblender.utils.file_cache import FileCache
+from rprblender.utils.sky_cache import SkyImageCache
 
 from rprblender.utils import logging
 log = logging.Log(tag='export.world')
@@ -34,6 +37,33 @@ log = logging.Log(tag='export.world')
 
 WARNING_IMAGE_NOT_DEFINED_COLOR = (1.0, 0.0, 1.0)
 STUDIO_LIGHT_DEFAULT_COLOR = (0.051, 0.051, 0.051)  # Blender's default background color in viewport
+SKY_IMAGE_KEY = "RPR.SunSky"
+
+_sky_image_cache: SkyImageCache = None
+
+
+def generate_sky_image(params) -> np.array:
+    """ Generates Sun & Sky image by WorldData.SunSkyData parameters tuple """
+    data = WorldData.SunSkyData.from_tuple(params)
+
+    helper_lib.set_sun_horizontal_coordinate(data.azimuth, data.altitude)
+    helper_lib.set_sky_params(
+        data.turbidity, data.sun_glow, data.sun_disc,
+        data.horizon_height, data.horizon_blur, data.saturation,
+        data.filter_color, data.ground_color
+    )
+
+    return helper_lib.generate_sky_image(data.resolution, data.resolution)
+
+
+def get_sky_image_cache() -> SkyImageCache:
+    global _sky_image_cache
+    if not _sky_image_cache:
+        file_cache = FileCache(utils.get_cache_dir() / "sky", config.sky_image_cache_max_size) \
+            if config.sky_image_cache_max_size else None
+        _sky_image_cache = SkyImageCache(generate_sky_image, file_cache=file_cache)
+
+    return _sky_image_cache
 
 
 def set_light_image(rpr_context, rpr_light, image_name):
@@ -193,6 +223,14 @@ class WorldData:
             self.filter_color = tuple(sun_sky.filter_color)
             self.ground_color = tuple(sun_sky.ground_color)
 
+        @staticmethod
+        def from_tuple(params):
+            data = object.__new__(WorldData.SunSkyData)
+            for f, value in zip(fields(WorldData.SunSkyData), params):
+                setattr(data, f.name, value)
+
+            return data
+
         def export(self, rpr_context, rotation):
             remove_environment_overrides(rpr_context)
 
@@ -201,15 +239,20 @@ class WorldData:
                 rpr_light = rpr_context.create_environment_light()
                 rpr_context.scene.add_environment_light(rpr_light)
 
-            helper_lib.set_sun_horizontal_coordinate(self.azimuth, self.altitude)
-            helper_lib.set_sky_params(
-                self.turbidity, self.sun_glow, self.sun_disc,
-                self.horizon_height, self.horizon_blur, self.saturation,
-                self.filter_color, self.ground_color
-            )
+            # pyrpr image of current sky is kept in rpr_context and reused until parameters change
+            params = astuple(self)
+            image_key = (SKY_IMAGE_KEY, params)
+            rpr_image = rpr_context.images.get(image_key)
+            if not rpr_image:
+                for key in tuple(key for key in rpr_context.images if key[0] == SKY_IMAGE_KEY):
+                    del rpr_context.images[key]
+
+                im = get_sky_image_cache().get(params)
+                if im is None:
+                    log.warn("Sky image generation failed", self)
+                    return
 
-            im = helper_lib.generate_sky_image(self.resolution, self.resolution)
-            rpr_image = rpr_context.create_image_data(None, im)
+                rpr_image = rpr_context.create_image_data(image_key, im)
 
             rpr_light.set_image(rpr_image)
             set_light_rotation(rpr_light, (rotation[0], rotation[1], rotation[2] + self.azimuth))
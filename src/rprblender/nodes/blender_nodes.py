@@ -73,9 +73,9 @@ class ShaderNodeOutputMaterial(BaseNodeParser):
                 return rpr_node
 
             # checking if we have connected node to Volume socket
-            volume_rpr_node = material.sync(self.rpr_context, self.material, 'Volume')
+            volume_rpr_node = material.sync(self.rpr_context.target, self.material, 'Volume')
             if volume_rpr_node:
-                if isinstance(self.rpr_context, RPRContextHybrid):
+                if isinstance(self.rpr_context.target, RPRContextHybrid):
                     return self.create_node(pyrpr.MATERIAL_NODE_UBERV2, {
                         pyrpr.MATERIAL_INPUT_UBER_DIFFUSE_WEIGHT: 0.0,
                         pyrpr.MATERIAL_INPUT_UBER_TRANSPARENCY: (1.0, 1.0, 1.0),
@@ -110,7 +110,7 @@ class ShaderNodeOutputMaterial(BaseNodeParser):
 
             if input_socket_key == 'Surface':
                 # creating error shader
-                if isinstance(self.rpr_context, RPRContextHybrid):
+                if isinstance(self.rpr_context.target, RPRContextHybrid):
                     return self.create_node(pyrpr.MATERIAL_NODE_UBERV2, {
                         pyrpr.MATERIAL_INPUT_UBER_DIFFUSE_COLOR: ERROR_OUTPUT_COLOR
                     })
@@ -701,16 +701,7 @@ class ShaderNodeBsdfPrincipled(NodeParser):
             if val is None:
                 return False
 
-            if isinstance(val.data, float) and math.isclose(val.data, 0.0):
-                return False
-
-            if isinstance(val.data, tuple) and \
-               math.isclose(val.data[0], 0.0) and \
-               math.isclose(val.data[1], 0.0) and \
-               math.isclose(val.data[2], 0.0):
-                return False
-
-            return True
+            return not val.is_zero()
 
         # Getting require inputs. Note: if some inputs are not needed they won't be taken
         base_color = self.get_input_value('Base Color')
@@ -1960,7 +1951,13 @@ class NodeGroupInput(BaseNodeParser):
 
         # Some sockets can have no default value. Check if we got one
         if hasattr(socket_in, 'default_value'):
-            return self._parse_val(socket_in.default_value)
+            if self.params is None:
+                return self._parse_val(socket_in.default_value)
+
+            # value of group node socket could be set to node inside of group as is
+            item = self._socket_item(socket_in, self.group_nodes[-1], self.group_nodes[:-1])
+            self.params.pass_item(item)
+            return item.value
 
         return None
 
@@ -0,0 +1,290 @@
+#**********************************************************************
+# Copyright 2020 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#********************************************************************
+"""
+Intermediate representation (IR) of exported material.
+
+Node parsers export material to MaterialCompiler instead of RPR context. It records material
+nodes with their inputs, constants, images and buffers without creating anything in RPR core.
+Compiled MaterialIR is plain data, it could be serialized, compared and instantiated later
+by emit() in RPR context of any type: RPR 1, RPR 2 or Hybrid.
+"""
+import weakref
+
+import numpy as np
+
+import bpy
+import pyrpr
+
+from rprblender.export import image
+
+from rprblender.utils import logging
+log = logging.Log(tag='export.node')
+
+
+class IRNode(pyrpr.MaterialNode):
+    """ Recorded material node, it has no core object """
+
+    def __init__(self, material_type):
+        self.type = material_type
+        self.inputs = {}
+        self.name = None
+
+        # node key without material key, it is used as node name in RPR
+        self.key = None
+
+    def delete(self):
+        pass
+
+    def set_name(self, name):
+        # RPR node gets name by key on emission, see emit()
+        pass
+
+    def set_input(self, name, value):
+        if not isinstance(value, (IRNode, IRImage, IRBuffer, int, float)) and \
+                not (isinstance(value, tuple) and len(value) in (3, 4)):
+            raise TypeError("Incorrect type for MaterialNodeSetInput*", self, name, value)
+
+        self.inputs[name] = value
+
+    def set_id(self, id):
+        raise TypeError("Material id is set to emitted material node", self, id)
+
+
+class IRImage(pyrpr.Image):
+    """ Reference to image which is exported by image.sync() on emission """
+
+    def __init__(self, key):
+        self.key = key      # image key, see image.key()
+        self.wrap = None
+        self.name = None
+
+    def delete(self):
+        pass
+
+    def set_name(self, name):
+        pass
+
+    def set_gamma(self, gamma):
+        # gamma is set by image.sync() by image color space
+        pass
+
+    def set_wrap(self, wrap_type):
+        self.wrap = wrap_type
+
+
+class IRBuffer(pyrpr.Buffer):
+    """ Recorded buffer data """
+
+    def __init__(self, data: np.ndarray, element_type):
+        self.data = data
+        self.element_type = element_type
+        self.name = None
+
+    def delete(self):
+        pass
+
+
+class IRImages(dict):
+    """
+    Images of MaterialCompiler by key. Images are not exported while material is compiled,
+    so any image is available here as its reference.
+    """
+
+    def __contains__(self, key):
+        return True
+
+    def __missing__(self, key):
+        ir_image = self[key] = IRImage(key)
+        return ir_image
+
+
+class MaterialCompiler:
+    """
+    Compile target of node parsers, it replaces RPR context. Parsers export some nodes differently
+    for RPR context types, therefore compiled material depends on type of target context.
+    """
+
+    def __init__(self, target):
+        self.target = target
+
+        self.material_nodes = {}
+        self.images = IRImages()
+        # (material type, inputs) -> alive NodeExpr of arithmetic nodes of compiled material
+        self.node_exprs = weakref.WeakValueDictionary()
+
+    def create_material_node(self, material_type):
+        return IRNode(material_type)
+
+    def set_material_node_key(self, key, material_node):
+        self.material_nodes[key] = material_node
+        material_node.key = key[1:]
+
+    def create_buffer(self, data, dtype):
+        return IRBuffer(data, dtype)
+
+
+class MaterialIR:
+    """
+    Compiled material: nodes in order of creation, every node is placed after nodes it uses.
+    The last node is the material root, IR without nodes is an empty material.
+    """
+
+    def __init__(self, nodes=()):
+        self.nodes = tuple(nodes)
+
+    @classmethod
+    def from_root(cls, root: [IRNode, None]):
+        """ Returns IR of root node and all nodes it depends on """
+        if not isinstance(root, IRNode):
+            return cls()
+
+        # depth first search without recursion, material could have long chains of nodes
+        nodes = []
+        visited = {root}
+        stack = [(root, iter(root.inputs.values()))]
+        while stack:
+            node, values = stack[-1]
+            for value in values:
+                if isinstance(value, IRNode) and value not in visited:
+                    visited.add(value)
+                    stack.append((value, iter(value.inputs.values())))
+                    break
+            else:
+                stack.pop()
+                nodes.append(node)
+
+        return cls(nodes)
+
+    @property
+    def root(self) -> [IRNode, None]:
+        return self.nodes[-1] if self.nodes else None
+
+    def to_dict(self) -> dict:
+        """ Returns JSON serializable representation of IR """
+        indices = {node: i for i, node in enumerate(self.nodes)}
+
+        def value_to_dict(value):
+            if isinstance(value, IRNode):
+                return {'node': indices[value]}
+            if isinstance(value, IRImage):
+                return {'image': to_list(value.key), 'wrap': value.wrap}
+            if isinstance(value, IRBuffer):
+                return {'buffer': value.data.tolist(), 'dtype': value.data.dtype.str,
+                        'element_type': value.element_type}
+            if isinstance(value, tuple):
+                return list(value)
+            return value
+
+        return {'nodes': [{
+            'type': node.type,
+            'key': to_list(node.key),
+            'inputs': [[name, value_to_dict(value)] for name, value in node.inputs.items()],
+        } for node in self.nodes]}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """ Creates IR from representation returned by to_dict() """
+        nodes = []
+        images = {}
+
+        def value_from_dict(value):
+            if isinstance(value, list):
+                return tuple(value)
+            if not isinstance(value, dict):
+                return value
+
+            if 'node' in value:
+                return nodes[value['node']]
+            if 'image' in value:
+                image_key = to_tuple(value['image'])
+                ir_image = images.get(image_key)
+                if ir_image is None:
+                    ir_image = images[image_key] = IRImage(image_key)
+                ir_image.wrap = value['wrap']
+                return ir_image
+
+            return IRBuffer(np.array(value['buffer'], dtype=value['dtype']), value['element_type'])
+
+        for node_data in data['nodes']:
+            node = IRNode(node_data['type'])
+            node.key = to_tuple(node_data['key'])
+            for name, value in node_data['inputs']:
+                node.set_input(name, value_from_dict(value))
+
+            nodes.append(node)
+
+        return cls(nodes)
+
+
+def to_list(value):
+    """ Converts nested tuples to lists """
+    return [to_list(v) for v in value] if isinstance(value, tuple) else value
+
+
+def to_tuple(value):
+    """ Converts nested lists to tuples """
+    return tuple(to_tuple(v) for v in value) if isinstance(value, list) else value
+
+
+def emit_image(rpr_context, ir_image: IRImage):
+    # key[0] is image reference of image.get_reference(), it distinguishes linked images
+    blender_image = bpy.data.images.get(ir_image.key[0])
+    if not blender_image:
+        log.warn("Image not found", ir_image.key)
+        return None
+
+    frame_number = ir_image.key[2] if len(ir_image.key) > 2 else None
+    rpr_image = image.sync(rpr_context, blender_image, ir_image.key[1], frame_number)
+    if rpr_image and ir_image.wrap is not None:
+        rpr_image.set_wrap(ir_image.wrap)
+
+    return rpr_image
+
+
+def emit(ir: MaterialIR, rpr_context, material_key) -> dict:
+    """
+    Creates material nodes of IR in rpr_context, returns dict IR object -> created RPR object.
+    Differences of RPR context types are handled by context itself: e.g. Hybrid context replaces
+    unsupported nodes by empty ones and doesn't create buffers.
+    """
+    emitted = {}
+
+    def emit_value(value):
+        if isinstance(value, IRNode):
+            return emitted[value]
+
+        if isinstance(value, (IRImage, IRBuffer)):
+            rpr_value = emitted.get(value)
+            if rpr_value is None:
+                rpr_value = emitted[value] = emit_image(rpr_context, value) \
+                    if isinstance(value, IRImage) else \
+                    rpr_context.create_buffer(value.data, value.element_type)
+            return rpr_value
+
+        return value
+
+    for node in ir.nodes:
+        rpr_node = rpr_context.create_material_node(node.type)
+        for name, value in node.inputs.items():
+            rpr_value = emit_value(value)
+            if rpr_value is not None:
+                rpr_node.set_input(name, rpr_value)
+
+        if node.key:
+            rpr_node.set_name(str((material_key, *node.key)))
+
+        emitted[node] = rpr_node
+
+    return emitted
@@ -15,12 +15,158 @@
 import math
 
 import pyrpr
+from rprblender import config
 from rprblender.engine import context_hybrid
 
 from rprblender.utils import logging
 log = logging.Log(tag='export.node')
 
 
+class NodeExpr:
+    """
+    Arithmetic or blend node which is not created yet. Node is created by create() only when it is
+    used by real material node, so nodes which are not used by material are never created.
+    Expressions are hash-consed by compiler of material: expressions with the same type and inputs
+    are the same object while it is alive, therefore equal subexpressions are created as one
+    material node.
+    """
+    __slots__ = ('rpr_context', 'material_type', 'inputs', 'rpr_node', '__weakref__')
+
+    # numbers of requested and created nodes, they are used for material export report
+    requested_count = 0
+    created_count = 0
+
+    def __init__(self, rpr_context, material_type, inputs):
+        self.rpr_context = rpr_context
+        self.material_type = material_type
+        self.inputs = inputs    # ((input name, value), ...)
+        self.rpr_node = None
+
+    @classmethod
+    def get(cls, rpr_context, material_type, *inputs):
+        """
+        Returns existing equal expression or new one.
+        Expressions are stored in rpr_context.node_exprs, they are shared only by nodes
+        of one compiled material.
+        """
+        NodeExpr.requested_count += 1
+        if not config.material_optimize_nodes:
+            return cls(rpr_context, material_type, inputs)
+
+        expr_key = (material_type, inputs)
+        expr = rpr_context.node_exprs.get(expr_key)
+        if expr is None:
+            expr = cls(rpr_context, material_type, inputs)
+            rpr_context.node_exprs[expr_key] = expr
+
+        return expr
+
+    def create(self):
+        """ Creates material node with its inputs if it isn't created yet """
+        if self.rpr_node is None:
+            rpr_node = self.rpr_context.create_material_node(self.material_type)
+            for name, value in self.inputs:
+                rpr_node.set_input(name, value.create() if isinstance(value, NodeExpr) else value)
+
+            self.rpr_node = rpr_node
+            NodeExpr.created_count += 1
+
+        return self.rpr_node
+
+
+def is_value(data, value: float):
+    """ Checks if data is constant float value or vector of 4 such values """
+    if isinstance(data, float):
+        return data == value
+
+    return isinstance(data, tuple) and len(data) == 4 and all(d == value for d in data)
+
+
+def is_same(data0, data1):
+    """ Checks if data are the same node or equal constants """
+    return data0 is data1 or \
+        (isinstance(data0, (float, tuple)) and type(data0) == type(data1) and data0 == data1)
+
+
+def to_node_output(data):
+    """
+    Returns simplified data as output value of node which it replaces.
+    3 component vector input of node is set as (x, y, z, 1.0), so constant gets w = 1.0.
+    """
+    if isinstance(data, tuple) and len(data) == 3:
+        return (*data, 1.0)
+
+    return data
+
+
+def simplify_arithmetic(rpr_operation, data0, data1=None, data2=None):
+    """
+    Returns data equal to result of arithmetic operation or None if it can't be simplified.
+    Float input of node is set to all 4 channels, therefore float and vec4 identities are the same.
+    """
+    if not config.material_optimize_nodes:
+        return None
+
+    if rpr_operation == pyrpr.MATERIAL_NODE_OP_ADD:
+        if is_value(data1, 0.0):
+            return data0
+        if is_value(data0, 0.0):
+            return data1
+
+    elif rpr_operation == pyrpr.MATERIAL_NODE_OP_SUB:
+        if is_value(data1, 0.0):
+            return data0
+
+    elif rpr_operation == pyrpr.MATERIAL_NODE_OP_MUL:
+        if is_value(data1, 1.0):
+            return data0
+        if is_value(data0, 1.0):
+            return data1
+        if is_value(data0, 0.0) or is_value(data1, 0.0):
+            return 0.0
+
+    elif rpr_operation in (pyrpr.MATERIAL_NODE_OP_DIV, pyrpr.MATERIAL_NODE_OP_POW):
+        if is_value(data1, 1.0):
+            return data0
+
+    elif rpr_operation in (pyrpr.MATERIAL_NODE_OP_MIN, pyrpr.MATERIAL_NODE_OP_MAX):
+        if is_same(data0, data1):
+            return data0
+
+    elif rpr_operation == pyrpr.MATERIAL_NODE_OP_TERNARY:
+        if is_same(data1, data2):
+            return data1
+
+    return None
+
+
+def simplify_blend(weight, data0, data1):
+    """ Returns data equal to blend_value node result or None, blend_value is linear interpolation """
+    if not config.material_optimize_nodes:
+        return None
+
+    if is_value(weight, 0.0) or is_same(data0, data1):
+        return data0
+    if is_value(weight, 1.0):
+        return data1
+
+    return None
+
+
+def is_zero_value(data) -> bool:
+    """ Check if numerical data is close to zero """
+    if isinstance(data, float) and math.isclose(data, 0.0):
+        return True
+
+    if isinstance(data, tuple) and \
+       math.isclose(data[0], 0.0) and \
+       math.isclose(data[1], 0.0) and \
+       math.isclose(data[2], 0.0):
+        return True
+
+    return False
+
+
 class NodeItem:
     ''' This class is a wrapper used for doing operations on material nodes.
         rpr_context is referenced to create new nodes 
@@ -33,15 +179,44 @@ class NodeItem:
         NodeItems can retrieve their data with () operator, or index RGBA etc with []
         '''
     
-    def __init__(self, rpr_context, data: [tuple, float, pyrpr.MaterialNode]):
+    def __init__(self, rpr_context, data: [tuple, float, pyrpr.MaterialNode, NodeExpr]):
         # save the data as vec4 if num data
-        self.data = data
+        self._data = data
         self.rpr_context = rpr_context
 
+    @property
+    def data(self):
+        """ Returns float, tuple or material node, node of expression is created here """
+        if isinstance(self._data, NodeExpr):
+            return self._data.create()
+
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+
     def set_input(self, name, value):
-        if value is not None:
+        if isinstance(value, SocketNodeItem):
+            value.set_to_input(self.data, name)
+        elif value is not None:
             self.data.set_input(name, value.data if isinstance(value, NodeItem) else value)
 
+    def _arithmetic(self, rpr_operation, data0, data1=None, data2=None):
+        """ Returns simplified data or expression of arithmetic node """
+        result_data = simplify_arithmetic(rpr_operation, data0, data1, data2)
+        if result_data is not None:
+            NodeExpr.requested_count += 1
+            return to_node_output(result_data)
+
+        inputs = [(pyrpr.MATERIAL_INPUT_OP, rpr_operation), (pyrpr.MATERIAL_INPUT_COLOR0, data0)]
+        if data1 is not None:
+            inputs.append((pyrpr.MATERIAL_INPUT_COLOR1, data1))
+        if data2 is not None:
+            inputs.append((pyrpr.MATERIAL_INPUT_COLOR2, data2))
+
+        return NodeExpr.get(self.rpr_context, pyrpr.MATERIAL_NODE_ARITHMETIC, *inputs)
+
     ###### MATH OPS ######
     def _arithmetic_helper(self, other, rpr_operation, func):
         ''' helper function for overridden math functions.
@@ -49,22 +224,20 @@ class NodeItem:
             if one of the operands has node data, else maps the function to data '''
 
         if other is None:
-            if isinstance(self.data, float):
-                result_data = func(self.data)
-            elif isinstance(self.data, tuple):
-                result_data = tuple(map(func, self.data))
+            if isinstance(self._data, float):
+                result_data = func(self._data)
+            elif isinstance(self._data, tuple):
+                result_data = tuple(map(func, self._data))
             else:
-                result_data = self.rpr_context.create_material_node(pyrpr.MATERIAL_NODE_ARITHMETIC)
-                result_data.set_input(pyrpr.MATERIAL_INPUT_OP, rpr_operation)
-                result_data.set_input(pyrpr.MATERIAL_INPUT_COLOR0, self.data)
+                result_data = self._arithmetic(rpr_operation, self._data)
 
         else:
-            other_data = other.data if isinstance(other, NodeItem) else other
-            if isinstance(self.data, (float, tuple)) and isinstance(other_data, (float, tuple)):
-                if isinstance(self.data, float) and isinstance(other_data, float):
-                    result_data = func(self.data, other_data)
+            other_data = other._data if isinstance(other, NodeItem) else other
+            if isinstance(self._data, (float, tuple)) and isinstance(other_data, (float, tuple)):
+                if isinstance(self._data, float) and isinstance(other_data, float):
+                    result_data = func(self._data, other_data)
                 else:
-                    data = self.data
+                    data = self._data
 
                     # converting data or other_data to have equal length
                     if isinstance(data, float):
@@ -79,10 +252,7 @@ class NodeItem:
                     result_data = tuple(map(func, data, other_data))
 
             else:
-                result_data = self.rpr_context.create_material_node(pyrpr.MATERIAL_NODE_ARITHMETIC)
-                result_data.set_input(pyrpr.MATERIAL_INPUT_OP, rpr_operation)
-                result_data.set_input(pyrpr.MATERIAL_INPUT_COLOR0, self.data)
-                result_data.set_input(pyrpr.MATERIAL_INPUT_COLOR1, other_data)
+                result_data = self._arithmetic(rpr_operation, self._data, other_data)
 
         return NodeItem(self.rpr_context, result_data)
 
@@ -176,10 +346,10 @@ class NodeItem:
                                        lambda a, b: float(a != b))
 
     def get_channel(self, key):
-        if isinstance(self.data, float):
-            result_data = self.data
-        elif isinstance(self.data, tuple):
-            result_data = self.data[key] if key < len(self.data) else 1.0
+        if isinstance(self._data, float):
+            result_data = self._data
+        elif isinstance(self._data, tuple):
+            result_data = self._data[key] if key < len(self._data) else 1.0
         else:
             rpr_key = {
                 0: pyrpr.MATERIAL_NODE_OP_SELECT_X,
@@ -188,58 +358,57 @@ class NodeItem:
                 3: pyrpr.MATERIAL_NODE_OP_SELECT_W,
             }[key]
 
-            result_data = self.rpr_context.create_material_node(pyrpr.MATERIAL_NODE_ARITHMETIC)
-            result_data.set_input(pyrpr.MATERIAL_INPUT_OP, rpr_key)
-            result_data.set_input(pyrpr.MATERIAL_INPUT_COLOR0, self.data)
+            result_data = self._arithmetic(rpr_key, self._data)
 
         return NodeItem(self.rpr_context, result_data)
 
     def dot3(self, other):
         dot = self._arithmetic_helper(other, pyrpr.MATERIAL_NODE_OP_DOT3, lambda a, b: a * b)
-        if isinstance(dot.data, float):
-            dot.data *= 3
-        elif isinstance(dot.data, tuple):
-            dot.data = sum(dot.data[:3])
+        if isinstance(dot._data, float):
+            dot._data *= 3
+        elif isinstance(dot._data, tuple):
+            dot._data = sum(dot._data[:3])
 
         return dot
 
     def dot4(self, other):
         dot = self._arithmetic_helper(other, pyrpr.MATERIAL_NODE_OP_DOT4, lambda a, b: a * b)
-        if isinstance(dot.data, float):
-            dot.data *= 4
-        elif isinstance(dot.data, tuple):
-            dot.data = sum(dot.data)
+        if isinstance(dot._data, float):
+            dot._data *= 4
+        elif isinstance(dot._data, tuple):
+            dot._data = sum(dot._data)
 
         return dot
 
     def if_else(self, if_value, else_value):
         ''' Construct an if - else RPR arithmetic node ''' 
         # we assume test is a NodeItem
-        if_data = if_value.data if isinstance(if_value, NodeItem) else if_value
-        else_data = else_value.data if isinstance(else_value, NodeItem) else else_value
+        if_data = if_value._data if isinstance(if_value, NodeItem) else if_value
+        else_data = else_value._data if isinstance(else_value, NodeItem) else else_value
 
-        if isinstance(self.data, float):
-            result_data = if_data if bool(self.data) else else_data
+        if isinstance(self._data, float):
+            result_data = if_data if bool(self._data) else else_data
         else:
-            result_data = self.rpr_context.create_material_node(pyrpr.MATERIAL_NODE_ARITHMETIC)
-            result_data.set_input(pyrpr.MATERIAL_INPUT_OP, pyrpr.MATERIAL_NODE_OP_TERNARY)
-            result_data.set_input(pyrpr.MATERIAL_INPUT_COLOR0, self.data)
-            result_data.set_input(pyrpr.MATERIAL_INPUT_COLOR1, if_data)
-            result_data.set_input(pyrpr.MATERIAL_INPUT_COLOR2, else_data)
+            result_data = self._arithmetic(pyrpr.MATERIAL_NODE_OP_TERNARY, self._data, if_data, else_data)
 
         return NodeItem(self.rpr_context, result_data)
 
     def blend(self, color0, color1):
-        if isinstance(self.rpr_context, context_hybrid.RPRContext):
+        if isinstance(self.rpr_context.target, context_hybrid.RPRContext):
             return self * color1 + (1.0 - self) * color0
 
-        data0 = color0.data if isinstance(color0, NodeItem) else color0
-        data1 = color1.data if isinstance(color1, NodeItem) else color1
+        data0 = color0._data if isinstance(color0, NodeItem) else color0
+        data1 = color1._data if isinstance(color1, NodeItem) else color1
 
-        result_data = self.rpr_context.create_material_node(pyrpr.MATERIAL_NODE_BLEND_VALUE)
-        result_data.set_input(pyrpr.MATERIAL_INPUT_WEIGHT, self.data)
-        result_data.set_input(pyrpr.MATERIAL_INPUT_COLOR0, data0)
-        result_data.set_input(pyrpr.MATERIAL_INPUT_COLOR1, data1)
+        result_data = simplify_blend(self._data, data0, data1)
+        if result_data is not None:
+            NodeExpr.requested_count += 1
+            result_data = to_node_output(result_data)
+        else:
+            result_data = NodeExpr.get(self.rpr_context, pyrpr.MATERIAL_NODE_BLEND_VALUE,
+                                       (pyrpr.MATERIAL_INPUT_WEIGHT, self._data),
+                                       (pyrpr.MATERIAL_INPUT_COLOR0, data0),
+                                       (pyrpr.MATERIAL_INPUT_COLOR1, data1))
 
         return NodeItem(self.rpr_context, result_data)
 
@@ -324,21 +493,21 @@ class NodeItem:
 
     def normalize(self):
         norm = self._arithmetic_helper(None, pyrpr.MATERIAL_NODE_OP_NORMALIZE3, lambda a: a)
-        if isinstance(norm.data, float):
+        if isinstance(norm._data, float):
             # converting to vector
-            norm.data = (norm.data, norm.data, norm.data)
+            norm._data = (norm._data, norm._data, norm._data)
 
-        if isinstance(norm.data, tuple):
-            length = math.sqrt(sum(norm.data[i]*norm.data[i] for i in range(3)))
-            norm.data = (0.0, 0.0, 1.0) if math.isclose(length, 0.0) else \
-                        (norm.data[0]/length, norm.data[1]/length, norm.data[2]/length)
+        if isinstance(norm._data, tuple):
+            length = math.sqrt(sum(norm._data[i]*norm._data[i] for i in range(3)))
+            norm._data = (0.0, 0.0, 1.0) if math.isclose(length, 0.0) else \
+                         (norm._data[0]/length, norm._data[1]/length, norm._data[2]/length)
 
         return norm
 
     def average_xyz(self):
         avg = self._arithmetic_helper(None, pyrpr.MATERIAL_NODE_OP_AVERAGE_XYZ, lambda a: a)
-        if isinstance(avg.data, tuple):
-            avg.data = sum(avg.data[:3]) / 3
+        if isinstance(avg._data, tuple):
+            avg._data = sum(avg._data[:3]) / 3
 
         return avg
 
@@ -346,8 +515,8 @@ class NodeItem:
         length = self._arithmetic_helper(None, pyrpr.MATERIAL_NODE_OP_LENGTH3, lambda a: a)
         
         # don't need to do anything if it's a float
-        if isinstance(length.data, tuple):
-            length.data = math.sqrt(sum(length.data[i]*length.data[i] for i in range(3)))
+        if isinstance(length._data, tuple):
+            length._data = math.sqrt(sum(length._data[i]*length._data[i] for i in range(3)))
         
         return length
 
@@ -365,13 +534,39 @@ class NodeItem:
 
     def is_zero(self):
         """ Check if numerical value is close to zero """
-        if isinstance(self.data, float) and math.isclose(self.data, 0.0):
-            return True
+        return is_zero_value(self._data)
 
-        if isinstance(self.data, tuple) and \
-           math.isclose(self.data[0], 0.0) and \
-           math.isclose(self.data[1], 0.0) and \
-           math.isclose(self.data[2], 0.0):
-            return True
 
-        return False
+class SocketNodeItem(NodeItem):
+    """
+    NodeItem of default value of node socket. If value is set as is to material node input,
+    this input is registered in material params and could be updated later without material
+    recreation. Any other usage of value makes socket not updatable.
+    """
+
+    def __init__(self, rpr_context, data, params, socket_key):
+        self.params = params
+        self.socket_key = socket_key
+        super().__init__(rpr_context, data)
+
+        params.add_socket(socket_key, data)
+
+    @property
+    def _data(self):
+        # value is used in calculations or is checked by node parser
+        self.params.set_indirect(self.socket_key)
+        return self.value
+
+    @_data.setter
+    def _data(self, value):
+        self.value = value
+
+    def is_zero(self):
+        # value could be changed in place while it stays zero or non zero
+        is_zero = is_zero_value(self.value)
+        self.params.add_check(self.socket_key, is_zero_value, is_zero)
+        return is_zero
+
+    def set_to_input(self, rpr_node, name):
+        rpr_node.set_input(name, self.value)
+        self.params.add_input(self.socket_key, rpr_node, name)
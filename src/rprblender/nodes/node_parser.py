@@ -17,9 +17,10 @@ from abc import ABCMeta, abstractmethod
 import bpy
 import pyrpr
 
-from rprblender.engine.context import RPRContext, RPRContext2
+from rprblender.engine.context import RPRContext2
 from rprblender.engine.context_hybrid import RPRContext as RPRContextHybrid
-from .node_item import NodeItem
+from .node_item import NodeItem, SocketNodeItem
+from .material_ir import MaterialCompiler
 
 from rprblender.utils import logging
 log = logging.Log(tag='export.node')
@@ -32,6 +33,99 @@ def key(material_key, node, socket_out, group_nodes: list) -> tuple:
     return (material_key, node.name, socket_out.name if socket_out else None)
 
 
+def socket_key(node, socket, group_nodes) -> tuple:
+    """ Key of node socket in material node tree including nested group trees """
+    return (tuple(e.name for e in group_nodes), node.name, socket.is_output, socket.identifier)
+
+
+class MaterialParams:
+    """
+    Default values of node sockets which are used by exported material and inputs of material
+    nodes which are set by these values. If only such values are changed, material nodes are
+    updated in place instead of material recreation.
+    """
+
+    def __init__(self, signature):
+        # signature of node tree topology, params are valid only for the same signature
+        self.signature = signature
+
+        self.values = {}        # socket key -> value
+        self.inputs = {}        # socket key -> [(material node, input name), ...]
+        self.indirect = set()   # socket keys which values are used not only as node inputs
+        self.checks = {}        # socket key -> [(check function, result), ...]
+
+        # item of socket value which is returned through link, see NodeParser.final_export()
+        self.passed_item = None
+
+    def add_socket(self, socket_key, value):
+        self.values[socket_key] = value
+
+    def add_input(self, socket_key, rpr_node, name):
+        self.inputs.setdefault(socket_key, []).append((rpr_node, name))
+
+    def set_indirect(self, socket_key):
+        self.indirect.add(socket_key)
+
+    def add_check(self, socket_key, check, result):
+        """ Registers check of value which result has to be the same for new value """
+        self.checks.setdefault(socket_key, []).append((check, result))
+
+    def pass_item(self, item):
+        """ Keeps item until linked node parser takes it, item which wasn't taken is indirect """
+        if self.passed_item is not None:
+            self.set_indirect(self.passed_item.socket_key)
+
+        self.passed_item = item
+
+    def take_item(self, value):
+        """ Returns passed item if value is its value """
+        item = self.passed_item
+        if item is None or item.value is not value:
+            return None
+
+        self.passed_item = None
+        return item
+
+    def get_changed(self, values: dict):
+        """ Returns changed values of used sockets or None if material has to be recreated """
+        changed = {}
+        for key, value in self.values.items():
+            new_value = values.get(key)
+            if new_value == value:
+                continue
+
+            if key in self.indirect or \
+                    any(check(new_value) != result for check, result in self.checks.get(key, ())):
+                return None
+
+            changed[key] = new_value
+
+        return changed
+
+    def update(self, changed: dict):
+        """ Sets changed values to material nodes inputs """
+        for key, value in changed.items():
+            for rpr_node, name in self.inputs.get(key, ()):
+                rpr_node.set_input(name, value)
+
+            self.values[key] = value
+
+    def bind(self, rpr_nodes: dict):
+        """
+        Returns params of emitted material, rpr_nodes is dict compiled node -> material node.
+        Inputs of compiled nodes which weren't emitted are skipped.
+        """
+        params = MaterialParams(self.signature)
+        params.values = self.values.copy()
+        params.indirect = self.indirect
+        params.checks = self.checks
+        for key, inputs in self.inputs.items():
+            params.inputs[key] = [(rpr_nodes[node], name) for node, name in inputs
+                                  if node in rpr_nodes]
+
+        return params
+
+
 class MaterialError(BaseException):
     """ Unsupported shader nodes setup """
     pass
@@ -43,7 +137,7 @@ class BaseNodeParser(metaclass=ABCMeta):
     Subclasses should override only export() function.
     """
 
-    def __init__(self, rpr_context: RPRContext, material: bpy.types.Material,
+    def __init__(self, rpr_context: MaterialCompiler, material: bpy.types.Material,
                  node: bpy.types.Node, socket_out: bpy.types.NodeSocket, group_nodes=(), *, data):
         self.rpr_context = rpr_context
         self.material = material
@@ -70,6 +164,10 @@ class BaseNodeParser(metaclass=ABCMeta):
     def object(self):
         return self.data['object']
 
+    @property
+    def params(self) -> [MaterialParams, None]:
+        return self.data.get('params')
+
     # INTERNAL FUNCTIONS
 
     def _export_node(self, node, socket_out, group_node=None):
@@ -105,7 +203,8 @@ class BaseNodeParser(metaclass=ABCMeta):
         log.warn("Ignoring unsupported node", node, self.material)
         return None
 
-    def _parse_val(self, val):
+    @staticmethod
+    def _parse_val(val):
         """ Turn a blender node val or default value for input into something that works well with rpr """
 
         if isinstance(val, (int, float)):
@@ -119,6 +218,19 @@ class BaseNodeParser(metaclass=ABCMeta):
 
         raise TypeError("Unknown value type to pass to rpr", val)
 
+    def _socket_item(self, socket, node=None, group_nodes=None) -> NodeItem:
+        """ Returns default value of socket which usage is tracked by material params if any """
+        if self.params is None:
+            return NodeItem(self.rpr_context, self._parse_val(socket.default_value))
+
+        if node is None:
+            node = self.node
+        if group_nodes is None:
+            group_nodes = self.group_nodes
+
+        return SocketNodeItem(self.rpr_context, self._parse_val(socket.default_value), self.params,
+                              socket_key(node, socket, group_nodes))
+
     # HELPER FUNCTIONS
     # Child classes should use them to do their export
 
@@ -290,12 +402,17 @@ class NodeParser(BaseNodeParser):
         log("export", self.material, self.node, self.socket_out, self.group_nodes)
         if self.node.mute:
             node_item = self.export_muted()
-        elif isinstance(self.rpr_context, RPRContextHybrid):
+        elif isinstance(self.rpr_context.target, RPRContextHybrid):
             node_item = self.export_hybrid()
-        elif isinstance(self.rpr_context, RPRContext2):
+        elif isinstance(self.rpr_context.target, RPRContext2):
             node_item = self.export_rpr2()
         else:
             node_item = self.export()
+        if isinstance(node_item, SocketNodeItem):
+            # socket value is returned through link as is, linked node parser could take it back
+            self.params.pass_item(node_item)
+            return node_item.value
+
         rpr_node = node_item.data if node_item else None
 
         if isinstance(rpr_node, pyrpr.MaterialNode):
@@ -320,18 +437,21 @@ class NodeParser(BaseNodeParser):
         return self.node_item(rpr_node) if rpr_node is not None else None
 
     def get_output_default(self, socket_key=None) -> NodeItem:
-        val = super().get_output_default(socket_key)
-        return self.node_item(val)
+        socket_out = self.socket_out if socket_key is None else self.node.outputs[socket_key]
+        return self._socket_item(socket_out)
 
     def get_input_default(self, socket_key) -> NodeItem:
-        val = super().get_input_default(socket_key)
-        return self.node_item(val)
+        return self._socket_item(self.node.inputs[socket_key])
 
     def get_input_link(self, socket_key, accepted_type=None) -> [NodeItem, None]:
         val = super().get_input_link(socket_key, accepted_type)
         if val is None:
             return None
 
+        item = self.params.take_item(val) if self.params is not None else None
+        if item is not None:
+            return item
+
         return self.node_item(val)
 
     def create_node(self, material_type, inputs={}) -> NodeItem:
@@ -340,7 +460,10 @@ class NodeParser(BaseNodeParser):
             return None
 
         for name, value in inputs.items():
-            val.set_input(name, value.data if isinstance(value, NodeItem) else value)
+            if isinstance(value, SocketNodeItem):
+                value.set_to_input(val, name)
+            else:
+                val.set_input(name, value.data if isinstance(value, NodeItem) else value)
 
         return self.node_item(val)
 
@@ -170,6 +170,12 @@ class RPR_RenderDevices(bpy.types.PropertyGroup):
     def has_gpu(self):
         return any(bool(state) for state in self.available_gpu_states)
 
+    def enabled_devices(self):
+        """ Returns list of enabled devices: 'CPU' for CPU device and index for GPU device """
+        res = ['CPU'] if self.cpu_state else []
+        res.extend(i for i, state in enumerate(self.available_gpu_states) if state)
+        return res
+
 
 class RPR_UserSettings(bpy.types.PropertyGroup):
     """
@@ -311,6 +317,12 @@ class RPR_RenderProperties(RPR_Properties):
         ),
         default='CENTER_SPIRAL'
     )
+    use_tile_devices: BoolProperty(
+        name="Tile per Device",
+        description="Render tiles on every enabled device in parallel. "
+                    "Every device keeps its own copy of the scene",
+        default=False,
+    )
 
     @property
     def is_tile_render_available(self):
@@ -524,8 +536,12 @@ class RPR_RenderProperties(RPR_Properties):
         default=False,
     )
 
-    def init_rpr_context(self, rpr_context, is_final_engine=True, use_gl_interop=False, use_contour_integrator=False):
-        """ Initializes rpr_context by device settings """
+    def init_rpr_context(self, rpr_context, is_final_engine=True, use_gl_interop=False, use_contour_integrator=False,
+                         device=None):
+        """
+        Initializes rpr_context by device settings.
+        If device is set ('CPU' or GPU index) only this device of enabled devices is used.
+        """
 
         scene = self.id_data
         log("Syncing scene: %s" % scene.name)
@@ -536,13 +552,13 @@ class RPR_RenderProperties(RPR_Properties):
         # enable CMJ sampler for adaptive sampling
         context_props = [pyrpr.CONTEXT_SAMPLER_TYPE, pyrpr.CONTEXT_SAMPLER_TYPE_CMJ]
 
-        if devices.cpu_state:
+        if devices.cpu_state and device in (None, 'CPU'):
             context_flags |= {pyrpr.Context.cpu_device['flag']}
             context_props.extend([pyrpr.CONTEXT_CPU_THREAD_LIMIT, devices.cpu_threads])
 
         metal_enabled = False
         for i, gpu_state in enumerate(devices.available_gpu_states):
-            if gpu_state:
+            if gpu_state and device in (None, i):
                 context_flags |= {pyrpr.Context.gpu_devices[i]['flag']}
                 if use_gl_interop:
                     context_flags |= {pyrpr.CREATION_FLAGS_ENABLE_GL_INTEROP}
@@ -593,6 +609,14 @@ class RPR_RenderProperties(RPR_Properties):
             return devices_settings.final_devices
         return devices_settings.viewport_devices
 
+    def get_tile_devices(self):
+        """ Returns devices which render tiles in parallel, empty list if tiles are rendered in one context """
+        if not (self.is_tile_render_available and self.use_tile_devices):
+            return []
+
+        devices = self.get_devices().enabled_devices()
+        return devices if len(devices) > 1 else []
+
     def export_ray_depth(self, rpr_context):
         """ Exports ray depth settings """
 
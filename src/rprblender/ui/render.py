@@ -137,6 +137,7 @@ class RPR_RENDER_PT_limits(RPR_Panel):
         col.prop(rpr, 'tile_x')
         col.prop(rpr, 'tile_y')
         col.prop(rpr, 'tile_order')
+        col.prop(rpr, 'use_tile_devices')
 
 
 class RPR_RENDER_PT_viewport_limits(RPR_Panel):
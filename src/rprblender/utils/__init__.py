@@ -191,6 +191,9 @@ from . import logging
 log = logging.Log(tag='utils')
 
 
+CACHE_DIR_NAME = "cache"
+
+
 def get_temp_dir():
     """ Returns $TEMP/rprblender temp dir. Creates it if needed """
 
@@ -213,11 +216,22 @@ def get_temp_pid_dir():
     return pid_dir
 
 
+def get_cache_dir():
+    """ Returns $TEMP/rprblender/cache dir for persistent caches. Creates it if needed """
+
+    cache_dir = get_temp_dir() / CACHE_DIR_NAME
+    if not cache_dir.is_dir():
+        log("Creating cache dir", cache_dir)
+        cache_dir.mkdir()
+
+    return cache_dir
+
+
 def clear_temp_dir():
-    """ Clears whole $TEMP/rprblender temp dir """
+    """ Clears whole $TEMP/rprblender temp dir except persistent caches """
 
     temp_dir = get_temp_dir()
-    paths = tuple(temp_dir.iterdir())
+    paths = tuple(path for path in temp_dir.iterdir() if path.name != CACHE_DIR_NAME)
     if not paths:
         return
 
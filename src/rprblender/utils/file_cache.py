@@ -0,0 +1,282 @@
+#**********************************************************************
+# Copyright 2020 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#********************************************************************
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from . import logging
+log = logging.Log(tag='utils.file_cache')
+
+
+# file path -> ((size, mtime), content hash) of already hashed files
+_file_hashes = {}
+
+
+def hash_file(file_path) -> str:
+    """ Returns hash of file content, file isn't read again until its size or modification time changes """
+    stat = os.stat(file_path)
+    file_id = (stat.st_size, stat.st_mtime_ns)
+
+    cached = _file_hashes.get(file_path)
+    if cached and cached[0] == file_id:
+        return cached[1]
+
+    h = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+
+    file_hash = h.hexdigest()
+    _file_hashes[file_path] = (file_id, file_hash)
+    return file_hash
+
+
+def make_key(*parts) -> str:
+    """ Makes cache key from parts: bytes-like objects are hashed by content, others by str() """
+    h = hashlib.sha1()
+    for part in parts:
+        if isinstance(part, (bytes, bytearray, memoryview)) or hasattr(part, '__array_interface__'):
+            h.update(part)
+        else:
+            h.update(str(part).encode())
+        h.update(b'\0')
+
+    return h.hexdigest()
+
+
+ARRAYS_MAGIC = b'RPRARRS1'
+ARRAYS_ALIGNMENT = 64
+
+
+def save_arrays(file_path, arrays: dict):
+    """
+    Saves dict name -> np.array to file which could be loaded by load_arrays() without copying.
+    File is a JSON header with dtype, shape and offset of every array followed by aligned raw data.
+    """
+    header = {}
+    offset = 0
+    for name, array in arrays.items():
+        header[name] = (array.dtype.str, array.shape, offset)
+        offset += -(-array.nbytes // ARRAYS_ALIGNMENT) * ARRAYS_ALIGNMENT
+
+    header_data = json.dumps(header).encode()
+    data_offset = -(-(len(ARRAYS_MAGIC) + 8 + len(header_data)) // ARRAYS_ALIGNMENT) * ARRAYS_ALIGNMENT
+
+    with open(file_path, 'wb') as f:
+        f.write(ARRAYS_MAGIC)
+        f.write(np.uint64(len(header_data)).tobytes())
+        f.write(header_data)
+        for name, array in arrays.items():
+            f.seek(data_offset + header[name][2])
+            f.write(np.ascontiguousarray(array).data)
+
+        f.truncate(data_offset + offset)
+
+
+def load_arrays(file_path) -> dict:
+    """
+    Returns dict name -> np.array of file saved by save_arrays().
+    Arrays are read only views of memory mapped file, data is read from disk when it is accessed.
+    """
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return {}
+
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if data[:len(ARRAYS_MAGIC)] != ARRAYS_MAGIC:
+        raise ValueError(f"Not an arrays file {file_path}")
+
+    header_len = int(np.frombuffer(data, np.uint64, 1, len(ARRAYS_MAGIC))[0])
+    header_offset = len(ARRAYS_MAGIC) + 8
+    header = json.loads(data[header_offset:header_offset + header_len])
+    data_offset = -(-(header_offset + header_len) // ARRAYS_ALIGNMENT) * ARRAYS_ALIGNMENT
+
+    arrays = {}
+    for name, (dtype, shape, offset) in header.items():
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape, dtype=np.int64))
+        arrays[name] = np.frombuffer(data, dtype, count, data_offset + offset).reshape(shape)
+
+    return arrays
+
+
+class FileCache:
+    """
+    Persistent content addressed cache of converted files.
+    Files are found by key which is a hash of source content and conversion settings,
+    so cache could be shared by Blender sessions and by several Blender processes.
+    New file is written to a temporary file and renamed, readers never get partially written file.
+    Least recently used files are removed when cache size exceeds max_size.
+    """
+
+    LOCK_FILE = ".lock"
+    TEMP_SUFFIX = ".tmp"
+
+    LOCK_TIMEOUT = 60.0             # older lock is considered to be left by crashed process
+    EVICTION_GRACE_TIME = 600.0     # recently used file could be loaded by other process right now
+
+    def __init__(self, cache_dir, max_size, eviction_interval=0.0):
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+
+        # cache of many small files is evicted not more often, eviction lists whole cache dir
+        self.eviction_interval = eviction_interval
+        self.eviction_time = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    @property
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'bytes_saved': self.bytes_saved}
+
+    def get_path(self, key, extension) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.{extension}"
+
+    def get(self, key, extension, write_file) -> str:
+        """
+        Returns path of cached file.
+        On cache miss file is created by write_file(path) function.
+        """
+        path = self.get_path(key, extension)
+        try:
+            size = path.stat().st_size
+        except OSError:
+            size = 0
+
+        if size > 0:
+            self.hits += 1
+            self.bytes_saved += size
+
+            # modification time is used as last access time for eviction
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+
+            return str(path)
+
+        self.misses += 1
+        log("Cache miss", path)
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # extension is kept last, some writers choose format by it
+        temp_path = path.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}"
+                                   f"{self.TEMP_SUFFIX}.{extension}")
+        try:
+            write_file(str(temp_path))
+            os.replace(temp_path, path)
+
+        finally:
+            if temp_path.is_file():
+                temp_path.unlink()
+
+        if time.time() - self.eviction_time >= self.eviction_interval:
+            self.evict()
+
+        return str(path)
+
+    def evict(self):
+        """ Removes least recently used files until cache size fits max_size """
+        self.eviction_time = time.time()
+
+        lock_path = self.cache_dir / self.LOCK_FILE
+        if not self._acquire_lock(lock_path):
+            # other process is evicting right now
+            return
+
+        try:
+            now = time.time()
+            files = []
+            for path in self.cache_dir.glob('*/*'):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+
+                if self.TEMP_SUFFIX in path.suffixes:
+                    # temporary file left by crashed process
+                    if now - stat.st_mtime > self.EVICTION_GRACE_TIME:
+                        self._remove(path)
+                    continue
+
+                files.append((stat.st_mtime, stat.st_size, path))
+
+            size = sum(file_size for _, file_size, _ in files)
+            if size <= self.max_size:
+                return
+
+            log(f"Evicting cache {self.cache_dir}: {size} > {self.max_size} bytes")
+            files.sort(key=lambda f: f[0])
+            for mtime, file_size, path in files:
+                if size <= self.max_size or now - mtime < self.EVICTION_GRACE_TIME:
+                    break
+
+                if self._remove(path):
+                    size -= file_size
+
+        finally:
+            self._remove(lock_path)
+
+    def remove(self, key, extension):
+        """ Removes cached file, e.g. damaged one """
+        self._remove(self.get_path(key, extension))
+
+    def clear(self):
+        """ Removes all cached files """
+        for path in self.cache_dir.glob('*/*'):
+            self._remove(path)
+
+    def _acquire_lock(self, lock_path) -> bool:
+        for _ in range(2):
+            try:
+                os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+
+            except FileExistsError:
+                try:
+                    if time.time() - lock_path.stat().st_mtime < self.LOCK_TIMEOUT:
+                        return False
+                except OSError:
+                    # lock has just been released
+                    continue
+
+                log.warn("Removing stale cache lock", lock_path)
+                self._remove(lock_path)
+
+            except OSError as e:
+                log.warn("Can't lock cache", lock_path, e)
+                return False
+
+        return False
+
+    @staticmethod
+    def _remove(path) -> bool:
+        try:
+            os.remove(path)
+            return True
+
+        except OSError:
+            # file could be opened or removed by other process
+            return False
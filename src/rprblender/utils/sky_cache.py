@@ -0,0 +1,87 @@
+#**********************************************************************
+# Copyright 2020 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#********************************************************************
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .file_cache import FileCache, make_key
+
+from . import logging
+log = logging.Log(tag='utils.sky_cache')
+
+
+class SkyImageCache:
+    """
+    Memoizes generated Sun & Sky images by sky parameters.
+    Images are kept in memory for max_count last used parameters sets
+    and optionally in file_cache to be reused by next Blender sessions.
+
+    :param generate_image: generate_image(params) -> np.array or None, params is a tuple of
+        sky parameters including resolution
+    """
+
+    def __init__(self, generate_image, max_count=4, file_cache: FileCache = None):
+        self.generate_image = generate_image
+        self.max_count = max_count
+        self.file_cache = file_cache
+
+        self.images = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, params: tuple):
+        """ Returns sky image for params, image is generated only if it isn't cached """
+        with self.lock:
+            im = self.images.get(params)
+            if im is not None:
+                self.images.move_to_end(params)
+                return im
+
+            im = self._load(params) if self.file_cache else self.generate_image(params)
+            if im is None:
+                return None
+
+            # cached image is shared, it shouldn't be changed
+            im.setflags(write=False)
+
+            self.images[params] = im
+            if len(self.images) > self.max_count:
+                self.images.popitem(last=False)
+
+            return im
+
+    def _load(self, params):
+        generated = None
+
+        def save_image(path):
+            nonlocal generated
+            generated = self.generate_image(params)
+            if generated is None:
+                raise ValueError("Sky image generation failed")
+
+            with open(path, 'wb') as f:
+                np.save(f, generated)
+
+        try:
+            path = self.file_cache.get(make_key('SunSky', *params), 'npy', save_image)
+        except ValueError as e:
+            log.warn(e, params)
+            return None
+
+        return generated if generated is not None else np.load(path)
+
+    def clear(self):
+        with self.lock:
+            self.images.clear()